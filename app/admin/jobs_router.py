@@ -1,6 +1,7 @@
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, Request, HTTPException, Query
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Depends, Request, HTTPException, Query, Form
+from fastapi.responses import HTMLResponse, RedirectResponse
+from starlette.status import HTTP_302_FOUND
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, or_
 
@@ -11,6 +12,7 @@ from app.models.workflow import Workflow
 from app.models.job_execution import JobExecution
 from app.models.comfy_node import ComfyNode
 from app.core.templates import templates
+from app.services.fair_queue import PRIORITY_CLASSES
 
 
 router = APIRouter(prefix="/admin/jobs", tags=["admin-jobs"])
@@ -133,6 +135,7 @@ async def admin_jobs_list(
             "total": total,
             "limit": limit,
             "offset": offset,
+            "priority_classes": PRIORITY_CLASSES,
             "filters": {
                 "status": status or "",
                 "q": q or "",
@@ -171,6 +174,25 @@ async def admin_job_detail(
         .order_by(JobExecution.created_at.asc())
     )).all()
 
+    # cache / coalescing: откуда взят результат и кто присоединился к нашим executions
+    exec_ids = [e.id for e, _node in exec_rows]
+    source_ids = [e.source_execution_id for e, _node in exec_rows if e.source_execution_id]
+
+    source_jobs = {}
+    if source_ids:
+        source_jobs = dict((await db.execute(
+            select(JobExecution.id, JobExecution.job_id)
+            .where(JobExecution.id.in_(source_ids))
+        )).all())
+
+    attached = []
+    if exec_ids:
+        attached = (await db.execute(
+            select(JobExecution)
+            .where(JobExecution.source_execution_id.in_(exec_ids))
+            .order_by(JobExecution.created_at.asc())
+        )).scalars().all()
+
     # “Finished” можно вычислить как max(finished_at) из executions
     finished_at = None
     for e, _node in exec_rows:
@@ -186,6 +208,35 @@ async def admin_job_detail(
             "job_user": job_user,
             "workflow": wf,
             "exec_rows": exec_rows,
+            "source_jobs": source_jobs,
+            "attached": attached,
             "computed_finished_at": finished_at,
+            "priority_classes": PRIORITY_CLASSES,
         },
     )
+
+
+@router.post("/{job_id}/priority")
+async def admin_job_set_priority(
+    job_id: str,
+    request: Request,
+    priority: str = Form(...),
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(require_admin),
+):
+    if priority not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400, detail="Unknown priority")
+
+    job = await db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "QUEUED":
+        raise HTTPException(status_code=409, detail="Only queued jobs can be reprioritized")
+
+    job.priority = priority
+    await db.commit()
+
+    return RedirectResponse(
+        url=request.headers.get("referer") or f"/admin/jobs/{job_id}",
+        status_code=HTTP_302_FOUND
+    )
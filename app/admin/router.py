@@ -15,14 +15,19 @@ from app.models.comfy_node import ComfyNode
 from app.models.workflow import Workflow
 from app.models.job import Job
 from app.models.job_execution import JobExecution
-from app.core.security import verify_password
+from app.core.security import verify_password_async
 from app.core.jwt import create_access_token, create_refresh_token
 from app.services.auth_service import _clear_auth_cookies, _set_auth_cookies
-from app.core.security import hash_password
+from app.core.security import hash_password_async
 from app.services.workflow_spec_validator import validate_workflow_spec
 from app.services.spec_generator import generate_spec_v2
+from app.services.workflow_binding_plan import invalidate_binding_plan
+from app.services.prompt_template import invalidate_prompt_template
 from app.services.parse_json import parse_json_field
+from app.services.limits import invalidate_user_limits
+from app.services.user_cache import invalidate_user
 from app.services.comfy_client import get_object_info
+from app.services.node_capabilities import get_node_capabilities, get_workflow_requirements, known_node_capabilities
 
 
 router = APIRouter(prefix='/admin', tags=['admin-ui'])
@@ -257,7 +262,7 @@ async def admin_login(
 
     if (
         not user
-        or not verify_password(password, user.password_hash)
+        or not await verify_password_async(password, user.password_hash)
         or not user.is_active
         or user.role != 'ADMIN'
     ):
@@ -320,6 +325,7 @@ async def admin_toggle_user(
     
     target.is_active = not target.is_active
     await db.commit()
+    invalidate_user(user_id)
 
     return RedirectResponse(
         url='/admin/users',
@@ -365,6 +371,7 @@ async def admin_user_limits_save(
     user_id: int,
     max_concurrent_jobs: int = Form(...),
     max_jobs_per_day: int = Form(...),
+    queue_weight: int = Form(1),
     db: AsyncSession = Depends(get_db),
     _: User = Depends(require_admin)
 ):
@@ -377,8 +384,10 @@ async def admin_user_limits_save(
     
     limits.max_concurrent_jobs = max_concurrent_jobs
     limits.max_jobs_per_day = max_jobs_per_day
+    limits.queue_weight = max(1, queue_weight)
 
     await db.commit()
+    invalidate_user_limits(user_id)
 
     return RedirectResponse(
         url='/admin/users',
@@ -420,7 +429,7 @@ async def admin_user_create(
     
     user = User(
         email=email,
-        password_hash=hash_password(password),
+        password_hash=await hash_password_async(password),
         role=UserRole(role).value,
         is_active=True
     )
@@ -447,12 +456,37 @@ async def admin_nodes_list(
     result = await db.execute(select(ComfyNode).order_by(ComfyNode.id))
     nodes = result.scalars().all()
 
+    workflows = (await db.execute(
+        select(Workflow).where(Workflow.is_active == True).order_by(Workflow.name)
+    )).scalars().all()
+    requirements = {
+        wf.id: await get_workflow_requirements(db=db, workflow_id=wf.id)
+        for wf in workflows
+    }
+
+    # node_id -> [(workflow, [чего не хватает])]; None — capabilities неизвестны
+    coverage = {}
+    for node in nodes:
+        # отключённые не опрашиваем — берём последнее известное
+        if node.is_active:
+            capabilities = await get_node_capabilities(node)
+        else:
+            capabilities = known_node_capabilities(node.id)
+        if capabilities is None:
+            coverage[node.id] = None
+            continue
+        coverage[node.id] = [
+            (wf, capabilities.missing(requirements[wf.id]) if requirements[wf.id] else [])
+            for wf in workflows
+        ]
+
     return templates.TemplateResponse(
         '/admin/nodes/list.html',
         {
             'request': request,
             'user': admin,
-            'nodes': nodes
+            'nodes': nodes,
+            'coverage': coverage
         }
     )
 
@@ -478,6 +512,8 @@ async def admin_node_create(
     base_url: str = Form(...),
     max_queue: int = Form(...),
     priority: int = Form(...),
+    shared_storage_prefix: str = Form(''),
+    shared_input_dir: str = Form(''),
     db: AsyncSession = Depends(get_db),
     _: User = Depends(require_admin)
 ):
@@ -486,7 +522,9 @@ async def admin_node_create(
         base_url=base_url,
         is_active=True,
         max_queue=max_queue,
-        priority=priority
+        priority=priority,
+        shared_storage_prefix=shared_storage_prefix.strip() or None,
+        shared_input_dir=shared_input_dir.strip() or None
     )
     db.add(node)
     await db.commit()
@@ -527,6 +565,8 @@ async def admin_node_edit(
     base_url: str = Form(...),
     max_queue: int = Form(...),
     priority: int = Form(...),
+    shared_storage_prefix: str = Form(''),
+    shared_input_dir: str = Form(''),
     db: AsyncSession = Depends(get_db),
     _: User = Depends(require_admin)
 ):
@@ -540,6 +580,8 @@ async def admin_node_edit(
     node.base_url = base_url
     node.max_queue = max_queue
     node.priority = priority
+    node.shared_storage_prefix = shared_storage_prefix.strip() or None
+    node.shared_input_dir = shared_input_dir.strip() or None
     await db.commit()
 
     return RedirectResponse(
@@ -609,6 +651,27 @@ async def admin_workflow_toggle(
     )
 
 
+@router.post('/workflows/{workflow_id}/toggle-result-cache')
+async def admin_workflow_toggle_result_cache(
+    workflow_id: str,
+    db: AsyncSession = Depends(get_db),
+    _: User = Depends(require_admin)
+):
+    result = await db.execute(select(Workflow).where(Workflow.id == workflow_id))
+    workflow = result.scalar_one_or_none()
+
+    if not workflow:
+        raise HTTPException(status_code=404, detail='Workflow not found')
+    
+    workflow.result_cache_enabled = not workflow.result_cache_enabled
+    await db.commit()
+
+    return RedirectResponse(
+        url='/admin/workflows',
+        status_code=HTTP_302_FOUND
+    )
+
+
 @router.get('/workflows/upload', response_class=HTMLResponse)
 async def admin_workflow_upload_page(
     request: Request,
@@ -716,6 +779,8 @@ async def admin_workflow_edit(
     workflow.requires_mask = bool(parced_spec.inputs.mask)
 
     await db.commit()
+    invalidate_binding_plan(workflow_id)
+    invalidate_prompt_template(workflow_id)
 
     return RedirectResponse(
         url='/admin/workflows',
@@ -830,6 +895,8 @@ async def admin_workflow_generate_spec(
     workflow.requires_mask = bool(spec['inputs'].get('mask'))
 
     await db.commit()
+    invalidate_binding_plan(workflow_id)
+    invalidate_prompt_template(workflow_id)
     await db.refresh(workflow)
 
     return RedirectResponse(
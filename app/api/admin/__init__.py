@@ -2,4 +2,5 @@ from app.api.admin.users import router as user_router
 from app.api.admin.user_limits import router as user_limits_router
 from app.api.admin.comfy_nodes import router as comfy_nodes_router
 from app.api.admin.health import router as health_router
-from app.api.admin.workflows import router as workflows_router
\ No newline at end of file
+from app.api.admin.workflows import router as workflows_router
+from app.api.admin.storage import router as storage_router
\ No newline at end of file
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db, require_admin
+from app.services.storage_gc import run_storage_gc
+
+
+router = APIRouter(prefix='/admin/storage', tags=['admin-storage'])
+
+
+@router.get('/gc')
+async def storage_gc_report(
+    db: AsyncSession = Depends(get_db),
+    _: None = Depends(require_admin)
+):
+    """
+    Dry-run: сколько байт можно освободить (по пользователям).
+    """
+    report = await run_storage_gc(db=db, dry_run=True)
+    return report.to_dict()
+
+
+@router.post('/gc')
+async def storage_gc_run(
+    db: AsyncSession = Depends(get_db),
+    _: None = Depends(require_admin)
+):
+    report = await run_storage_gc(db=db)
+    return report.to_dict()
@@ -5,6 +5,7 @@ from sqlalchemy import select
 from app.api.deps import get_db, require_admin
 from app.models.user_limits import UserLimits
 from app.schemas.user_limits import UserLimitsUpdate, UserLimitsOut
+from app.services.limits import invalidate_user_limits
 
 
 router = APIRouter(prefix='/admin/user_limits', tags=['admin-user-limits'])
@@ -40,8 +41,10 @@ async def update_limits(
     
     limits.max_concurrent_jobs = data.max_concurrent_jobs
     limits.max_jobs_per_day = data.max_jobs_per_day
+    limits.queue_weight = data.queue_weight
 
     await db.commit()
+    invalidate_user_limits(user_id)
     await db.refresh(limits)
 
     return limits
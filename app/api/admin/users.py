@@ -11,7 +11,8 @@ from app.schemas.user import (
     UserOut
 )
 from app.models.user_limits import UserLimits
-from app.core.security import hash_password
+from app.core.security import hash_password_async
+from app.services.user_cache import invalidate_user
 
 
 router = APIRouter(prefix='/admin/users', tags=['admin-users'])
@@ -38,7 +39,7 @@ async def create_user(
     
     user = User(
         email=data.email,
-        password_hash=hash_password(data.password),
+        password_hash=await hash_password_async(data.password),
         role=data.role,
         is_active=True
     )
@@ -74,6 +75,7 @@ async def update_user(
     
     await db.commit()
     await db.refresh(user)
+    invalidate_user(user_id)
     return user
 
 
@@ -91,5 +93,6 @@ async def deactivate_user(
     
     user.is_active = False
     await db.commit()
+    invalidate_user(user_id)
 
     return {'status': 'deactivated'}
@@ -1,13 +1,12 @@
-from jose import jwt, JWTError
+from jose import JWTError
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from app.core.config import settings
 from app.schemas.auth import LoginRequest, RefreshRequest, Token
-from app.core.security import verify_password
-from app.core.jwt import create_access_token, create_refresh_token
+from app.core.security import verify_password_async
+from app.core.jwt import create_access_token, create_refresh_token, decode_token
 from app.models.user import User
 from app.api.deps import get_db
 
@@ -42,7 +41,7 @@ async def login(
     )
     user = result.scalar_one_or_none()
 
-    if not user or not verify_password(
+    if not user or not await verify_password_async(
         form_data.password, user.password_hash
     ):
         raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -59,11 +58,7 @@ async def login(
 @router.post('/refresh', response_model=Token)
 async def refresh_token(data: RefreshRequest):
     try:
-        payload = jwt.decode(
-            data.refresh_token,
-            settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM],
-        )
+        payload = decode_token(data.refresh_token)
 
         if payload.get('type') != 'refresh':
             raise HTTPException(status_code=401, detail='Invalid token type')
@@ -1,15 +1,15 @@
 from fastapi import Depends, HTTPException, status, Request, Response
-from jose import jwt, JWTError
+from jose import JWTError
 from typing import AsyncGenerator
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
 from app.core.config import settings
 from app.core.oauth2 import oauth2_scheme
 from app.db.session import AsyncSessionLocal
 from app.models.user import User
-from app.core.jwt import create_access_token
+from app.core.jwt import create_access_token, decode_token
 from app.services.auth_service import _set_access_cookie
+from app.services.user_cache import get_cached_user
 
 
 def get_settings():
@@ -30,13 +30,9 @@ def extract_token(request: Request) -> str | None:
 
 def _decode_jwt(token: str) -> dict:
     """
-    Универсальный decode. Бросает JWTError при любой проблеме (включая exp).
+    Универсальный decode (с кэшем проверенных токенов). Бросает JWTError при любой проблеме (включая exp).
     """
-    return jwt.decode(
-        token,
-        settings.SECRET_KEY,
-        algorithms=[settings.ALGORITHM]
-    )
+    return decode_token(token)
 
 
 def _try_refresh_access_token(request: Request, response: Response) -> int | None:
@@ -64,8 +60,8 @@ def _try_refresh_access_token(request: Request, response: Response) -> int | Non
 
 
 async def _get_user_by_id(db: AsyncSession, user_id: int) -> User | None:
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    # из кэша процесса: polling / прокси картинок не ходят в БД за пользователем
+    user = await get_cached_user(db, user_id)
     if not user or not user.is_active:
         return None
     return user
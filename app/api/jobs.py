@@ -13,6 +13,8 @@ from app.schemas.job import JobCreateRequest, JobResponse
 from app.services.workflow_mapper import map_inputs_to_workflow
 from app.services.workflow_mapper import normalize_workflow_for_comfy
 from app.services.storage import save_uploaded_files
+from app.services.limits import check_daily_job_limit
+from app.services import job_service
 
 
 router = APIRouter(prefix='/jobs', tags=['jobs'])
@@ -43,14 +45,17 @@ async def create_job(
     if payload.mode not in available_modes:
         raise HTTPException(status_code=400, detail=f'Invalid mode "{payload.mode}"')
     
-    # 3. Сохраняем загруженные файлы
+    # 3. Проверка лимитов
+    await check_daily_job_limit(db=db, user_id=user.id)
+
+    # 4. Сохраняем загруженные файлы
     files = await save_uploaded_files(
         user_id=user.id,
         workflow_slug=workflow.slug,
         files=payload.files
     )
 
-    # 4. Подготавливаем workflow (mapping)
+    # 5. Подготавливаем workflow (mapping)
     prepared_workflow = map_inputs_to_workflow(
         workflow_json=workflow.workflow_json,
         spec=workflow.spec_json,
@@ -60,7 +65,7 @@ async def create_job(
     )
     prepared_workflow = normalize_workflow_for_comfy(prepared_workflow)
 
-    # 5. Создаём Job (intent)
+    # 6. Создаём Job (intent)
     job = Job(
         id=uuid.uuid4().hex,
         user_id=user.id,
@@ -72,9 +77,7 @@ async def create_job(
         status='QUEUED'
     )
 
-    db.add(job)
-    await db.commit()
-    await db.refresh(job)
+    await job_service.create_job(db=db, job=job)
 
     return job
 
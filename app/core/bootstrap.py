@@ -1,7 +1,7 @@
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
-from app.core.security import hash_password
+from app.core.security import hash_password_async
 
 
 async def create_initial_admin(session: AsyncSession):
@@ -19,7 +19,7 @@ async def create_initial_admin(session: AsyncSession):
     
     admin = User(
         email=settings.INITIAL_ADMIN_EMAIL,
-        password_hash=hash_password(settings.INITIAL_ADMIN_PASSWORD),
+        password_hash=await hash_password_async(settings.INITIAL_ADMIN_PASSWORD),
         role='ADMIN',
         is_active=True
     )
@@ -1,4 +1,5 @@
 import os
+from typing import Any, Dict
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -29,8 +30,78 @@ class Settings(BaseSettings):
     COMFY_HEALTHCHECK_TIMEOUT: int     # секунд
     COMFY_DEAD_AFTER: int   # секунд
 
+    COMFY_UPLOAD_CONCURRENCY: int = 4       # параллельных загрузок на ноду
+    COMFY_UPLOAD_RETRIES: int = 3
+    COMFY_UPLOAD_RETRY_BACKOFF: float = 0.5  # секунд, удваивается на каждой попытке
+
+    COMFY_OBJECT_INFO_TTL: int = 60         # секунд, кэш /object_info на ноду
+    COMFY_PRUNE_UNUSED_NODES: bool = True   # не отправлять ноды, не ведущие к output
+
+    JSON_CODEC: str = 'auto'                # auto | orjson | json
+
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_TTL: int = 86400           # секунд
+    RESULT_CACHE_MAX_ENTRIES: int = 10000
+
+    BATCH_MAX_SIZE: int = 8                 # вариантов за один запуск
+
+    QUEUE_PRIORITY_AGING: int = 600         # секунд ожидания на повышение класса (0 — без aging)
+    QUEUE_ETA_REFRESH: float = 2.0          # секунд между пересчётами позиций / ETA очереди
+    QUEUE_ETA_DEFAULT_DURATION: int = 60    # секунд на job, пока у workflow нет истории
+    QUEUE_ETA_HISTORY: int = 50             # последних execution workflow для начальной оценки
+    EXECUTION_MAX_ATTEMPTS: int = 3         # отправок job на ноды при сбоях нод (1 — без повторов)
+    EXECUTION_RETRY_DELAY: float = 5.0      # секунд до повтора, удваивается на каждой попытке
+    EXECUTION_RETRY_MAX_DELAY: float = 120.0
+    EXECUTION_TIMEOUT: int = 3600           # секунд на execution, дальше — сбой ноды и повтор (0 — без ограничения)
+    USER_LIMITS_CACHE_TTL: int = 300        # секунд, кэш UserLimits в процессе (правки админа сбрасывают сразу)
+    USER_CACHE_TTL: int = 30                # секунд, кэш User для get_current_user (правки админа сбрасывают сразу)
+    PASSWORD_HASH_WORKERS: int = 2          # потоков bcrypt (одновременных login / создания пользователей)
+
+    # affinity: полностью "тёплая" нода (модели job уже загружены) стоит
+    # NODE_AFFINITY_WEIGHT активных job; 0 — выбирать только по загрузке
+    NODE_AFFINITY_WEIGHT: float = 1.5
+    NODE_AFFINITY_WINDOW: int = 2           # сколько последних job на ноде считаем "тёплыми"
+
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = 'memory'      # memory | redis
+    RATE_LIMIT_REDIS_URL: str | None = None  # redis://localhost:6379/0
+    RATE_LIMIT_TRUST_FORWARDED: bool = False  # IP клиента из X-Forwarded-For (за reverse proxy)
+    # группа -> regex пути, методы, [токенов в секунду, burst] на пользователя и на IP
+    RATE_LIMIT_RULES: Dict[str, Dict[str, Any]] = {
+        'submit': {'pattern': r'^/user/workflows/[^/]+/run$', 'methods': ['POST'], 'user': [0.1, 5], 'ip': [0.5, 20]},
+        'poll': {'pattern': r'^/user/jobs/[^/]+/state$', 'methods': ['GET'], 'user': [5, 20], 'ip': [20, 60]},
+        'images': {
+            'pattern': r'^/(comfy/view/|user/jobs/[^/]+/(image|input/))',
+            'methods': ['GET'],
+            'user': [20, 100],
+            'ip': [50, 200],
+        },
+        'login': {'pattern': r'^/(login|auth/login|admin/login)$', 'methods': ['POST'], 'ip': [0.2, 10]},
+    }
+
     STORAGE_ROOT: str
 
+    STORAGE_BACKEND: str = 'local'     # local | s3
+    S3_ENDPOINT_URL: str | None = None  # MinIO / moto: http://localhost:9000
+    S3_BUCKET: str | None = None
+    S3_ACCESS_KEY: str | None = None
+    S3_SECRET_KEY: str | None = None
+    S3_REGION: str | None = None
+    S3_PREFIX: str = ''
+    S3_PRESIGN_EXPIRES: int = 3600     # секунд
+
+    THUMBNAIL_FORMAT: str = 'WEBP'    # WEBP | AVIF
+    THUMBNAIL_QUALITY: int = 80
+    THUMBNAIL_WORKERS: int = 2
+
+    STORAGE_GC_ENABLED: bool = True
+    STORAGE_GC_INTERVAL: int = 3600         # секунд
+    STORAGE_GC_BATCH_SIZE: int = 100        # файлов за пачку
+    STORAGE_GC_BATCH_PAUSE: float = 1.0     # секунд между пачками
+    STORAGE_RETENTION_INPUT_DAYS: int = 7
+    STORAGE_RETENTION_MASK_DAYS: int = 7
+    STORAGE_RETENTION_OUTPUT_DAYS: int = 30
+
     model_config = SettingsConfigDict(
         # env_file=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
         env_file='.env'
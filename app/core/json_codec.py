@@ -0,0 +1,69 @@
+"""
+JSON codec: orjson, если установлен (JSON_CODEC=auto | orjson), иначе stdlib json.
+
+Используется для тел запросов / ответов ComfyUI (comfy_client), JSON-колонок
+SQLAlchemy (json_serializer / json_deserializer движка) и ответов FastAPI
+(default_response_class). orjson — опциональная зависимость.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+
+
+try:
+    import orjson
+except ImportError:   # pragma: no cover - зависит от окружения
+    orjson = None
+
+
+def _use_orjson() -> bool:
+    codec = (settings.JSON_CODEC or 'auto').lower()
+    if codec == 'json':
+        return False
+    if codec == 'orjson' and orjson is None:
+        raise RuntimeError('JSON_CODEC=orjson requires orjson to be installed')
+    return orjson is not None
+
+
+USE_ORJSON = _use_orjson()
+
+# str-ключи не обязательны (как у json), numpy — на случай ответов custom-нод
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson is not None else 0
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    if USE_ORJSON:
+        try:
+            return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+        except TypeError:
+            # int > 64 бит (seed 0xffffffffffffffff), неизвестные типы — как раньше, через json
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def dumps(obj: Any) -> str:
+    return dumps_bytes(obj).decode('utf-8')
+
+
+def loads(data: str | bytes | bytearray) -> Any:
+    if USE_ORJSON:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN / Infinity orjson не принимает, stdlib — да
+            pass
+    return json.loads(data)
+
+
+class CodecJSONResponse(JSONResponse):
+    """
+    JSONResponse через dumps_bytes (orjson, если есть).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
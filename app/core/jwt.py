@@ -1,8 +1,18 @@
+import time
+from collections import OrderedDict
+from typing import Tuple
+
 from jose import jwt
+from jose.exceptions import ExpiredSignatureError
 from datetime import datetime, timedelta, timezone
 from app.core.config import settings
 
 
+# подпись -> (token, payload, exp): проверенные токены до их истечения
+_DECODED: "OrderedDict[str, Tuple[str, dict, float]]" = OrderedDict()
+_DECODED_MAX = 10_000
+
+
 def create_token(data: dict, expires_delta: timedelta) -> str:
     to_encode = data.copy()
     to_encode['exp'] = datetime.now(timezone.utc) + expires_delta
@@ -25,3 +35,30 @@ def create_refresh_token(user_id: int) -> str:
         {'sub': str(user_id), 'type': 'refresh'},
         timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
     )
+
+
+def decode_token(token: str) -> dict:
+    """
+    jwt.decode с кэшем: уже проверенный токен (по подписи) не проверяется
+    повторно до exp. Бросает JWTError (включая истёкший). payload не изменять.
+    """
+    signature = token.rpartition('.')[2]
+    cached = _DECODED.get(signature)
+    if cached is not None and cached[0] == token:
+        if cached[2] > time.time():
+            return cached[1]
+        _DECODED.pop(signature, None)
+        raise ExpiredSignatureError('Signature has expired.')
+
+    payload = jwt.decode(
+        token,
+        settings.SECRET_KEY,
+        algorithms=[settings.ALGORITHM],
+    )
+
+    exp = payload.get('exp')
+    if isinstance(exp, (int, float)):
+        _DECODED[signature] = (token, payload, float(exp))
+        while len(_DECODED) > _DECODED_MAX:
+            _DECODED.popitem(last=False)
+    return payload
@@ -0,0 +1,243 @@
+"""
+Rate limiting: token bucket на пользователя и на IP, отдельно для каждой группы
+маршрутов (RATE_LIMIT_RULES). Хранилище — в процессе (memory) или Redis
+(RATE_LIMIT_BACKEND=redis, общее для нескольких инстансов). redis — опциональная
+зависимость, в тестах подходит fakeredis.
+
+Middleware — чистый ASGI (без BaseHTTPMiddleware): запросы вне групп проходят
+без накладных расходов, превышение — 429 с Retry-After.
+"""
+from __future__ import annotations
+
+import math
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from jose import JWTError
+from loguru import logger
+
+from app.core.config import settings
+from app.core.json_codec import CodecJSONResponse
+from app.core.jwt import decode_token
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    name: str
+    pattern: "re.Pattern[str]"
+    methods: frozenset
+    # (токенов в секунду, burst) или None — по этому ключу не ограничиваем
+    user: Optional[Tuple[float, float]]
+    ip: Optional[Tuple[float, float]]
+
+
+def parse_rules(raw: Dict[str, Dict[str, Any]]) -> List[RateLimitRule]:
+    rules = []
+    for name, spec in raw.items():
+        rules.append(RateLimitRule(
+            name=name,
+            pattern=re.compile(spec['pattern']),
+            methods=frozenset(m.upper() for m in spec.get('methods') or ('GET', 'POST')),
+            user=tuple(spec['user']) if spec.get('user') else None,
+            ip=tuple(spec['ip']) if spec.get('ip') else None,
+        ))
+    return rules
+
+
+def take_token(tokens: float, updated_at: float, now: float, rate: float, burst: float) -> Tuple[float, float]:
+    """
+    Один шаг token bucket -> (остаток токенов, retry_after).
+    retry_after = 0 — токен взят; иначе — через сколько секунд появится.
+    """
+    tokens = min(burst, tokens + max(0.0, now - updated_at) * rate)
+    if tokens >= 1.0:
+        return tokens - 1.0, 0.0
+    return tokens, (1.0 - tokens) / rate
+
+
+class MemoryRateLimitStore:
+    """
+    Бакеты в памяти процесса (один инстанс приложения).
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # key -> [tokens, updated_at]
+        self.buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = [float(burst), now]
+            self.buckets[key] = bucket
+            if len(self.buckets) > self.max_keys:
+                # давно не обращавшиеся ключи — их бакеты и так полные
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+
+        bucket[0], retry_after = take_token(bucket[0], bucket[1], now, rate, burst)
+        bucket[1] = now
+        return retry_after
+
+
+# KEYS[1] — бакет; ARGV: rate, burst, now. Атомарно, как take_token.
+_REDIS_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(retry_after)
+"""
+
+
+class RedisRateLimitStore:
+    """
+    Бакеты в Redis (общие для всех инстансов). client — redis.asyncio.Redis
+    или fakeredis.aioredis.FakeRedis. Redis недоступен — запрос пропускаем.
+    """
+
+    def __init__(self, client: Any, prefix: str = 'rl:'):
+        self.client = client
+        self.prefix = prefix
+        self.script = client.register_script(_REDIS_TAKE_SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        try:
+            result = await self.script(keys=[self.prefix + key], args=[rate, burst, time.time()])
+        except Exception as e:
+            logger.warning(f'[rate-limit] redis unavailable, request allowed: {e}')
+            return 0.0
+        return float(result)
+
+
+def create_rate_limit_store():
+    backend = (settings.RATE_LIMIT_BACKEND or 'memory').lower()
+    if backend == 'memory':
+        return MemoryRateLimitStore()
+    if backend == 'redis':
+        try:
+            import redis.asyncio as aioredis
+        except ImportError as e:
+            raise RuntimeError('RATE_LIMIT_BACKEND=redis requires redis to be installed') from e
+        if not settings.RATE_LIMIT_REDIS_URL:
+            raise RuntimeError('RATE_LIMIT_BACKEND=redis requires RATE_LIMIT_REDIS_URL')
+        return RedisRateLimitStore(aioredis.from_url(settings.RATE_LIMIT_REDIS_URL))
+    raise RuntimeError(f'Unknown RATE_LIMIT_BACKEND: {settings.RATE_LIMIT_BACKEND}')
+
+
+def _user_id_from_token(token: str) -> Optional[int]:
+    # decode_token кэширует проверенные токены — jose.decode дороже самого лимитера
+    try:
+        payload = decode_token(token)
+        if payload.get('type') != 'access':
+            return None
+        return int(payload.get('sub'))
+    except (JWTError, ValueError, TypeError):
+        return None
+
+
+def _header(scope: Dict[str, Any], name: bytes) -> Optional[str]:
+    for key, value in scope.get('headers') or ():
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def _access_token(scope: Dict[str, Any]) -> Optional[str]:
+    # как deps.extract_token: Bearer, иначе cookie access_token
+    auth = _header(scope, b'authorization')
+    if auth and auth.startswith('Bearer '):
+        return auth.split(' ', 1)[1]
+    cookie = _header(scope, b'cookie')
+    if not cookie or 'access_token=' not in cookie:
+        return None
+    # SimpleCookie на порядок медленнее, а JWT кавычек / экранирования не содержит
+    for part in cookie.split(';'):
+        name, _, value = part.strip().partition('=')
+        if name == 'access_token':
+            return value.strip('"')
+    return None
+
+
+class RateLimitMiddleware:
+    def __init__(
+            self,
+            app,
+            *,
+            rules: Sequence[RateLimitRule],
+            store: Any,
+            trust_forwarded: bool = False,
+    ):
+        self.app = app
+        self.rules = list(rules)
+        self.store = store
+        self.trust_forwarded = trust_forwarded
+
+    def _match(self, method: str, path: str) -> Optional[RateLimitRule]:
+        for rule in self.rules:
+            if method in rule.methods and rule.pattern.match(path):
+                return rule
+        return None
+
+    def _client_ip(self, scope: Dict[str, Any]) -> str:
+        if self.trust_forwarded:
+            forwarded = _header(scope, b'x-forwarded-for')
+            if forwarded:
+                return forwarded.split(',', 1)[0].strip()
+        client = scope.get('client')
+        return client[0] if client else 'unknown'
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        rule = self._match(scope['method'], scope['path'])
+        if rule is None:
+            return await self.app(scope, receive, send)
+
+        retry_after = 0.0
+        if rule.ip:
+            retry_after = await self.store.take(f'{rule.name}:ip:{self._client_ip(scope)}', *rule.ip)
+
+        if rule.user and not retry_after:
+            token = _access_token(scope)
+            user_id = _user_id_from_token(token) if token else None
+            if user_id is not None:
+                retry_after = await self.store.take(f'{rule.name}:user:{user_id}', *rule.user)
+
+        if retry_after:
+            response = CodecJSONResponse(
+                {'detail': 'Too many requests'},
+                status_code=429,
+                headers={'Retry-After': str(max(1, math.ceil(retry_after)))},
+            )
+            return await response(scope, receive, send)
+
+        return await self.app(scope, receive, send)
+
+
+def install_rate_limiter(app) -> None:
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    app.add_middleware(
+        RateLimitMiddleware,
+        rules=parse_rules(settings.RATE_LIMIT_RULES),
+        store=create_rate_limit_store(),
+        trust_forwarded=settings.RATE_LIMIT_TRUST_FORWARDED,
+    )
@@ -1,9 +1,21 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
 from passlib.context import CryptContext
 
+from app.core.config import settings
+
 
 # pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 pwd_context = CryptContext(schemes=['bcrypt_sha256'], deprecated='auto')
 
+# bcrypt отпускает GIL, поэтому пула потоков достаточно; размер пула —
+# одновременно считаемых хэшей, остальные ждут в очереди, не блокируя event loop
+_EXECUTOR = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix='password-hash',
+)
+
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -11,3 +23,17 @@ def hash_password(password: str) -> str:
 
 def verify_password(password: str, hashed: str) -> bool:
     return pwd_context.verify(password, hashed)
+
+
+async def hash_password_async(password: str) -> str:
+    """
+    hash_password в пуле потоков (для async-обработчиков).
+    """
+    return await asyncio.get_running_loop().run_in_executor(_EXECUTOR, hash_password, password)
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    """
+    verify_password в пуле потоков (для async-обработчиков).
+    """
+    return await asyncio.get_running_loop().run_in_executor(_EXECUTOR, verify_password, password, hashed)
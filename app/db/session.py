@@ -4,6 +4,7 @@ from sqlalchemy.ext.asyncio import (
     AsyncSession
 )
 from app.core.config import settings
+from app.core.json_codec import dumps, loads
 
 
 DATABASE_URL = f'postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASS}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}'
@@ -12,7 +13,10 @@ DATABASE_URL = f'postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASS}@{set
 engine = create_async_engine(
     DATABASE_URL,
     echo=False,
-    pool_pre_ping=True
+    pool_pre_ping=True,
+    # JSON-колонки (workflow_json, prepared_workflow, result ...) — через orjson, если есть
+    json_serializer=dumps,
+    json_deserializer=loads
 )
 
 
@@ -6,11 +6,15 @@ from contextlib import asynccontextmanager
 
 from app.core.config import settings
 from app.core.logging import setup_logging
+from app.core.json_codec import CodecJSONResponse
 from app.db.session import AsyncSessionLocal
 from app.core.bootstrap import create_initial_admin
 from app.services.comfy_health import healthcheck_loop
 from app.services.scheduler_loop import scheduler_loop
+from app.services.storage_gc import storage_gc_loop
 from app.core.errors import install_auth_exception_handlers
+from app.core.rate_limit import install_rate_limiter
+from app.services.storage_backend import get_storage_backend
 
 from app.api.auth import router as auth_router
 from app.api.admin.users import router as admin_users_router
@@ -18,6 +22,7 @@ from app.api.admin.user_limits import router as user_limits_router
 from app.api.admin.comfy_nodes import router as comfy_nodes_router
 from app.api.admin.health import router as health_router
 from app.api.admin.workflows import router as workflows_router
+from app.api.admin.storage import router as admin_storage_router
 from app.admin.router import router as admin_router
 from app.admin.jobs_router import router as admin_jobs_router
 from app.user.router import router as user_router
@@ -36,11 +41,14 @@ async def lifespan(app: FastAPI):
     
     health_task = asyncio.create_task(healthcheck_loop())
     scheduler_task = asyncio.create_task(scheduler_loop())
+    gc_task = asyncio.create_task(storage_gc_loop()) if settings.STORAGE_GC_ENABLED else None
     
     yield
 
     health_task.cancel()
     scheduler_task.cancel()
+    if gc_task:
+        gc_task.cancel()
 
     # SHUTDOWN
     # здесь можно закрывать соединения, если нужно
@@ -52,13 +60,17 @@ def create_app() -> FastAPI:
     app = FastAPI(
         title=settings.PROJECT_NAME,
         lifespan=lifespan,
-        debug=settings.DEBAG
+        debug=settings.DEBAG,
+        default_response_class=CodecJSONResponse
     )
 
     install_auth_exception_handlers(app)
+    install_rate_limiter(app)
 
     app.mount('/static', StaticFiles(directory='app/static'), name='static')
-    app.mount('/storage', StaticFiles(directory=settings.STORAGE_ROOT), name='storage')
+    # при внешнем хранилище (s3) файлы отдаются presigned-ссылками, а не через /storage
+    if get_storage_backend().name == 'local':
+        app.mount('/storage', StaticFiles(directory=settings.STORAGE_ROOT), name='storage')
 
     @app.get('/health', tags=['system'])
     def health_check():
@@ -72,6 +84,7 @@ def create_app() -> FastAPI:
     app.include_router(comfy_nodes_router, prefix=settings.API_V1_STR)
     app.include_router(health_router, prefix=settings.API_V1_STR)
     app.include_router(workflows_router, prefix=settings.API_V1_STR)
+    app.include_router(admin_storage_router, prefix=settings.API_V1_STR)
     app.include_router(admin_router)
     app.include_router(admin_jobs_router)
     app.include_router(user_workflow_router)
@@ -0,0 +1,28 @@
+"""add jobs.batch_size
+
+Revision ID: 1a8c5e07b3f2
+Revises: d6b3f81a2c97
+Create Date: 2026-10-19 20:48:03.115642
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1a8c5e07b3f2'
+down_revision: Union[str, Sequence[str], None] = 'd6b3f81a2c97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('batch_size', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('jobs', 'batch_size')
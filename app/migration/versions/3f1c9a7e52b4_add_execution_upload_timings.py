@@ -0,0 +1,28 @@
+"""add job_executions.upload_timings
+
+Revision ID: 3f1c9a7e52b4
+Revises: e035122a26d7
+Create Date: 2026-10-19 10:12:41.218304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7e52b4'
+down_revision: Union[str, Sequence[str], None] = 'e035122a26d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('job_executions', sa.Column('upload_timings', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('job_executions', 'upload_timings')
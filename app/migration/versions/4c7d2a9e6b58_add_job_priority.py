@@ -0,0 +1,28 @@
+"""add jobs.priority
+
+Revision ID: 4c7d2a9e6b58
+Revises: 8f2e6c4d0a19
+Create Date: 2026-10-19 22:14:26.830514
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c7d2a9e6b58'
+down_revision: Union[str, Sequence[str], None] = '8f2e6c4d0a19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('priority', sa.String(), server_default='interactive', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('jobs', 'priority')
@@ -0,0 +1,28 @@
+"""add workflows.updated_at
+
+Revision ID: 5b7e0d2c9f41
+Revises: a84d2e6b0c13
+Create Date: 2026-10-19 14:22:08.113604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e0d2c9f41'
+down_revision: Union[str, Sequence[str], None] = 'a84d2e6b0c13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('workflows', sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('workflows', 'updated_at')
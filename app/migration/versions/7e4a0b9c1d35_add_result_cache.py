@@ -0,0 +1,54 @@
+"""add result cache
+
+Revision ID: 7e4a0b9c1d35
+Revises: c2d91f4e7a60
+Create Date: 2026-10-19 18:05:12.604117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e4a0b9c1d35'
+down_revision: Union[str, Sequence[str], None] = 'c2d91f4e7a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('prompt_hash', sa.String(), nullable=True))
+    op.create_index(op.f('ix_jobs_prompt_hash'), 'jobs', ['prompt_hash'], unique=False)
+    op.add_column('job_executions', sa.Column('source_execution_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(None, 'job_executions', 'job_executions', ['source_execution_id'], ['id'])
+    op.add_column('workflows', sa.Column('result_cache_enabled', sa.Boolean(), server_default='true', nullable=False))
+    op.create_table('result_cache',
+    sa.Column('prompt_hash', sa.String(), nullable=False),
+    sa.Column('workflow_id', sa.String(), nullable=False),
+    sa.Column('job_id', sa.String(), nullable=False),
+    sa.Column('execution_id', sa.Integer(), nullable=False),
+    sa.Column('hits', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('last_hit_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['execution_id'], ['job_executions.id'], ),
+    sa.ForeignKeyConstraint(['job_id'], ['jobs.id'], ),
+    sa.ForeignKeyConstraint(['workflow_id'], ['workflows.id'], ),
+    sa.PrimaryKeyConstraint('prompt_hash')
+    )
+    op.create_index(op.f('ix_result_cache_created_at'), 'result_cache', ['created_at'], unique=False)
+    op.create_index(op.f('ix_result_cache_workflow_id'), 'result_cache', ['workflow_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_result_cache_workflow_id'), table_name='result_cache')
+    op.drop_index(op.f('ix_result_cache_created_at'), table_name='result_cache')
+    op.drop_table('result_cache')
+    op.drop_column('workflows', 'result_cache_enabled')
+    op.drop_constraint('job_executions_source_execution_id_fkey', 'job_executions', type_='foreignkey')
+    op.drop_column('job_executions', 'source_execution_id')
+    op.drop_index(op.f('ix_jobs_prompt_hash'), table_name='jobs')
+    op.drop_column('jobs', 'prompt_hash')
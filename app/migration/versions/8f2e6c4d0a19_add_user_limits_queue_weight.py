@@ -0,0 +1,30 @@
+"""add user_limits.queue_weight
+
+Revision ID: 8f2e6c4d0a19
+Revises: 1a8c5e07b3f2
+Create Date: 2026-10-19 21:36:50.472981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f2e6c4d0a19'
+down_revision: Union[str, Sequence[str], None] = '1a8c5e07b3f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('user_limits', sa.Column('queue_weight', sa.Integer(), server_default='1', nullable=False))
+    op.create_index('ix_jobs_status_user_created', 'jobs', ['status', 'user_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_jobs_status_user_created', table_name='jobs')
+    op.drop_column('user_limits', 'queue_weight')
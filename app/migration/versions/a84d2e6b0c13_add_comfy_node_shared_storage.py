@@ -0,0 +1,30 @@
+"""add comfy_nodes shared storage settings
+
+Revision ID: a84d2e6b0c13
+Revises: 3f1c9a7e52b4
+Create Date: 2026-10-19 11:03:17.540921
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a84d2e6b0c13'
+down_revision: Union[str, Sequence[str], None] = '3f1c9a7e52b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('comfy_nodes', sa.Column('shared_storage_prefix', sa.String(), nullable=True))
+    op.add_column('comfy_nodes', sa.Column('shared_input_dir', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('comfy_nodes', 'shared_input_dir')
+    op.drop_column('comfy_nodes', 'shared_storage_prefix')
@@ -0,0 +1,44 @@
+"""add user job counters
+
+Revision ID: b5e19d3f7c2a
+Revises: 4c7d2a9e6b58
+Create Date: 2026-10-19 23:02:47.115093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e19d3f7c2a'
+down_revision: Union[str, Sequence[str], None] = '4c7d2a9e6b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_job_counters',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('hour', sa.DateTime(), nullable=False),
+    sa.Column('jobs', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'hour')
+    )
+    # счётчики за последние сутки — из уже созданных job
+    op.execute(
+        """
+        INSERT INTO user_job_counters (user_id, hour, jobs)
+        SELECT user_id, date_trunc('hour', created_at), count(*)
+        FROM jobs
+        WHERE created_at >= now() - interval '25 hours'
+        GROUP BY user_id, date_trunc('hour', created_at)
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_job_counters')
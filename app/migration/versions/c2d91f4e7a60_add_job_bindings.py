@@ -0,0 +1,28 @@
+"""add jobs.bindings
+
+Revision ID: c2d91f4e7a60
+Revises: 5b7e0d2c9f41
+Create Date: 2026-10-19 16:40:51.372204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d91f4e7a60'
+down_revision: Union[str, Sequence[str], None] = '5b7e0d2c9f41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('bindings', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('jobs', 'bindings')
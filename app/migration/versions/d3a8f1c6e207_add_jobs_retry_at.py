@@ -0,0 +1,28 @@
+"""add jobs.retry_at
+
+Revision ID: d3a8f1c6e207
+Revises: b5e19d3f7c2a
+Create Date: 2026-10-19 23:41:08.516207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a8f1c6e207'
+down_revision: Union[str, Sequence[str], None] = 'b5e19d3f7c2a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('retry_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('jobs', 'retry_at')
@@ -0,0 +1,29 @@
+"""add job_executions.source_kind
+
+Revision ID: d6b3f81a2c97
+Revises: 7e4a0b9c1d35
+Create Date: 2026-10-19 19:22:37.918450
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6b3f81a2c97'
+down_revision: Union[str, Sequence[str], None] = '7e4a0b9c1d35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('job_executions', sa.Column('source_kind', sa.String(), nullable=True))
+    op.execute("UPDATE job_executions SET source_kind = 'cache' WHERE source_execution_id IS NOT NULL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('job_executions', 'source_kind')
@@ -0,0 +1,30 @@
+"""add jobs.workflow_version / workflow_updated_at
+
+Revision ID: e6b2c9d4a715
+Revises: d3a8f1c6e207
+Create Date: 2026-10-20 10:12:47.203918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b2c9d4a715'
+down_revision: Union[str, Sequence[str], None] = 'd3a8f1c6e207'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('workflow_version', sa.String(), nullable=True))
+    op.add_column('jobs', sa.Column('workflow_updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('jobs', 'workflow_updated_at')
+    op.drop_column('jobs', 'workflow_version')
@@ -5,3 +5,5 @@ from app.models.job import Job
 from app.models.job_execution import JobExecution
 from app.models.file import File
 from app.models.user_limits import UserLimits
+from app.models.result_cache import ResultCacheEntry
+from app.models.user_job_counter import UserJobCounter
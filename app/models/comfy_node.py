@@ -17,5 +17,11 @@ class ComfyNode(Base):
     max_queue: Mapped[int] = mapped_column(Integer, default=1)
     priority: Mapped[int] = mapped_column(Integer, default=10)
 
+    # Общая ФС с приложением (NFS / тот же хост):
+    # shared_storage_prefix — как нода видит STORAGE_ROOT (для LoadImageFromPath)
+    # shared_input_dir — input-каталог ComfyUI, как его видит приложение (hardlink вместо upload)
+    shared_storage_prefix: Mapped[str | None] = mapped_column(String, nullable=True)
+    shared_input_dir: Mapped[str | None] = mapped_column(String, nullable=True)
+
     last_seen: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
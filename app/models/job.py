@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy import Integer, String, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime, timezone
 
@@ -7,6 +7,10 @@ from app.db.base import Base
 
 class Job(Base):
     __tablename__ = 'jobs'
+    # очередь: QUEUED job по пользователям в порядке создания (fair_queue)
+    __table_args__ = (
+        Index('ix_jobs_status_user_created', 'status', 'user_id', 'created_at'),
+    )
 
     id: Mapped[str] = mapped_column(primary_key=True)
 
@@ -14,13 +18,27 @@ class Job(Base):
     workflow_id: Mapped[str] = mapped_column(ForeignKey('workflows.id'), index=True)
 
     mode: Mapped[str] = mapped_column(String)
+    # вариантов в одном prompt (batch_size латента), результат делится на N
+    batch_size: Mapped[int] = mapped_column(Integer, default=1, server_default='1')
 
     inputs: Mapped[dict] = mapped_column(JSON)
     files: Mapped[dict] = mapped_column(JSON)
 
     prepared_workflow: Mapped[dict] = mapped_column(JSON)
+    # версия workflow, из которой собран prepared_workflow (prompt_template берёт только её)
+    workflow_version: Mapped[str | None] = mapped_column(String, nullable=True)
+    workflow_updated_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # записи маппера [[node_id, field, value], ...] — для сборки prompt из шаблона (prompt_template)
+    bindings: Mapped[list | None] = mapped_column(JSON, nullable=True)
+    # sha256 итогового prompt + входных файлов — ключ кэша результатов (result_cache)
+    prompt_hash: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
 
     status: Mapped[str] = mapped_column(String, default='QUEUED')     # QUEUED | RUNNING | DONE | ERROR
+    # класс очереди: interactive | batch | background (см. fair_queue.PRIORITY_CLASSES)
+    priority: Mapped[str] = mapped_column(String, default='interactive', server_default='interactive')
+
+    # повтор после сбоя ноды (job_service): не раньше этого времени и на другой ноде
+    retry_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
     result: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     error_message: Mapped[str | None] = mapped_column(String, nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, String, DateTime, ForeignKey
+from sqlalchemy import Integer, String, DateTime, ForeignKey, JSON
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime, timezone
 
@@ -19,6 +19,13 @@ class JobExecution(Base):
 
     prompt_id: Mapped[str | None] = mapped_column(String, nullable=True)
 
+    # key -> {bytes, read_ms, upload_ms, attempts}
+    upload_timings: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+
+    # результат не считался отдельно: execution, которое его посчитало (node_id / prompt_id скопированы оттуда)
+    source_execution_id: Mapped[int | None] = mapped_column(ForeignKey('job_executions.id'), nullable=True)
+    source_kind: Mapped[str | None] = mapped_column(String, nullable=True)    # cache | coalesced
+
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
     started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
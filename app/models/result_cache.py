@@ -0,0 +1,22 @@
+from sqlalchemy import Integer, String, DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+
+from app.db.base import Base
+
+
+class ResultCacheEntry(Base):
+    __tablename__ = 'result_cache'
+
+    # sha256 канонического prompt + хэшей входных файлов (Job.prompt_hash)
+    prompt_hash: Mapped[str] = mapped_column(String, primary_key=True)
+
+    workflow_id: Mapped[str] = mapped_column(ForeignKey('workflows.id'), index=True)
+    job_id: Mapped[str] = mapped_column(ForeignKey('jobs.id'))
+    # execution, которое реально считало результат (нода + prompt_id для /view)
+    execution_id: Mapped[int] = mapped_column(ForeignKey('job_executions.id'))
+
+    hits: Mapped[int] = mapped_column(Integer, default=0)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, index=True)
+    last_hit_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
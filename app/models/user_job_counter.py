@@ -0,0 +1,16 @@
+from sqlalchemy import Integer, DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+
+from app.db.base import Base
+
+
+class UserJobCounter(Base):
+    __tablename__ = 'user_job_counters'
+
+    # job, созданные пользователем за час hour (начало часа);
+    # дневной лимит — сумма последних 24 строк вместо count(*) по jobs
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), primary_key=True)
+    hour: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+
+    jobs: Mapped[int] = mapped_column(Integer, default=0)
@@ -14,5 +14,7 @@ class UserLimits(Base):
 
     max_concurrent_jobs: Mapped[int] = mapped_column(Integer, default=1)
     max_jobs_per_day: Mapped[int] = mapped_column(Integer, default=100)
+    # доля в fair-share очереди: вес 2 — вдвое больше job за круг, чем у веса 1
+    queue_weight: Mapped[int] = mapped_column(Integer, default=1, server_default='1')
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
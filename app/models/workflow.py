@@ -18,8 +18,12 @@ class Workflow(Base):
 
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     requires_mask: Mapped[bool] = mapped_column(Boolean, default=False)
+    # одинаковые job (тот же prompt + файлы) отдавать из кэша результатов
+    result_cache_enabled: Mapped[bool] = mapped_column(Boolean, default=True, server_default='true')
 
     spec_json: Mapped[dict] = mapped_column(JSON)
     workflow_json: Mapped[dict] = mapped_column(JSON)
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    # меняется при каждом UPDATE — ключ кэша скомпилированных bindings
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, onupdate=datetime.now)
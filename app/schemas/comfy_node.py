@@ -8,6 +8,8 @@ class ComfyNodeBase(BaseModel):
     max_queue: int = 1
     priority: int = 10
     is_active: bool = True
+    shared_storage_prefix: str | None = None
+    shared_input_dir: str | None = None
 
 
 class ComfyNodeCreate(ComfyNodeBase):
@@ -20,6 +22,8 @@ class ComfyNodeUpdate(BaseModel):
     max_queue: int | None = None
     priority: int | None = None
     is_active: bool | None = None
+    shared_storage_prefix: str | None = None
+    shared_input_dir: str | None = None
 
 
 class ComfyNodeOut(ComfyNodeBase):
@@ -1,9 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class UserLimitsBase(BaseModel):
     max_concurrent_jobs: int
     max_jobs_per_day: int
+    queue_weight: int = Field(default=1, ge=1)
 
 
 class UserLimitsUpdate(UserLimitsBase):
@@ -1,13 +1,57 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import time
+import hashlib
+from typing import Any, Dict, Optional, Tuple
 
 import httpx
 from fastapi import HTTPException
 
+from app.core.config import settings
+from app.core.json_codec import dumps_bytes, loads
 from app.models.comfy_node import ComfyNode
 
 
+class ComfyNodeError(HTTPException):
+    """
+    Ошибка ноды ComfyUI (для API — 502). transient — сбой ноды / сети,
+    job имеет смысл повторить на другой ноде; иначе ошибка в самом prompt.
+    """
+
+    def __init__(self, detail: str, *, transient: bool = True):
+        super().__init__(status_code=502, detail=detail)
+        self.transient = transient
+
+
+def _status_error(prefix: str, response: httpx.Response) -> ComfyNodeError:
+    # 4xx — ComfyUI отклонил запрос (валидация prompt), повтор не поможет
+    return ComfyNodeError(
+        f"{prefix} {response.status_code}: {response.text}",
+        transient=response.status_code >= 500,
+    )
+
+
+def _response_json(endpoint: str, response: httpx.Response) -> Dict[str, Any]:
+    # обрезанный / не-JSON ответ (перезапуск ноды, прокси) — сбой ноды, не prompt
+    try:
+        data = loads(response.content)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        raise ComfyNodeError(f"ComfyUI {endpoint} returned invalid JSON")
+    return data
+
+
+def is_transient_error(error: BaseException) -> bool:
+    if isinstance(error, ComfyNodeError):
+        return error.transient
+    return isinstance(error, httpx.RequestError)
+
+
+# base_url -> (fetched_at, object_info, fingerprint)
+_OBJECT_INFO_CACHE: Dict[str, Tuple[float, Dict[str, Any], str]] = {}
+
+
 def _ensure_prompt_payload(workflow_or_payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     ComfyUI /prompt expects {"prompt": {...}}.
@@ -24,17 +68,21 @@ async def submit_workflow(*, node: ComfyNode, workflow: Dict[str, Any]) -> str:
     timeout = httpx.Timeout(10.0, read=60.0)
     async with httpx.AsyncClient(timeout=timeout) as client:
         try:
-            response = await client.post(url, json=payload)
+            response = await client.post(
+                url,
+                content=dumps_bytes(payload),
+                headers={"Content-Type": "application/json"},
+            )
         except httpx.RequestError as e:
-            raise HTTPException(status_code=502, detail=f"Failed to connect to ComfyUI node: {e}")
+            raise ComfyNodeError(f"Failed to connect to ComfyUI node: {e}")
 
     if response.status_code != 200:
-        raise HTTPException(status_code=502, detail=f"ComfyUI error {response.status_code}: {response.text}")
+        raise _status_error("ComfyUI error", response)
 
-    data = response.json()
+    data = _response_json("/prompt", response)
     prompt_id = data.get("prompt_id")
     if not prompt_id:
-        raise HTTPException(status_code=502, detail="ComfyUI response missing prompt_id")
+        raise ComfyNodeError("ComfyUI response missing prompt_id")
     return str(prompt_id)
 
 
@@ -42,6 +90,20 @@ async def get_object_info(*, node: ComfyNode) -> Dict[str, Any]:
     """
     GET /object_info — источник истины для типов, COMBO и порядка widgets_values.
     """
+    object_info, _ = await get_object_info_snapshot(node=node)
+    return object_info
+
+
+async def get_object_info_snapshot(*, node: ComfyNode) -> Tuple[Dict[str, Any], str]:
+    """
+    (object_info, fingerprint). Ответ кэшируется на COMFY_OBJECT_INFO_TTL секунд;
+    fingerprint (sha1 тела ответа) меняется, только если изменился набор нод / моделей.
+    Возвращаемый dict общий для всех вызывающих — не изменять.
+    """
+    cached = _OBJECT_INFO_CACHE.get(node.base_url)
+    if cached and time.monotonic() - cached[0] < settings.COMFY_OBJECT_INFO_TTL:
+        return cached[1], cached[2]
+
     url = f"{node.base_url}/object_info"
     timeout = httpx.Timeout(10.0, read=60.0)
 
@@ -49,15 +111,16 @@ async def get_object_info(*, node: ComfyNode) -> Dict[str, Any]:
         try:
             r = await client.get(url)
         except httpx.RequestError as e:
-            raise HTTPException(status_code=502, detail=f"Failed to connect to ComfyUI node: {e}")
+            raise ComfyNodeError(f"Failed to connect to ComfyUI node: {e}")
 
     if r.status_code != 200:
-        raise HTTPException(status_code=502, detail=f"ComfyUI error {r.status_code}: {r.text}")
+        raise _status_error("ComfyUI error", r)
 
-    data = r.json()
-    if not isinstance(data, dict):
-        raise HTTPException(status_code=502, detail="ComfyUI /object_info returned invalid JSON")
-    return data
+    data = _response_json("/object_info", r)
+
+    fingerprint = hashlib.sha1(r.content).hexdigest()
+    _OBJECT_INFO_CACHE[node.base_url] = (time.monotonic(), data, fingerprint)
+    return data, fingerprint
 
 
 async def get_prompt_result(*, node: ComfyNode, prompt_id: str) -> Optional[Dict[str, Any]]:
@@ -68,14 +131,12 @@ async def get_prompt_result(*, node: ComfyNode, prompt_id: str) -> Optional[Dict
         try:
             r = await client.get(url)
         except httpx.RequestError as e:
-            raise HTTPException(status_code=502, detail=f"Failed to connect to ComfyUI node: {e}")
+            raise ComfyNodeError(f"Failed to connect to ComfyUI node: {e}")
 
     if r.status_code != 200:
-        raise HTTPException(status_code=502, detail=f"ComfyUI error {r.status_code}: {r.text}")
+        raise _status_error("ComfyUI error", r)
 
-    data = r.json()
-    if not isinstance(data, dict):
-        raise HTTPException(status_code=502, detail="ComfyUI /history returned invalid JSON")
+    data = _response_json("/history", r)
 
     item = data.get(prompt_id)
     if not item:
@@ -84,11 +145,59 @@ async def get_prompt_result(*, node: ComfyNode, prompt_id: str) -> Optional[Dict
     status = (item.get("status") or {}).get("status_str")
     if status and status.lower() in ("running", "pending", "queued"):
         return None
+    if status and status.lower() == "error":
+        # ошибка выполнения самого prompt (execution_error) — на другой ноде будет то же
+        raise ComfyNodeError(_execution_error(item), transient=False)
 
     outputs = item.get("outputs")
     return outputs if isinstance(outputs, dict) else None
 
 
+async def get_queue_prompt_ids(*, node: ComfyNode) -> Tuple[set, set]:
+    """
+    GET /queue -> (prompt_id выполняющихся, prompt_id ожидающих).
+    """
+    url = f"{node.base_url}/queue"
+    timeout = httpx.Timeout(10.0, read=30.0)
+
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        try:
+            r = await client.get(url)
+        except httpx.RequestError as e:
+            raise ComfyNodeError(f"Failed to connect to ComfyUI node: {e}")
+
+    if r.status_code != 200:
+        raise _status_error("ComfyUI error", r)
+
+    data = _response_json("/queue", r)
+
+    def ids(items: Any) -> set:
+        # элемент очереди: [number, prompt_id, prompt, extra_data, outputs]
+        return {str(item[1]) for item in items or [] if isinstance(item, list) and len(item) > 1}
+
+    return ids(data.get("queue_running")), ids(data.get("queue_pending"))
+
+
+async def cancel_prompt(*, node: ComfyNode, prompt_id: str, running: bool) -> None:
+    """
+    Убирает prompt с ноды: ожидающий — из очереди, выполняющийся — /interrupt
+    (ComfyUI прерывает текущий prompt, т.е. именно этот).
+    """
+    timeout = httpx.Timeout(10.0, read=30.0)
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        try:
+            if running:
+                r = await client.post(f"{node.base_url}/interrupt")
+            else:
+                r = await client.post(f"{node.base_url}/queue", content=dumps_bytes({"delete": [prompt_id]}),
+                                      headers={"Content-Type": "application/json"})
+        except httpx.RequestError as e:
+            raise ComfyNodeError(f"Failed to connect to ComfyUI node: {e}")
+
+    if r.status_code != 200:
+        raise _status_error("ComfyUI error", r)
+
+
 async def upload_image_to_comfy(
         base_url: str,
         *,
@@ -111,13 +220,21 @@ async def upload_image_to_comfy(
             response = await client.post(f'{base_url}/api/upload/image', files=files, data=data)
         
         if response.status_code != 200:
-            raise HTTPException(status_code=502, detail=f'ComfyUI upload error {response.status_code}: {response.text}')
+            raise _status_error('ComfyUI upload error', response)
         
-        response_json = response.json()
+        response_json = _response_json('/upload/image', response)
         name = response_json.get('name') or response_json.get('filename')
         if not name:
-            raise HTTPException(status_code=502, detail=f'ComfyUI upload response missing name: {response_json}')
+            raise ComfyNodeError(f'ComfyUI upload response missing name: {response_json}')
         
         if response_json.get('subfolder'):
             return f"{response_json['subfolder']}/{name}"
         return name
+
+
+def _execution_error(history_item: Dict[str, Any]) -> str:
+    for message in (history_item.get("status") or {}).get("messages") or []:
+        if isinstance(message, list) and len(message) > 1 and message[0] == "execution_error":
+            data = message[1] or {}
+            return f"ComfyUI execution error in {data.get('node_type')}: {data.get('exception_message')}"
+    return "ComfyUI execution error"
@@ -8,6 +8,7 @@ import httpx
 from app.core.config import settings
 from app.db.session import AsyncSessionLocal
 from app.models.comfy_node import ComfyNode
+from app.services.node_affinity import forget_node
 
 
 COMFY_PING_ENDPOINT = '/system_stats'
@@ -40,6 +41,9 @@ async def check_all_nodes(db: AsyncSession):
             if node.last_seen and (
                 now - node.last_seen > timedelta(seconds=settings.COMFY_DEAD_AFTER)
             ):
+                if node.is_active:
+                    # после возврата ноды модели придётся грузить заново
+                    forget_node(node.id)
                 node.is_active = False
     
     await db.commit()
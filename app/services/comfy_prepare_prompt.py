@@ -1,15 +1,174 @@
 from __future__ import annotations
 
 import os
+import time
+import uuid
+import shutil
+import asyncio
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+from loguru import logger
 
 from app.core.config import settings
-from app.services.comfy_client import upload_image_to_comfy
+from app.services.comfy_client import is_transient_error, upload_image_to_comfy
+from app.services.storage import BASE_STORAGE_DIR, read_stored_file, resolve_stored_path
 
 # Константы для типов узлов, как во втором файле
 IMAGE_NODE_TYPES = {"LoadImage", "LoadImageFromPath"}
 MASK_NODE_TYPES = {"LoadMask"}
+# Узлы, которые умеют читать файл по абсолютному пути
+PATH_NODE_TYPES = {"LoadImageFromPath"}
+
+
+# base_url -> semaphore: ограничиваем число параллельных загрузок на одну ноду
+_NODE_UPLOAD_SEMAPHORES: Dict[str, asyncio.Semaphore] = {}
+
+
+def _node_upload_semaphore(base_url: str) -> asyncio.Semaphore:
+    sem = _NODE_UPLOAD_SEMAPHORES.get(base_url)
+    if sem is None:
+        sem = asyncio.Semaphore(max(1, settings.COMFY_UPLOAD_CONCURRENCY))
+        _NODE_UPLOAD_SEMAPHORES[base_url] = sem
+    return sem
+
+
+def _is_uploadable_key(key: Any) -> bool:
+    return isinstance(key, str) and (key.startswith("image_") or key.startswith("mask_") or key == "mask")
+
+
+async def _upload_one(
+    *,
+    base_url: str,
+    key: str,
+    rel_path: str,
+) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Читает файл из хранилища (в потоке) и загружает его на ComfyUI с ретраями.
+    Возвращает (key, remote_name, timing) или None, если файла нет.
+    """
+    started = time.perf_counter()
+    content = await asyncio.to_thread(read_stored_file, rel_path)
+    read_ms = (time.perf_counter() - started) * 1000
+    if content is None:
+        return None
+
+    # Формируем имя файла для Comfy: ключ + расширение
+    ext = os.path.splitext(rel_path)[1] or ".png"
+    name = f"{key}{ext}"
+
+    retries = max(1, settings.COMFY_UPLOAD_RETRIES)
+    attempt = 0
+    async with _node_upload_semaphore(base_url):
+        upload_started = time.perf_counter()
+        while True:
+            attempt += 1
+            try:
+                remote_name = await upload_image_to_comfy(
+                    base_url,
+                    filename=name,
+                    content=content,
+                    subfolder="",
+                    overwrite=True,
+                )
+                break
+            except (HTTPException, httpx.HTTPError) as e:
+                # 4xx (файл отклонён, 413 ...) — повтор не поможет
+                if attempt >= retries or not is_transient_error(e):
+                    raise
+                delay = settings.COMFY_UPLOAD_RETRY_BACKOFF * (2 ** (attempt - 1))
+                logger.warning(f"[upload] {name} -> {base_url} failed (attempt {attempt}/{retries}): {e}; retry in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        upload_ms = (time.perf_counter() - upload_started) * 1000
+
+    timing = {
+        "mode": "upload",
+        "bytes": len(content),
+        "read_ms": round(read_ms, 1),
+        "upload_ms": round(upload_ms, 1),
+        "attempts": attempt,
+    }
+    return key, remote_name, timing
+
+
+def _shared_node_path(prefix: str, path: Path) -> Optional[str]:
+    """
+    Локальный путь файла -> путь, по которому его видит нода (prefix вместо STORAGE_ROOT).
+    """
+    try:
+        rel = path.resolve().relative_to(BASE_STORAGE_DIR.resolve())
+    except ValueError:
+        return None
+    return prefix.rstrip("/") + "/" + rel.as_posix()
+
+
+def _link_into_input_dir(input_dir: str, name: str, path: Path) -> str:
+    """
+    Кладёт файл в input-каталог ComfyUI hardlink'ом (на другом томе — копией).
+    Подмена через os.replace, чтобы нода не увидела недописанный файл.
+    """
+    dst = Path(input_dir) / name
+    tmp = dst.with_name(f".{name}.{uuid.uuid4().hex}.tmp")
+    try:
+        os.link(path, tmp)
+    except OSError:
+        shutil.copyfile(path, tmp)
+    os.replace(tmp, dst)
+    return name
+
+
+async def _handoff_shared(
+    *,
+    key: str,
+    rel_path: str,
+    class_type: Optional[str],
+    shared_storage_prefix: Optional[str],
+    shared_input_dir: Optional[str],
+) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Для нод с общей ФС: вместо HTTP upload отдаём путь (LoadImageFromPath)
+    или hardlink в input-каталог ноды. None — передать файл не получилось, нужен upload.
+    """
+    path = resolve_stored_path(rel_path)
+    if path is None:
+        return None
+
+    started = time.perf_counter()
+
+    if shared_storage_prefix and class_type in PATH_NODE_TYPES:
+        remote_path = _shared_node_path(shared_storage_prefix, path)
+        if remote_path:
+            return key, remote_path, {"mode": "path", "handoff_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    if shared_input_dir:
+        ext = os.path.splitext(rel_path)[1] or ".png"
+        try:
+            remote_name = await asyncio.to_thread(_link_into_input_dir, shared_input_dir, f"{key}{ext}", path)
+        except OSError as e:
+            logger.warning(f"[upload] shared handoff failed for {key} -> {shared_input_dir}: {e}; fallback to upload")
+            return None
+        return key, remote_name, {"mode": "hardlink", "handoff_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    return None
+
+
+def _class_types_by_key(prompt: Dict[str, Any]) -> Dict[str, str]:
+    """
+    key файла (image_<id> / mask_<id> / mask) -> class_type узла, который его читает.
+    """
+    result: Dict[str, str] = {}
+    for node_id, node in prompt.items():
+        if not isinstance(node, dict):
+            continue
+        class_type = node.get("class_type")
+        if class_type in IMAGE_NODE_TYPES:
+            result[f"image_{node_id}"] = class_type
+        if class_type in MASK_NODE_TYPES:
+            result[f"mask_{node_id}"] = class_type
+            result.setdefault("mask", class_type)
+    return result
 
 
 async def upload_and_patch_images(
@@ -17,48 +176,53 @@ async def upload_and_patch_images(
     base_url: str,
     prompt_payload: Dict[str, Any],
     stored_files: Dict[str, str],
+    timings: Optional[Dict[str, Any]] = None,
+    shared_storage_prefix: Optional[str] = None,
+    shared_input_dir: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
-    - Загружает все изображения и маски из stored_files на ComfyUI.
+    - Загружает все изображения и маски из stored_files на ComfyUI
+      (параллельно, не больше COMFY_UPLOAD_CONCURRENCY одновременно на ноду).
+    - Если у ноды общая ФС (shared_storage_prefix / shared_input_dir) — файл не загружается,
+      а передаётся путём или hardlink'ом.
     - Патчит узлы LoadImage / LoadImageFromPath / LoadMask в соответствии с ключами.
+    - timings (если передан) заполняется замерами по каждому файлу: key -> {mode, ...}
     """
     prompt = prompt_payload.get("prompt")
     if not isinstance(prompt, dict) or not stored_files:
         return prompt_payload
 
-    storage_root = Path(settings.STORAGE_ROOT)
     uploaded: Dict[str, str] = {}  # key -> remote_name
+    class_types = _class_types_by_key(prompt)
 
-    # 1. Загружаем все подходящие файлы (image_*, mask_*, mask)
-    for key, rel_path in stored_files.items():
-        if not isinstance(key, str) or not isinstance(rel_path, str):
-            continue
-        if not (key.startswith("image_") or key.startswith("mask_") or key == "mask"):
-            continue
+    async def deliver(key: str, rel_path: str):
+        if shared_storage_prefix or shared_input_dir:
+            handed = await _handoff_shared(
+                key=key,
+                rel_path=rel_path,
+                class_type=class_types.get(key),
+                shared_storage_prefix=shared_storage_prefix,
+                shared_input_dir=shared_input_dir,
+            )
+            if handed:
+                return handed
+        return await _upload_one(base_url=base_url, key=key, rel_path=rel_path)
 
-        # Определяем абсолютный путь
-        abs_path = storage_root / rel_path
-        if not abs_path.exists():
-            # Возможно rel_path уже абсолютный
-            abs_path = Path(rel_path)
-            if not abs_path.exists():
-                continue
-
-        # Формируем имя файла для Comfy: ключ + расширение
-        ext = os.path.splitext(str(abs_path))[1] or ".png"
-        name = f"{key}{ext}"
-
-        with open(abs_path, "rb") as f:
-            content = f.read()
-
-        remote_name = await upload_image_to_comfy(
-            base_url,
-            filename=name,
-            content=content,
-            subfolder="",
-            overwrite=True,
-        )
+    # 1. Загружаем все подходящие файлы (image_*, mask_*, mask),
+    #    только если в prompt есть нода, которая их прочитает
+    results = await asyncio.gather(*(
+        deliver(key, rel_path)
+        for key, rel_path in stored_files.items()
+        if _is_uploadable_key(key) and isinstance(rel_path, str) and key in class_types
+    ))
+
+    for item in results:
+        if item is None:
+            continue
+        key, remote_name, timing = item
         uploaded[key] = remote_name
+        if timings is not None:
+            timings[key] = timing
 
     # 2. Патчим узлы в соответствии с загруженными файлами
     for node_id, node in prompt.items():
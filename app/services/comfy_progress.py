@@ -1,11 +1,11 @@
 import time
-import json
 import asyncio
 import websockets
 from loguru import logger
 from dataclasses import dataclass
 from typing import Any, Dict, Optional
 
+from app.core.json_codec import loads
 from app.models.comfy_node import ComfyNode
 
 
@@ -126,7 +126,7 @@ async def track_prompt_progress(
             # В ComfyUI события могут приходить как JSON строки
             async for raw in ws:
                 try:
-                    msg = json.loads(raw)
+                    msg = loads(raw)
                 except Exception:
                     continue
 
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Iterable, Optional, Tuple
 
 
 def _schema_inputs_for_class(object_info: Dict[str, Any], class_type: str) -> Dict[str, Any]:
@@ -104,7 +104,56 @@ def _combo_fix_value(allowed: list, value: Any) -> Any:
     return None
 
 
-def validate_and_fix_prompt(prompt: Dict[str, Any], object_info: Dict[str, Any]) -> Tuple[Dict[str, Any], list[str]]:
+def fix_prompt_input(node_id: Any, k: str, v: Any, schema_entry: Any, warnings: list[str]) -> Any:
+    """
+    Одно значение node.inputs[k] по схеме из object_info (см. validate_and_fix_prompt).
+    Возвращает новое значение (или исходное).
+    """
+    # linked input — не трогаем
+    if _is_link(v):
+        return v
+
+    # COMBO
+    if isinstance(schema_entry, (list, tuple)) and schema_entry and isinstance(schema_entry[0], list):
+        allowed = schema_entry[0]
+
+        # пустое значение -> default
+        if v == "" or v is None:
+            d = _meta_default(schema_entry)
+            if d is not None:
+                warnings.append(f"node {node_id}.{k}: empty -> default '{d}'")
+                return d
+            return v
+
+        fixed = _combo_fix_value(allowed, v)
+        if fixed is not None:
+            if fixed != v:
+                warnings.append(f"node {node_id}.{k}: '{v}' -> '{fixed}' (combo match)")
+            return fixed
+
+        d = _meta_default(schema_entry)
+        if d is not None:
+            warnings.append(f"node {node_id}.{k}: '{v}' not in list -> default '{d}'")
+            return d
+        # если default нет — оставляем как есть, пусть Comfy ругнётся явно
+        return v
+
+    # типы
+    try:
+        coerced = _coerce_value_to_type(schema_entry, v)
+        if coerced != v:
+            warnings.append(f"node {node_id}.{k}: '{v}' -> '{coerced}' (coerce)")
+        return coerced
+    except Exception as e:
+        warnings.append(f"node {node_id}.{k}: failed to coerce '{v}' ({e})")
+        return v
+
+
+def validate_and_fix_prompt(
+        prompt: Dict[str, Any],
+        object_info: Dict[str, Any],
+        only: Optional[Iterable[Tuple[str, str]]] = None,
+) -> Tuple[Dict[str, Any], list[str]]:
     """
     Проходит по всем node.inputs и:
       - приводит типы (int/float/bool)
@@ -113,6 +162,7 @@ def validate_and_fix_prompt(prompt: Dict[str, Any], object_info: Dict[str, Any])
           - иначе ставит default
       - для INT/FLOAT/BOOLEAN:
           - если пришло ""/None, ставит default (если есть)
+    only — проверить только эти (node_id, input) (остальное уже проверено, см. prompt_template).
     Возвращает (prompt, warnings)
     """
     warnings: list[str] = []
@@ -121,6 +171,20 @@ def validate_and_fix_prompt(prompt: Dict[str, Any], object_info: Dict[str, Any])
     if not isinstance(graph, dict):
         return prompt, ["prompt['prompt'] is not a dict"]
 
+    if only is not None:
+        for node_id, k in only:
+            node = graph.get(node_id)
+            if not isinstance(node, dict):
+                continue
+            inputs = node.get("inputs")
+            if not isinstance(inputs, dict) or k not in inputs:
+                continue
+            schema_entry = _schema_inputs_for_class(object_info, str(node.get("class_type"))).get(k)
+            if schema_entry is None:
+                continue
+            inputs[k] = fix_prompt_input(node_id, k, inputs[k], schema_entry, warnings)
+        return prompt, warnings
+
     for node_id, node in graph.items():
         if not isinstance(node, dict):
             continue
@@ -137,43 +201,7 @@ def validate_and_fix_prompt(prompt: Dict[str, Any], object_info: Dict[str, Any])
             if schema_entry is None:
                 continue
 
-            # linked input — не трогаем
-            if _is_link(v):
-                continue
-
-            # COMBO
-            if isinstance(schema_entry, (list, tuple)) and schema_entry and isinstance(schema_entry[0], list):
-                allowed = schema_entry[0]
-
-                # пустое значение -> default
-                if v == "" or v is None:
-                    d = _meta_default(schema_entry)
-                    if d is not None:
-                        inputs[k] = d
-                        warnings.append(f"node {node_id}.{k}: empty -> default '{d}'")
-                    continue
-
-                fixed = _combo_fix_value(allowed, v)
-                if fixed is not None:
-                    if fixed != v:
-                        warnings.append(f"node {node_id}.{k}: '{v}' -> '{fixed}' (combo match)")
-                    inputs[k] = fixed
-                else:
-                    d = _meta_default(schema_entry)
-                    if d is not None:
-                        inputs[k] = d
-                        warnings.append(f"node {node_id}.{k}: '{v}' not in list -> default '{d}'")
-                    # если default нет — оставляем как есть, пусть Comfy ругнётся явно
-                continue
-
-            # типы
-            try:
-                coerced = _coerce_value_to_type(schema_entry, v)
-                if coerced != v:
-                    warnings.append(f"node {node_id}.{k}: '{v}' -> '{coerced}' (coerce)")
-                inputs[k] = coerced
-            except Exception as e:
-                warnings.append(f"node {node_id}.{k}: failed to coerce '{v}' ({e})")
+            inputs[k] = fix_prompt_input(node_id, k, v, schema_entry, warnings)
 
         node["inputs"] = inputs
 
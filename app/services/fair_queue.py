@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Sequence
+
+from sqlalchemy import select, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.job import Job
+from app.models.user_limits import UserLimits
+
+
+# Классы очереди, от старшего к младшему. interactive всегда раньше batch,
+# batch раньше background; ожидание QUEUE_PRIORITY_AGING секунд поднимает
+# job на класс выше (чтобы background не голодал).
+PRIORITY_CLASSES = ('interactive', 'batch', 'background')
+DEFAULT_PRIORITY = 'interactive'
+
+
+class FairShareClock:
+    """
+    Виртуальное время start-time fair queueing.
+
+    finish[user] — виртуальное время, до которого пользователь уже "оплатил"
+    GPU: каждый отправленный job сдвигает его на cost / weight. Пользователь,
+    давно ничего не запускавший, начинает с текущего virtual_time, поэтому
+    его job идёт раньше очередного job из длинной пачки другого пользователя.
+    """
+
+    def __init__(self):
+        self.virtual_time = 0.0
+        self.finish: Dict[int, float] = {}
+        self.weights: Dict[int, int] = {}
+
+    def weight(self, user_id: int) -> int:
+        return max(1, self.weights.get(user_id, 1))
+
+    def start_tag(self, user_id: int, position: int = 0) -> float:
+        """
+        Виртуальное время старта position-го (с 0) job пользователя в очереди.
+        """
+        base = max(self.virtual_time, self.finish.get(user_id, 0.0))
+        return base + position / self.weight(user_id)
+
+    def charge(self, user_id: int, cost: float = 1.0) -> None:
+        """
+        Job пользователя ушёл на выполнение.
+        """
+        start = self.start_tag(user_id)
+        self.finish[user_id] = start + cost / self.weight(user_id)
+        self.virtual_time = start
+
+        # у кого finish уже позади, тот и так стартует с virtual_time
+        if len(self.finish) > 1024:
+            self.finish = {u: f for u, f in self.finish.items() if f > self.virtual_time}
+
+
+_CLOCK = FairShareClock()
+
+
+def priority_rank(priority: str | None) -> int:
+    try:
+        return PRIORITY_CLASSES.index(priority or DEFAULT_PRIORITY)
+    except ValueError:
+        return PRIORITY_CLASSES.index(DEFAULT_PRIORITY)
+
+
+def effective_rank(priority: str | None, waited: float, aging: float) -> int:
+    """
+    Класс с учётом aging: каждые aging секунд ожидания — на класс выше.
+    """
+    rank = priority_rank(priority)
+    if aging > 0:
+        rank -= int(waited // aging)
+    return max(0, rank)
+
+
+def job_rank(job: Any, now: Any) -> int:
+    """
+    Класс job сейчас (с учётом aging): 0 — interactive.
+    """
+    waited = _seconds(now - job.created_at) if now is not None else 0.0
+    return effective_rank(getattr(job, 'priority', None), waited, settings.QUEUE_PRIORITY_AGING)
+
+
+def fair_order(
+        jobs: Iterable[Any],
+        *,
+        clock: FairShareClock,
+        now: Any = None,
+        aging: float = 0,
+) -> List[Any]:
+    """
+    jobs — объекты с user_id / created_at (и priority — необязательно).
+    Сначала класс (с учётом aging от now), внутри класса FIFO у пользователя,
+    между пользователями — по виртуальному времени старта (с учётом весов),
+    при равенстве — кто раньше создан.
+    """
+    per_group: Dict[tuple, List[Any]] = defaultdict(list)
+    for job in jobs:
+        per_group[(job.user_id, priority_rank(getattr(job, 'priority', None)))].append(job)
+
+    keyed = []
+    for (user_id, _), group_jobs in per_group.items():
+        group_jobs.sort(key=lambda j: j.created_at)
+        for position, job in enumerate(group_jobs):
+            waited = _seconds(now - job.created_at) if now is not None else 0.0
+            rank = effective_rank(getattr(job, 'priority', None), waited, aging)
+            keyed.append((rank, clock.start_tag(user_id, position), job.created_at, job))
+
+    keyed.sort(key=lambda item: (item[0], item[1], item[2]))
+    return [job for _, _, _, job in keyed]
+
+
+def _seconds(delta: Any) -> float:
+    return delta.total_seconds() if hasattr(delta, 'total_seconds') else float(delta)
+
+
+async def _queue_weights(db: AsyncSession, user_ids: Sequence[int]) -> Dict[int, int]:
+    rows = (await db.execute(
+        select(UserLimits.user_id, UserLimits.queue_weight)
+        .where(UserLimits.user_id.in_(user_ids))
+    )).all()
+    return {user_id: weight or 1 for user_id, weight in rows}
+
+
+async def select_fair_jobs(
+        *,
+        db: AsyncSession,
+        limit: int,
+) -> List[Job]:
+    """
+    Следующие limit QUEUED job: по классу приоритета, внутри — в fair-share порядке.
+    От каждого пользователя в каждом классе берём не больше limit первых job —
+    больше в ответ всё равно не попадёт.
+    """
+    rank = func.row_number().over(
+        partition_by=(Job.user_id, Job.priority),
+        order_by=(Job.created_at.asc(), Job.id.asc())
+    ).label('rank')
+    head = (
+        select(Job.id, rank)
+        .where(
+            Job.status == 'QUEUED',
+            # после сбоя ноды job ждёт паузу (job_service.retry_execution)
+            or_(Job.retry_at.is_(None), Job.retry_at <= datetime.now())
+        )
+        .subquery()
+    )
+
+    candidates = (await db.execute(
+        select(Job)
+        .join(head, head.c.id == Job.id)
+        .where(head.c.rank <= limit)
+    )).scalars().all()
+    if not candidates:
+        return []
+
+    _CLOCK.weights.update(await _queue_weights(db, list({job.user_id for job in candidates})))
+    return predicted_order(candidates)[:limit]
+
+
+def predicted_order(jobs: Iterable[Any]) -> List[Any]:
+    """
+    Порядок, в котором scheduler отправит эти job при текущем состоянии
+    fair-share (clock не меняется).
+    """
+    return fair_order(
+        jobs,
+        clock=_CLOCK,
+        now=datetime.now(),
+        aging=settings.QUEUE_PRIORITY_AGING,
+    )
+
+
+def charge_job(job: Job) -> None:
+    """
+    Job отправлен на GPU — учитываем в fair-share (кэш / coalescing не учитываются).
+    """
+    _CLOCK.charge(job.user_id)
@@ -1,4 +1,9 @@
+from datetime import datetime, timedelta
+from loguru import logger
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.services.limits import register_job_usage
 from app.models.job import Job
 from app.models.job_execution import JobExecution
 
@@ -9,14 +14,17 @@ async def create_job(
         job: Job
 ): 
     """
-    Хук после создания Job (intent).
+    Сохраняет новый Job (intent) и засчитывает его в дневной лимит
+    пользователя — в одной транзакции, для всех точек создания job.
     """
     # На будущее:
     # - billing
     # - analytics
-    # - rate-limit accounting
 
+    db.add(job)
+    await register_job_usage(db=db, job=job)
     await db.commit()
+    await db.refresh(job)
     return job
 
 
@@ -40,25 +48,134 @@ async def handle_execution_result(
         db: AsyncSession,
         execution: JobExecution,
         result: dict | None = None,
-        error: str | None = None
+        error: str | None = None,
+        transient: bool = False
 ):
     """
     Финализирует Job по результату выполнения execution.
+    transient — сбой ноды: job возвращается в очередь (retry_execution),
+    пока не исчерпаны EXECUTION_MAX_ATTEMPTS.
     """
     job = await db.get(Job, execution.job_id)
     if not job:
         return
     
     if error:
+        execution.status = 'ERROR'
+        execution.error_message = error
+        execution.finished_at = execution.finished_at or datetime.now()
+
+        if transient and await retry_execution(db=db, job=job, execution=execution, error=error):
+            await db.commit()
+            return
+
         job.status = 'ERROR'
         job.error_message = error
     else:
         job.status = 'DONE'
         job.result = result
+
+        from app.services.result_cache import store_result
+        await store_result(db=db, job=job, execution=execution)
+
+        # реальная длительность на GPU — для ETA очереди (кэш / coalescing не считаются)
+        if execution.source_execution_id is None and execution.started_at and execution.finished_at:
+            from app.services.queue_eta import record_duration
+            record_duration(job.workflow_id, (execution.finished_at - execution.started_at).total_seconds())
+
+    await _finish_coalesced(db=db, execution=execution, result=result, error=error)
     
     await db.commit()
 
 
+def retry_delay(attempt: int) -> float:
+    """
+    Пауза перед повтором после attempt неудачных попыток (экспоненциально).
+    """
+    delay = settings.EXECUTION_RETRY_DELAY * 2 ** max(0, attempt - 1)
+    return min(delay, settings.EXECUTION_RETRY_MAX_DELAY)
+
+
+async def retry_execution(
+        *,
+        db: AsyncSession,
+        job: Job,
+        execution: JobExecution,
+        error: str
+) -> bool:
+    """
+    Возвращает job (и присоединённые к execution) в очередь после сбоя ноды.
+    scheduler возьмёт его не раньше job.retry_at и на другую ноду, если есть.
+    False — попытки исчерпаны, job надо финализировать с ошибкой.
+    """
+    # попытки — execution, которые job сам отправлял на ноды (кэш / coalescing не в счёт)
+    attempts = (await db.execute(
+        select(func.count(JobExecution.id))
+        .where(
+            JobExecution.job_id == job.id,
+            JobExecution.source_execution_id.is_(None)
+        )
+    )).scalar_one()
+    if attempts >= settings.EXECUTION_MAX_ATTEMPTS:
+        return False
+
+    retry_at = datetime.now() + timedelta(seconds=retry_delay(attempts))
+    job.status = 'QUEUED'
+    job.retry_at = retry_at
+    logger.warning(
+        f'[retry] job {job.id}: node {execution.node_id} failed (attempt {attempts}), '
+        f'retry at {retry_at:%H:%M:%S}: {error}'
+    )
+
+    rows = (await db.execute(
+        select(JobExecution, Job)
+        .join(Job, Job.id == JobExecution.job_id)
+        .where(
+            JobExecution.source_execution_id == execution.id,
+            JobExecution.status == 'RUNNING'
+        )
+    )).all()
+    for follower, follower_job in rows:
+        follower.status = 'ERROR'
+        follower.error_message = error
+        follower.finished_at = datetime.now()
+        follower_job.status = 'QUEUED'
+        follower_job.retry_at = retry_at
+    return True
+
+
+async def _finish_coalesced(
+        *,
+        db: AsyncSession,
+        execution: JobExecution,
+        result: dict | None,
+        error: str | None
+):
+    """
+    Job, присоединённые к execution (тот же prompt), получают тот же результат.
+    """
+    rows = (await db.execute(
+        select(JobExecution, Job)
+        .join(Job, Job.id == JobExecution.job_id)
+        .where(
+            JobExecution.source_execution_id == execution.id,
+            JobExecution.status == 'RUNNING'
+        )
+    )).all()
+
+    for follower, job in rows:
+        follower.finished_at = datetime.now()
+        if error:
+            follower.status = 'ERROR'
+            follower.error_message = error
+            job.status = 'ERROR'
+            job.error_message = error
+        else:
+            follower.status = 'DONE'
+            job.status = 'DONE'
+            job.result = result
+
+
 async def handle_execution_failure(
         *,
         db: AsyncSession,
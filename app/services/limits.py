@@ -1,9 +1,17 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Tuple
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, delete
+from sqlalchemy.dialects.postgresql import insert
 from datetime import datetime, timedelta
 from fastapi import HTTPException
 
+from app.core.config import settings
 from app.models.job import Job
+from app.models.user_job_counter import UserJobCounter
 from app.models.user_limits import UserLimits
 
 
@@ -39,6 +47,21 @@ from app.models.user_limits import UserLimits
 #     if daily.scalar() >= limits.max_jobs_per_day:
 #         raise Exception('Daily jobs limit reached')
 
+@dataclass(frozen=True)
+class LimitsSnapshot:
+    max_concurrent_jobs: int
+    max_jobs_per_day: int
+    queue_weight: int
+
+
+# user_id -> (monotonic fetched_at, limits); сбрасывается при правке лимитов админом
+_LIMITS: "OrderedDict[int, Tuple[float, LimitsSnapshot]]" = OrderedDict()
+_LIMITS_MAX = 10_000
+
+# счётчики старше суток не нужны — чистим не чаще раза в час
+_COUNTERS_PRUNED_AT = 0.0
+
+
 async def get_user_limits(
         *,
         db: AsyncSession,
@@ -63,25 +86,73 @@ async def get_user_limits(
     return limits
 
 
-async def check_daily_job_limit(
+async def get_cached_limits(
         *,
         db: AsyncSession,
-        user_id: int
-):
+        user_id: int,
+) -> LimitsSnapshot:
+    """
+    Лимиты пользователя из кэша процесса (USER_LIMITS_CACHE_TTL секунд).
+    """
+    cached = _LIMITS.get(user_id)
+    if cached and time.monotonic() - cached[0] < settings.USER_LIMITS_CACHE_TTL:
+        _LIMITS.move_to_end(user_id)
+        return cached[1]
+
     limits = await get_user_limits(db=db, user_id=user_id)
+    snapshot = LimitsSnapshot(
+        max_concurrent_jobs=limits.max_concurrent_jobs,
+        max_jobs_per_day=limits.max_jobs_per_day,
+        queue_weight=limits.queue_weight or 1,
+    )
+    _LIMITS[user_id] = (time.monotonic(), snapshot)
+    _LIMITS.move_to_end(user_id)
+    while len(_LIMITS) > _LIMITS_MAX:
+        _LIMITS.popitem(last=False)
+    return snapshot
+
 
-    since = datetime.now() - timedelta(days=1)
+def invalidate_user_limits(user_id: int) -> None:
+    _LIMITS.pop(user_id, None)
 
+
+def _hour(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+async def get_daily_usage(
+        *,
+        db: AsyncSession,
+        user_id: int
+) -> int:
+    """
+    Job за последние сутки — по часовым счётчикам (≤ 25 строк по первичному ключу).
+    Окно округлено до часа: от 24 до 25 часов.
+    """
+    since = _hour(datetime.now() - timedelta(days=1))
     result = await db.execute(
-        select(func.count(Job.id)).where(
-            Job.user_id == user_id,
-            Job.created_at >= since
+        select(func.coalesce(func.sum(UserJobCounter.jobs), 0)).where(
+            UserJobCounter.user_id == user_id,
+            UserJobCounter.hour >= since
         )
     )
+    return int(result.scalar_one())
 
-    used = result.scalar_one()
 
-    if used >= limits.max_jobs_per_day:
+async def check_daily_job_limit(
+        *,
+        db: AsyncSession,
+        user_id: int,
+        requested: int = 1
+):
+    """
+    requested — сколько job (вариантов batch) хотим добавить.
+    """
+    limits = await get_cached_limits(db=db, user_id=user_id)
+
+    used = await get_daily_usage(db=db, user_id=user_id)
+
+    if used + requested > limits.max_jobs_per_day:
         raise HTTPException(status_code=429, detail='Daily job limit exceeded')
 
 
@@ -90,12 +161,13 @@ async def check_concurrent_jobs_limit(
         db: AsyncSession,
         user_id: int
 ):
-    limits = await get_user_limits(db=db, user_id=user_id)
+    limits = await get_cached_limits(db=db, user_id=user_id)
 
+    # index-only scan по ix_jobs_status_user_created: активных job у пользователя единицы
     result = await db.execute(
         select(func.count(Job.id)).where(
-            Job.user_id == user_id,
-            Job.status.in_(["QUEUED", "RUNNING"])
+            Job.status.in_(["QUEUED", "RUNNING"]),
+            Job.user_id == user_id
         )
     )
 
@@ -111,7 +183,23 @@ async def register_job_usage(
         job: Job
 ):
     """
-    Billing / analytics hook.
+    Учитывает созданный job в часовом счётчике пользователя (коммит — на вызывающем).
+    Job с batch_size = N считается как N: каждый вариант — отдельная генерация на GPU.
     """
-    # На будущее
-    pass
+    global _COUNTERS_PRUNED_AT
+
+    hour = _hour(job.created_at or datetime.now())
+    used = job.batch_size or 1
+    stmt = insert(UserJobCounter).values(user_id=job.user_id, hour=hour, jobs=used)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[UserJobCounter.user_id, UserJobCounter.hour],
+            set_={'jobs': UserJobCounter.jobs + used}
+        )
+    )
+
+    if time.monotonic() - _COUNTERS_PRUNED_AT > 3600:
+        _COUNTERS_PRUNED_AT = time.monotonic()
+        await db.execute(
+            delete(UserJobCounter).where(UserJobCounter.hour < _hour(datetime.now() - timedelta(days=2)))
+        )
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+from collections import OrderedDict, deque
+from typing import Deque, Dict, FrozenSet, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.comfy_node import ComfyNode
+from app.models.job import Job
+from app.models.job_execution import JobExecution
+
+
+# Файлы моделей, которые ComfyUI держит в памяти между prompt
+MODEL_FILE_EXTENSIONS = ('.safetensors', '.ckpt', '.gguf', '.pt', '.pth', '.bin', '.sft')
+
+# node_id -> модели последних NODE_AFFINITY_WINDOW job на ноде (последний справа)
+_NODE_MODELS: Dict[int, Deque[FrozenSet[str]]] = {}
+# ноды, для которых уже подняли историю из БД (один раз за процесс)
+_SEEDED: set = set()
+
+# job_id -> модели job (prepared_workflow у job не меняется)
+_JOB_MODELS: "OrderedDict[str, FrozenSet[str]]" = OrderedDict()
+_JOB_MODELS_MAX = 1024
+
+
+def workflow_models(workflow: Optional[dict]) -> FrozenSet[str]:
+    """
+    Модели, которые загрузит workflow: файлы моделей в widgets_values
+    активных нод (muted / bypass ComfyUI не выполняет).
+    """
+    if not isinstance(workflow, dict):
+        return frozenset()
+
+    models = set()
+    for node in workflow.get('nodes') or []:
+        if not isinstance(node, dict) or node.get('mode', 0) in (2, 4):
+            continue
+        values = node.get('widgets_values')
+        if not isinstance(values, list):
+            continue
+        for value in values:
+            if isinstance(value, str) and value.lower().endswith(MODEL_FILE_EXTENSIONS):
+                models.add(value)
+    return frozenset(models)
+
+
+def job_models(job: Job) -> FrozenSet[str]:
+    models = _JOB_MODELS.get(job.id)
+    if models is not None:
+        _JOB_MODELS.move_to_end(job.id)
+        return models
+
+    models = workflow_models(job.prepared_workflow)
+    _JOB_MODELS[job.id] = models
+    while len(_JOB_MODELS) > _JOB_MODELS_MAX:
+        _JOB_MODELS.popitem(last=False)
+    return models
+
+
+def _window() -> int:
+    return max(1, settings.NODE_AFFINITY_WINDOW)
+
+
+def record_node_models(node_id: int, models: FrozenSet[str]) -> None:
+    """
+    Job с этими моделями отправлен на ноду — они там "тёплые".
+    """
+    if not models:
+        return
+    recent = _NODE_MODELS.get(node_id)
+    if recent is None or recent.maxlen != _window():
+        recent = deque(recent or (), maxlen=_window())
+        _NODE_MODELS[node_id] = recent
+    recent.append(models)
+
+
+def forget_node(node_id: int) -> None:
+    """
+    Нода перезапущена / отключена — в памяти у неё ничего нет.
+    """
+    _NODE_MODELS.pop(node_id, None)
+
+
+def warm_fraction(node_id: int, models: FrozenSet[str]) -> float:
+    """
+    Доля моделей job, которые нода уже загружала недавно (0..1).
+    """
+    if not models:
+        return 0.0
+    recent = _NODE_MODELS.get(node_id)
+    if not recent:
+        return 0.0
+    warm = frozenset().union(*recent)
+    return len(models & warm) / len(models)
+
+
+def pick_node(
+        candidates: Sequence[Tuple[ComfyNode, int]],
+        models: FrozenSet[str],
+        *,
+        weight: float,
+) -> Optional[ComfyNode]:
+    """
+    candidates — (нода, активных execution) в порядке предпочтения без affinity.
+    Стоимость ноды: active_jobs - weight * warm_fraction, т.е. полностью
+    "тёплая" нода стоит weight job в очереди. weight = 0 — только загрузка.
+    """
+    if not candidates:
+        return None
+    if weight <= 0 or not models:
+        return candidates[0][0]
+
+    # min стабилен: при равной стоимости остаётся исходный порядок (priority, last_seen)
+    best, _ = min(
+        candidates,
+        key=lambda row: row[1] - weight * warm_fraction(row[0].id, models)
+    )
+    return best
+
+
+async def seed_node_models(db: AsyncSession, node_ids: Iterable[int]) -> None:
+    """
+    После рестарта приложения — восстанавливаем "тёплые" модели нод
+    по последним отправленным на них job.
+    """
+    for node_id in node_ids:
+        if node_id in _SEEDED:
+            continue
+        _SEEDED.add(node_id)
+        if node_id in _NODE_MODELS:
+            continue
+
+        rows = (await db.execute(
+            select(Job.prepared_workflow)
+            .join(JobExecution, JobExecution.job_id == Job.id)
+            .where(
+                JobExecution.node_id == node_id,
+                JobExecution.prompt_id.isnot(None),
+                JobExecution.source_execution_id.is_(None),
+            )
+            .order_by(JobExecution.started_at.desc())
+            .limit(_window())
+        )).scalars().all()
+
+        for workflow in reversed(rows):
+            record_node_models(node_id, workflow_models(workflow))
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.comfy_node import ComfyNode
+from app.models.job import Job
+from app.models.workflow import Workflow
+from app.services.comfy_client import get_object_info_snapshot
+from app.services.node_affinity import MODEL_FILE_EXTENSIONS
+from app.services.sanitize_comfy_prompt import BYPASS_SAFE_CLASS_TYPES, SKIP_CLASS_TYPES, SWITCH_CLASS_TYPES
+
+
+# Ноды только фронтенда / вырезаемые sanitize — на ноде ComfyUI они не нужны
+FRONTEND_ONLY_CLASS_TYPES = (
+    {"Reroute", "PrimitiveNode"}
+    | SKIP_CLASS_TYPES
+    | SWITCH_CLASS_TYPES
+    | BYPASS_SAFE_CLASS_TYPES
+)
+
+# node.mode: 2 — muted, 4 — bypass
+_INACTIVE_NODE_MODES = (2, 4)
+
+
+def _model_key(value: str) -> str:
+    # validate_and_fix_prompt сопоставляет COMBO по basename ("QWEN\\x.safetensors" == "x.safetensors")
+    return os.path.basename(value.replace("\\", "/"))
+
+
+def _is_model_file(value: Any) -> bool:
+    return isinstance(value, str) and value.lower().endswith(MODEL_FILE_EXTENSIONS)
+
+
+def _combo_options(schema_entry: Any) -> List[Any]:
+    # [["a", "b"], {...}] или новый формат ["COMBO", {"options": ["a", "b"]}]
+    if not isinstance(schema_entry, (list, tuple)) or not schema_entry:
+        return []
+    if isinstance(schema_entry[0], list):
+        return schema_entry[0]
+    if schema_entry[0] == "COMBO" and len(schema_entry) > 1 and isinstance(schema_entry[1], dict):
+        return schema_entry[1].get("options") or []
+    return []
+
+
+@dataclass(frozen=True)
+class NodeCapabilities:
+    """
+    Что умеет нода ComfyUI (из её /object_info): class_types и модели,
+    которые предлагают COMBO-виджеты загрузчиков.
+    """
+    class_types: FrozenSet[str]
+    # class_type -> basename моделей из COMBO (только для нод с такими COMBO)
+    models: Dict[str, FrozenSet[str]]
+
+    def missing(self, requirements: "WorkflowRequirements") -> List[str]:
+        problems = [f"node type {ct}" for ct in sorted(requirements.class_types - self.class_types)]
+        for class_type, model in sorted(requirements.models):
+            available = self.models.get(class_type)
+            # загрузчик без COMBO моделей (путь строкой) — проверить нечем
+            if available is not None and class_type in self.class_types and model not in available:
+                problems.append(f"model {model} ({class_type})")
+        return problems
+
+    def satisfies(self, requirements: "WorkflowRequirements") -> bool:
+        return not self.missing(requirements)
+
+
+@dataclass(frozen=True)
+class WorkflowRequirements:
+    class_types: FrozenSet[str]
+    # (class_type, basename модели)
+    models: FrozenSet[Tuple[str, str]]
+
+
+def build_capabilities(object_info: Dict[str, Any]) -> NodeCapabilities:
+    models: Dict[str, FrozenSet[str]] = {}
+    for class_type, info in object_info.items():
+        inputs = (info or {}).get("input") or {}
+        found = set()
+        for section in ("required", "optional"):
+            for schema_entry in (inputs.get(section) or {}).values():
+                found.update(_model_key(o) for o in _combo_options(schema_entry) if _is_model_file(o))
+        if found:
+            models[class_type] = frozenset(found)
+    return NodeCapabilities(class_types=frozenset(object_info), models=models)
+
+
+def workflow_requirements(workflow: Optional[dict]) -> WorkflowRequirements:
+    """
+    Требования UI workflow: class_types активных нод и файлы моделей в их виджетах.
+    """
+    class_types = set()
+    models = set()
+    for node in (workflow or {}).get("nodes") or []:
+        if not isinstance(node, dict) or node.get("mode", 0) in _INACTIVE_NODE_MODES:
+            continue
+        class_type = node.get("type")
+        if not class_type or class_type in FRONTEND_ONLY_CLASS_TYPES:
+            continue
+        class_types.add(class_type)
+        values = node.get("widgets_values")
+        if isinstance(values, list):
+            models.update((class_type, _model_key(v)) for v in values if _is_model_file(v))
+    return WorkflowRequirements(class_types=frozenset(class_types), models=frozenset(models))
+
+
+# node_id -> (fingerprint object_info, capabilities); последнее известное — и для недоступных нод
+_NODE_CAPABILITIES: Dict[int, Tuple[str, NodeCapabilities]] = {}
+
+# (workflow_id, version, updated_at) -> requirements (текущая версия workflow — для админки)
+_REQUIREMENTS: "OrderedDict[tuple, WorkflowRequirements]" = OrderedDict()
+_REQUIREMENTS_MAX = 256
+
+# job_id -> requirements (prepared_workflow у job не меняется)
+_JOB_REQUIREMENTS: "OrderedDict[str, WorkflowRequirements]" = OrderedDict()
+_JOB_REQUIREMENTS_MAX = 1024
+
+
+async def get_node_capabilities(node: ComfyNode) -> Optional[NodeCapabilities]:
+    """
+    Capabilities по кэшированному object_info ноды (COMFY_OBJECT_INFO_TTL);
+    нода не отвечает — последнее известное, None — ещё ни разу не видели.
+    """
+    try:
+        object_info, fingerprint = await get_object_info_snapshot(node=node)
+    except Exception as e:
+        logger.debug(f"[capabilities] node {node.id}: object_info unavailable: {e}")
+        cached = _NODE_CAPABILITIES.get(node.id)
+        return cached[1] if cached else None
+
+    cached = _NODE_CAPABILITIES.get(node.id)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+
+    capabilities = build_capabilities(object_info)
+    _NODE_CAPABILITIES[node.id] = (fingerprint, capabilities)
+    return capabilities
+
+
+def known_node_capabilities(node_id: int) -> Optional[NodeCapabilities]:
+    cached = _NODE_CAPABILITIES.get(node_id)
+    return cached[1] if cached else None
+
+
+async def get_workflow_requirements(
+        *,
+        db: AsyncSession,
+        workflow_id: str,
+) -> Optional[WorkflowRequirements]:
+    row = (await db.execute(
+        select(Workflow.version, Workflow.updated_at).where(Workflow.id == workflow_id)
+    )).first()
+    if row is None:
+        return None
+
+    key = (workflow_id, row.version, row.updated_at)
+    if key in _REQUIREMENTS:
+        _REQUIREMENTS.move_to_end(key)
+        return _REQUIREMENTS[key]
+
+    workflow_json = (await db.execute(
+        select(Workflow.workflow_json).where(Workflow.id == workflow_id)
+    )).scalar_one()
+
+    requirements = workflow_requirements(workflow_json)
+    _REQUIREMENTS[key] = requirements
+    while len(_REQUIREMENTS) > _REQUIREMENTS_MAX:
+        _REQUIREMENTS.popitem(last=False)
+    return requirements
+
+
+def job_requirements(job: Job) -> WorkflowRequirements:
+    """
+    Требования графа, который job действительно выполнит (его prepared_workflow),
+    а не текущей версии workflow — её могли изменить после постановки в очередь.
+    """
+    requirements = _JOB_REQUIREMENTS.get(job.id)
+    if requirements is not None:
+        _JOB_REQUIREMENTS.move_to_end(job.id)
+        return requirements
+
+    requirements = workflow_requirements(job.prepared_workflow)
+    _JOB_REQUIREMENTS[job.id] = requirements
+    while len(_JOB_REQUIREMENTS) > _JOB_REQUIREMENTS_MAX:
+        _JOB_REQUIREMENTS.popitem(last=False)
+    return requirements
+
+
+async def filter_capable_nodes(
+        candidates: Sequence[Tuple[ComfyNode, int]],
+        requirements: Optional[WorkflowRequirements],
+) -> List[Tuple[ComfyNode, int]]:
+    """
+    Оставляет ноды, которые могут выполнить workflow (порядок сохраняется).
+    Ноды с неизвестными capabilities не отсекаются.
+    """
+    if requirements is None:
+        return list(candidates)
+
+    capable = []
+    for node, active_jobs in candidates:
+        capabilities = await get_node_capabilities(node)
+        if capabilities is None or capabilities.satisfies(requirements):
+            capable.append((node, active_jobs))
+    return capable
+
+
+async def unservable_reason(
+        *,
+        db: AsyncSession,
+        requirements: WorkflowRequirements,
+) -> Optional[str]:
+    """
+    Текст ошибки, если ни одна нода (включая отключённые) не может выполнить workflow;
+    None — есть подходящая (или неизвестно), job ждёт в очереди.
+    """
+    node_ids = (await db.execute(select(ComfyNode.id))).scalars().all()
+    problems: List[str] = []
+    for node_id in node_ids:
+        capabilities = known_node_capabilities(node_id)
+        if capabilities is None:
+            return None
+        missing = capabilities.missing(requirements)
+        if not missing:
+            return None
+        problems = problems or missing
+
+    if not node_ids:
+        return None
+    return "No ComfyUI node can run this workflow, missing: " + ", ".join(problems[:10])
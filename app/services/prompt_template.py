@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from copy import deepcopy
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.workflow import Workflow
+from app.schemas.workflow_spec_v2 import BindingSpec
+from app.services.comfy_prompt_builder import ComfyPromptBuildError
+from app.services.comfy_prompt_builder_v2 import SEED_MODES, build_prompt_from_ui_workflow_v2
+from app.services.comfy_prompt_validate import validate_and_fix_prompt
+from app.services.comfy_prepare_prompt import IMAGE_NODE_TYPES, MASK_NODE_TYPES
+from app.services.sanitize_comfy_prompt import prune_unreachable_nodes, sanitize_prompt_for_comfy
+from app.services.workflow_mapper import apply_binding, normalize_workflow_for_comfy
+
+
+# Сборка prompt для этих нод зависит от значений (_apply_florence2_model_override,
+# Florence2 lora в sanitize) — такие workflow собираем по-старому
+VALUE_DEPENDENT_CLASS_TYPES = {"DownloadAndLoadFlorence2Model"}
+
+# kind цели:
+#   input       — значение попадает в prompt[api_node_id].inputs[input_name]
+#   inert       — запись не влияет на API prompt (muted-нода, linked-порт, лишний виджет)
+#   unsupported — запись меняет больше одного input (выравнивание widgets_values и т.п.)
+INPUT = "input"
+INERT = "inert"
+UNSUPPORTED = "unsupported"
+
+_PROBE = "\x00__prompt_template_probe__"
+_MISSING = object()
+
+
+def _is_seed_mode(value: Any) -> bool:
+    return isinstance(value, str) and value.strip().lower() in SEED_MODES
+
+
+@dataclass(frozen=True)
+class SlotTarget:
+    kind: str
+    api_node_id: str | None = None
+    input_name: str | None = None
+    # значение на этом месте — режим seed (randomize/fixed/...): от него зависит
+    # выравнивание widgets_values, поэтому шаблон годится, только пока это так
+    seed_mode: bool = False
+
+
+class PromptTemplate:
+    """
+    API prompt, собранный один раз для (workflow, object_info):
+    UI -> API, validate_and_fix_prompt, sanitize (switch / bypass), pruning.
+
+    Job хранит записи маппера [(node_id, field, value)] (Job.bindings);
+    render() кладёт их в копию шаблона. Куда попадает каждая запись
+    (api node + input), определяется пробой: запись sentinel-значения
+    в одну UI-ноду и сборка только этой ноды.
+    """
+
+    def __init__(self, prompt: Dict[str, Any], ui_workflow: dict):
+        self.prompt = prompt
+        # нормализованный UI workflow (только чтение)
+        self._ui = ui_workflow
+        self._links = ui_workflow.get("links") or []
+
+        self._positions: Dict[Any, int] = {}
+        for pos, n in enumerate(ui_workflow.get("nodes") or []):
+            if isinstance(n, dict):
+                self._positions.setdefault(n.get("id"), pos)
+
+        self._built: Dict[int, Optional[dict]] = {}
+        self._targets: Dict[Tuple[str, str], SlotTarget] = {}
+
+    def _build_node(self, node: dict) -> Optional[dict]:
+        # build_prompt_from_ui_workflow_v2 меняет widgets_values (seed mode) — собираем копию
+        payload = build_prompt_from_ui_workflow_v2({"nodes": [deepcopy(node)], "links": self._links})
+        return payload["prompt"].get(str(node.get("id")))
+
+    def _base_node(self, pos: int) -> Optional[dict]:
+        if pos not in self._built:
+            self._built[pos] = self._build_node(self._ui["nodes"][pos])
+        return self._built[pos]
+
+    def _probe(self, node_id: str, field: str) -> SlotTarget:
+        try:
+            pos = self._positions.get(int(node_id))
+        except (TypeError, ValueError):
+            return SlotTarget(UNSUPPORTED)
+        if pos is None:
+            return SlotTarget(UNSUPPORTED)
+
+        node = self._ui["nodes"][pos]
+        base = self._base_node(pos)
+        if base is None:
+            # muted / без class_type — в prompt не попадает
+            return SlotTarget(INERT)
+
+        def write(value: Any) -> Optional[dict]:
+            probe = deepcopy(node)
+            apply_binding({"nodes": [probe]}, BindingSpec(node_id=node_id, field=field), value)
+            before = node.get("widgets_values")
+            after = probe.get("widgets_values")
+            if isinstance(before, list) != isinstance(after, list):
+                return None
+            if isinstance(before, list) and len(before) != len(after):
+                # запись за пределами widgets_values меняет выравнивание
+                return None
+            return probe
+
+        probe = write(_PROBE)
+        if probe is None:
+            return SlotTarget(UNSUPPORTED)
+
+        before = node.get("widgets_values")
+        replaced = []
+        if isinstance(before, list):
+            replaced = [old for old, new in zip(before, probe["widgets_values"]) if new == _PROBE]
+        seed_mode = bool(replaced) and _is_seed_mode(replaced[0])
+
+        probe_value: Any = _PROBE
+        if seed_mode:
+            # режим seed пробуем другим режимом, иначе сломается выравнивание
+            current = replaced[0].strip().lower()
+            probe_value = next(m for m in sorted(SEED_MODES) if m != current)
+            probe = write(probe_value)
+            if probe is None:
+                return SlotTarget(UNSUPPORTED)
+
+        try:
+            built = self._build_node(probe)
+        except Exception:
+            return SlotTarget(UNSUPPORTED)
+        if built is None:
+            return SlotTarget(UNSUPPORTED)
+
+        base_inputs = base.get("inputs") or {}
+        built_inputs = built.get("inputs") or {}
+        diffs = [
+            k for k in set(base_inputs) | set(built_inputs)
+            if base_inputs.get(k, _MISSING) != built_inputs.get(k, _MISSING)
+        ]
+
+        if not diffs:
+            return SlotTarget(INERT, seed_mode=seed_mode)
+        if len(diffs) == 1 and built_inputs.get(diffs[0], _MISSING) == probe_value:
+            return SlotTarget(INPUT, api_node_id=str(node.get("id")), input_name=diffs[0], seed_mode=seed_mode)
+        return SlotTarget(UNSUPPORTED)
+
+    def target(self, node_id: str, field: str) -> SlotTarget:
+        key = (node_id, field)
+        target = self._targets.get(key)
+        if target is None:
+            try:
+                target = self._probe(node_id, field)
+            except Exception as e:
+                logger.warning(f"[prompt-template] probe {node_id}.{field} failed: {e}")
+                target = SlotTarget(UNSUPPORTED)
+            self._targets[key] = target
+        return target
+
+    def render(self, bindings: Iterable[Any]) -> Optional[Tuple[dict, Set[Tuple[str, str]]]]:
+        """
+        -> ({"prompt": ...}, изменённые (api_node_id, input)) или None,
+        если какую-то запись шаблон не покрывает (тогда нужна полная сборка).
+        Изменённые inputs ещё нужно прогнать через validate_and_fix_prompt(only=...).
+        """
+        prompt = {
+            nid: {**node, "inputs": dict(node.get("inputs") or {})}
+            for nid, node in self.prompt.items()
+        }
+        touched: Set[Tuple[str, str]] = set()
+
+        for node_id, field, value in bindings:
+            target = self.target(str(node_id), str(field))
+            if target.kind == UNSUPPORTED:
+                return None
+            if _is_seed_mode(value) != target.seed_mode:
+                return None
+            if target.kind == INERT:
+                continue
+
+            node = prompt.get(target.api_node_id)
+            if node is None:
+                # нода вырезана sanitize (switch / bypass) или pruning
+                continue
+            node["inputs"][target.input_name] = value
+            touched.add((target.api_node_id, target.input_name))
+
+        return {"prompt": prompt}, touched
+
+
+def loader_inputs(prompt_payload: Dict[str, Any]) -> Set[Tuple[str, str]]:
+    """
+    inputs, которые патчит upload_and_patch_images (LoadImage / LoadMask .image).
+    """
+    result: Set[Tuple[str, str]] = set()
+    for node_id, node in (prompt_payload.get("prompt") or {}).items():
+        if isinstance(node, dict) and node.get("class_type") in (IMAGE_NODE_TYPES | MASK_NODE_TYPES):
+            result.add((node_id, "image"))
+    return result
+
+
+def compile_prompt_template(workflow_json: dict, object_info: Dict[str, Any]) -> Optional[PromptTemplate]:
+    ui = normalize_workflow_for_comfy(deepcopy(workflow_json))
+
+    try:
+        payload = build_prompt_from_ui_workflow_v2(deepcopy(ui), object_info)
+    except ComfyPromptBuildError:
+        return None
+
+    if any(
+        isinstance(n, dict) and n.get("class_type") in VALUE_DEPENDENT_CLASS_TYPES
+        for n in payload["prompt"].values()
+    ):
+        return None
+
+    payload, _ = validate_and_fix_prompt(payload, object_info)
+    payload = sanitize_prompt_for_comfy(payload)
+    if settings.COMFY_PRUNE_UNUSED_NODES:
+        payload = prune_unreachable_nodes(payload, object_info)
+    return PromptTemplate(payload["prompt"], ui)
+
+
+# ------------------------------------------------------------
+# Cache
+# ------------------------------------------------------------
+
+# (workflow_id, version, updated_at, object_info fingerprint) -> template (None — не поддерживается)
+_TEMPLATES: "OrderedDict[tuple, Optional[PromptTemplate]]" = OrderedDict()
+_TEMPLATES_MAX = 64
+
+
+async def get_prompt_template(
+        *,
+        db: AsyncSession,
+        workflow_id: str,
+        object_info: Dict[str, Any],
+        fingerprint: str,
+        version: Optional[str],
+        updated_at: Optional[datetime],
+) -> Optional[PromptTemplate]:
+    """
+    version / updated_at — версия workflow, из которой собран job. Workflow
+    с тех пор изменили (или job старый, без версии) — None: шаблон собран бы
+    из другого графа, job собирается из своего prepared_workflow.
+    """
+    row = (await db.execute(
+        select(Workflow.version, Workflow.updated_at).where(Workflow.id == workflow_id)
+    )).first()
+    if row is None or version is None:
+        return None
+    if (row.version, row.updated_at) != (version, updated_at):
+        return None
+
+    key = (workflow_id, row.version, row.updated_at, fingerprint)
+    if key in _TEMPLATES:
+        _TEMPLATES.move_to_end(key)
+        return _TEMPLATES[key]
+
+    workflow_json = (await db.execute(
+        select(Workflow.workflow_json).where(Workflow.id == workflow_id)
+    )).scalar_one()
+
+    template = compile_prompt_template(workflow_json, object_info)
+    _TEMPLATES[key] = template
+    while len(_TEMPLATES) > _TEMPLATES_MAX:
+        _TEMPLATES.popitem(last=False)
+    return template
+
+
+def invalidate_prompt_template(workflow_id: str) -> None:
+    for key in [k for k in _TEMPLATES if k[0] == workflow_id]:
+        _TEMPLATES.pop(key, None)
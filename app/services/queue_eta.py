@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.models.comfy_node import ComfyNode
+from app.models.job import Job
+from app.models.job_execution import JobExecution
+from app.services.fair_queue import job_rank, predicted_order
+
+
+# workflow_id -> средняя длительность execution (сек, EWMA)
+_DURATIONS: Dict[str, float] = {}
+_DURATIONS_SEEDED = False
+# вес нового замера в EWMA
+_DURATION_ALPHA = 0.2
+
+# job_id -> (позиция в очереди с 1 | None для RUNNING, секунд до конца от computed_at)
+_ESTIMATES: Dict[str, Tuple[Optional[int], float]] = {}
+_COMPUTED_AT = 0.0          # time.monotonic() последнего пересчёта
+
+
+def estimated_duration(workflow_id: str) -> float:
+    return _DURATIONS.get(workflow_id, float(settings.QUEUE_ETA_DEFAULT_DURATION))
+
+
+def record_duration(workflow_id: str, seconds: float) -> None:
+    """
+    Execution посчитан на GPU — обновляем среднюю длительность workflow.
+    """
+    if seconds <= 0:
+        return
+    previous = _DURATIONS.get(workflow_id)
+    _DURATIONS[workflow_id] = seconds if previous is None else (
+        previous + _DURATION_ALPHA * (seconds - previous)
+    )
+
+
+async def _seed_durations(db: AsyncSession) -> None:
+    """
+    Средняя длительность последних QUEUE_ETA_HISTORY execution каждого workflow.
+    """
+    duration = func.extract('epoch', JobExecution.finished_at - JobExecution.started_at)
+    rank = func.row_number().over(
+        partition_by=Job.workflow_id,
+        order_by=JobExecution.finished_at.desc()
+    ).label('rank')
+    recent = (
+        select(Job.workflow_id, duration.label('seconds'), rank)
+        .join(Job, Job.id == JobExecution.job_id)
+        .where(
+            JobExecution.status == 'DONE',
+            JobExecution.source_execution_id.is_(None),
+            JobExecution.started_at.isnot(None),
+            JobExecution.finished_at.isnot(None),
+        )
+        .subquery()
+    )
+    rows = (await db.execute(
+        select(recent.c.workflow_id, func.avg(recent.c.seconds))
+        .where(recent.c.rank <= settings.QUEUE_ETA_HISTORY)
+        .group_by(recent.c.workflow_id)
+    )).all()
+
+    for workflow_id, seconds in rows:
+        if seconds and workflow_id not in _DURATIONS:
+            _DURATIONS[workflow_id] = float(seconds)
+
+
+def _slot_free_at(finishes: List[float], capacity: int) -> float:
+    # очередь ComfyUI ноды — FIFO, finishes по возрастанию: место (< capacity
+    # отправленных) появляется, когда досчитается capacity-й с конца
+    return finishes[-capacity] if len(finishes) >= capacity else 0.0
+
+
+def estimate_queue(
+        queued: List[Any],
+        running: List[Tuple[str, str, Optional[datetime], Optional[int]]],
+        nodes: Dict[int, int],
+        now: datetime,
+) -> Dict[str, Tuple[Optional[int], float]]:
+    """
+    queued — QUEUED job (id / workflow_id / priority / created_at) в порядке отправки;
+    running — (job_id, workflow_id, started_at, node_id) по started_at;
+    nodes — активные ноды: node_id -> max_queue.
+
+    Как scheduler_tick: job уходит на ноду, когда у неё меньше max_queue
+    отправленных prompt (batch / background — только на простаивающую),
+    и ждёт в FIFO ComfyUI за уже отправленными; нода считает по одному.
+    """
+    estimates: Dict[str, Tuple[Optional[int], float]] = {}
+    # node_id -> моменты окончания отправленных prompt (сек от now, по возрастанию)
+    finishes: Dict[int, List[float]] = {node_id: [] for node_id in nodes}
+
+    for job_id, workflow_id, started_at, node_id in running:
+        elapsed = (now - started_at).total_seconds() if started_at else 0.0
+        node_finishes = finishes.get(node_id)
+        if node_finishes is None:
+            # нода снята с учёта — execution ждёт своего исхода отдельно
+            estimates[job_id] = (None, max(1.0, estimated_duration(workflow_id) - elapsed))
+            continue
+        if node_finishes:
+            # в очереди ComfyUI за предыдущими: считается после них
+            finish = node_finishes[-1] + estimated_duration(workflow_id)
+        else:
+            finish = max(1.0, estimated_duration(workflow_id) - elapsed)
+        node_finishes.append(finish)
+        estimates[job_id] = (None, finish)
+
+    if not nodes:
+        # считать негде — позиция есть, время неизвестно
+        for position, job in enumerate(queued, start=1):
+            estimates[job.id] = (position, float('inf'))
+        return estimates
+
+    for position, job in enumerate(queued, start=1):
+        idle_only = job_rank(job, now) > 0
+
+        best = None
+        for node_id, capacity in nodes.items():
+            node_finishes = finishes[node_id]
+            dispatch = _slot_free_at(node_finishes, 1 if idle_only else max(1, capacity))
+            # при равном времени — наименее загруженная, как select_available_node
+            key = (dispatch, sum(1 for f in node_finishes if f > dispatch))
+            if best is None or key < best[0]:
+                best = (key, node_id)
+
+        (dispatch, _), node_id = best
+        node_finishes = finishes[node_id]
+        start = max(dispatch, node_finishes[-1] if node_finishes else 0.0)
+        finish = start + estimated_duration(job.workflow_id)
+        node_finishes.append(finish)
+        estimates[job.id] = (position, finish)
+
+    return estimates
+
+
+async def refresh_queue_estimates(db: AsyncSession, *, force: bool = False) -> None:
+    """
+    Пересчитывает позиции / ETA всех активных job (вызывается из scheduler loop,
+    не чаще раза в QUEUE_ETA_REFRESH секунд). /state только читает результат.
+    """
+    global _COMPUTED_AT, _ESTIMATES, _DURATIONS_SEEDED
+
+    if not force and time.monotonic() - _COMPUTED_AT < settings.QUEUE_ETA_REFRESH:
+        return
+
+    if not _DURATIONS_SEEDED:
+        _DURATIONS_SEEDED = True
+        await _seed_durations(db)
+
+    now = datetime.now()
+    # только колонки для порядка (не ORM-объекты: prepared_workflow / result не нужны);
+    # job в паузе перед повтором scheduler не берёт — как select_fair_jobs
+    queued = (await db.execute(
+        select(Job.id, Job.user_id, Job.workflow_id, Job.priority, Job.created_at)
+        .where(
+            Job.status == 'QUEUED',
+            or_(Job.retry_at.is_(None), Job.retry_at <= now)
+        )
+    )).all()
+    running = (await db.execute(
+        select(JobExecution.job_id, Job.workflow_id, JobExecution.started_at, JobExecution.node_id)
+        .join(Job, Job.id == JobExecution.job_id)
+        .where(
+            JobExecution.status == 'RUNNING',
+            JobExecution.source_execution_id.is_(None),
+        )
+        .order_by(JobExecution.started_at.asc())
+    )).all()
+    nodes = dict((await db.execute(
+        select(ComfyNode.id, ComfyNode.max_queue).where(ComfyNode.is_active == True)
+    )).all())
+
+    # coalesced job ждут результата своего источника — та же оценка
+    source = aliased(JobExecution)
+    followers = (await db.execute(
+        select(JobExecution.job_id, source.job_id)
+        .join(source, source.id == JobExecution.source_execution_id)
+        .where(JobExecution.status == 'RUNNING')
+    )).all()
+
+    estimates = estimate_queue(predicted_order(queued), list(running), nodes, now)
+    for job_id, source_job_id in followers:
+        if source_job_id in estimates:
+            estimates[job_id] = estimates[source_job_id]
+    _ESTIMATES = estimates
+    _COMPUTED_AT = time.monotonic()
+
+
+def get_queue_estimate(job_id: str) -> Tuple[Optional[int], Optional[int]]:
+    """
+    (позиция в очереди, секунд до готовности) по последнему пересчёту;
+    (None, None) — job ещё не попал в пересчёт или уже завершён.
+    """
+    estimate = _ESTIMATES.get(job_id)
+    if estimate is None:
+        return None, None
+    position, finish = estimate
+    if finish == float('inf'):
+        return position, None
+    left = finish - (time.monotonic() - _COMPUTED_AT)
+    return position, max(1, round(left))
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.comfy_node import ComfyNode
+from app.models.job import Job
+from app.models.job_execution import JobExecution
+from app.models.result_cache import ResultCacheEntry
+from app.models.workflow import Workflow
+from app.services.comfy_prepare_prompt import IMAGE_NODE_TYPES, MASK_NODE_TYPES
+from app.services.result_normalizer import normalize_job_result
+from app.services.storage import read_stored_file
+
+
+# storage key -> sha256 содержимого (загруженные файлы не меняются)
+_FILE_HASHES: "OrderedDict[str, str]" = OrderedDict()
+_FILE_HASHES_MAX = 10_000
+
+
+def _hash_stored_file(key: str) -> Optional[str]:
+    content = read_stored_file(key)
+    if content is None:
+        return None
+    return hashlib.sha256(content).hexdigest()
+
+
+async def _file_hash(key: str) -> Optional[str]:
+    digest = _FILE_HASHES.get(key)
+    if digest is not None:
+        _FILE_HASHES.move_to_end(key)
+        return digest
+
+    digest = await asyncio.to_thread(_hash_stored_file, key)
+    if digest is not None:
+        _FILE_HASHES[key] = digest
+        while len(_FILE_HASHES) > _FILE_HASHES_MAX:
+            _FILE_HASHES.popitem(last=False)
+    return digest
+
+
+def _loader_file_keys(node_id: str, class_type: Any) -> Tuple[str, ...]:
+    # те же ключи, что патчит upload_and_patch_images
+    if class_type in IMAGE_NODE_TYPES:
+        return (f"image_{node_id}",)
+    if class_type in MASK_NODE_TYPES:
+        return (f"mask_{node_id}", "mask")
+    return ()
+
+
+async def compute_prompt_hash(prompt_payload: Dict[str, Any], stored_files: Dict[str, str]) -> Optional[str]:
+    """
+    sha256 канонического prompt (до upload): вход LoadImage / LoadMask заменяется
+    хэшем содержимого файла, который туда будет загружен (storage key у каждого job свой).
+    None — входной файл не прочитать, кэшировать нельзя.
+    """
+    prompt = prompt_payload.get("prompt")
+    if not isinstance(prompt, dict):
+        return None
+
+    canonical: Dict[str, Any] = {}
+    for node_id, node in prompt.items():
+        if not isinstance(node, dict):
+            canonical[node_id] = node
+            continue
+
+        keys = [k for k in _loader_file_keys(node_id, node.get("class_type")) if isinstance(stored_files.get(k), str)]
+        if not keys:
+            canonical[node_id] = node
+            continue
+
+        digest = await _file_hash(stored_files[keys[0]])
+        if digest is None:
+            return None
+        canonical[node_id] = {**node, "inputs": {**(node.get("inputs") or {}), "image": f"sha256:{digest}"}}
+
+    data = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def is_cacheable_result(result: Optional[dict]) -> bool:
+    """
+    Кэшируем только результаты из output: temp (PreviewImage) ComfyUI чистит при рестарте.
+    """
+    images = normalize_job_result(result).get("images") or []
+    return bool(images) and all(img.get("type") == "output" for img in images)
+
+
+async def _result_cache_enabled(db: AsyncSession, workflow_id: str) -> bool:
+    if not settings.RESULT_CACHE_ENABLED:
+        return False
+    enabled = (await db.execute(
+        select(Workflow.result_cache_enabled).where(Workflow.id == workflow_id)
+    )).scalar_one_or_none()
+    return bool(enabled)
+
+
+async def lookup_cached_result(
+        *,
+        db: AsyncSession,
+        workflow_id: str,
+        prompt_hash: str,
+) -> Optional[Tuple[JobExecution, Job]]:
+    """
+    -> (execution, job), которые уже посчитали такой же prompt, или None.
+    Источник должен быть DONE, не старше RESULT_CACHE_TTL и на активной ноде
+    (картинки отдаются через /view этой ноды).
+    """
+    if not await _result_cache_enabled(db, workflow_id):
+        return None
+
+    cutoff = datetime.now() - timedelta(seconds=settings.RESULT_CACHE_TTL)
+    row = (await db.execute(
+        select(ResultCacheEntry, JobExecution, Job)
+        .join(JobExecution, JobExecution.id == ResultCacheEntry.execution_id)
+        .join(Job, Job.id == ResultCacheEntry.job_id)
+        .join(ComfyNode, ComfyNode.id == JobExecution.node_id)
+        .where(
+            ResultCacheEntry.prompt_hash == prompt_hash,
+            ResultCacheEntry.workflow_id == workflow_id,
+            ResultCacheEntry.created_at >= cutoff,
+            Job.status == 'DONE',
+            ComfyNode.is_active == True,
+        )
+    )).first()
+    if row is None:
+        return None
+
+    entry, execution, job = row
+    entry.hits += 1
+    entry.last_hit_at = datetime.now()
+    return execution, job
+
+
+async def find_running_execution(
+        *,
+        db: AsyncSession,
+        job: Job,
+) -> Optional[JobExecution]:
+    """
+    Такой же prompt (job.prompt_hash) уже выполняется — execution, к которому
+    можно присоединиться вместо повторной отправки в ComfyUI.
+    """
+    if not job.prompt_hash or not await _result_cache_enabled(db, job.workflow_id):
+        return None
+
+    return (await db.execute(
+        select(JobExecution)
+        .join(Job, Job.id == JobExecution.job_id)
+        .where(
+            Job.prompt_hash == job.prompt_hash,
+            Job.workflow_id == job.workflow_id,
+            Job.id != job.id,
+            JobExecution.status == 'RUNNING',
+            JobExecution.prompt_id.isnot(None),
+            JobExecution.source_execution_id.is_(None),
+        )
+        .order_by(JobExecution.started_at.asc())
+        .limit(1)
+    )).scalars().first()
+
+
+async def store_result(
+        *,
+        db: AsyncSession,
+        job: Job,
+        execution: JobExecution,
+) -> None:
+    """
+    Запоминает посчитанный результат job (коммит — на вызывающем).
+    """
+    if not job.prompt_hash or execution.source_execution_id is not None:
+        return
+    if not is_cacheable_result(job.result):
+        return
+    if not await _result_cache_enabled(db, job.workflow_id):
+        return
+
+    entry = await db.get(ResultCacheEntry, job.prompt_hash)
+    if entry is None:
+        db.add(ResultCacheEntry(
+            prompt_hash=job.prompt_hash,
+            workflow_id=job.workflow_id,
+            job_id=job.id,
+            execution_id=execution.id,
+            hits=0,
+        ))
+    else:
+        # запись протухла (или нода отвалилась) — указываем на свежий результат
+        entry.job_id = job.id
+        entry.execution_id = execution.id
+        entry.created_at = datetime.now()
+
+    await db.flush()
+    await evict_result_cache(db=db)
+
+
+async def evict_result_cache(*, db: AsyncSession) -> int:
+    """
+    TTL + ограничение по числу записей (вытесняются давно не использованные).
+    """
+    cutoff = datetime.now() - timedelta(seconds=settings.RESULT_CACHE_TTL)
+    expired = await db.execute(
+        delete(ResultCacheEntry).where(ResultCacheEntry.created_at < cutoff)
+    )
+    removed = expired.rowcount or 0
+
+    max_entries = max(0, settings.RESULT_CACHE_MAX_ENTRIES)
+    overflow = (
+        select(ResultCacheEntry.prompt_hash)
+        .order_by(func.coalesce(ResultCacheEntry.last_hit_at, ResultCacheEntry.created_at).desc())
+        .offset(max_entries)
+    )
+    evicted = await db.execute(
+        delete(ResultCacheEntry).where(ResultCacheEntry.prompt_hash.in_(overflow))
+    )
+    removed += evicted.rowcount or 0
+
+    if removed:
+        logger.debug(f"[result-cache] evicted {removed} entries")
+    return removed
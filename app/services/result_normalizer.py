@@ -135,3 +135,28 @@ def normalize_job_result(raw_result: Optional[Dict[str, Any]]) -> Dict[str, Any]
         images.extend(_extract_images_from_node_payload(node_payload))
 
     return {"images": images}
+
+
+def split_batch_result(raw_result: Optional[Dict[str, Any]], batch_size: int) -> List[Dict[str, Any]]:
+    """
+    Job.result batch-запуска -> N логических результатов [{"images": [...]}].
+
+    Output-нода batch отдаёт images в порядке batch: i-я картинка — i-й вариант.
+    Ноды с другим числом картинок (превью входа и т.п.) в варианты не попадают.
+    """
+    if batch_size <= 1 or not raw_result or not isinstance(raw_result, dict):
+        return []
+
+    outputs = raw_result.get("outputs")
+    if not isinstance(outputs, dict):
+        outputs = raw_result
+
+    variants: List[Dict[str, Any]] = [{"images": []} for _ in range(batch_size)]
+    for _, node_payload in outputs.items():
+        images = _extract_images_from_node_payload(node_payload)
+        if len(images) != batch_size:
+            continue
+        for variant, image in zip(variants, images):
+            variant["images"].append(image)
+
+    return [v for v in variants if v["images"]]
@@ -1,5 +1,9 @@
 from typing import Dict, Any, Tuple, Optional
 
+from loguru import logger
+
+from app.services.spec_generator import OUTPUT_NODE_TYPES
+
 SKIP_CLASS_TYPES = {
     "Note",
     "MarkdownNote",
@@ -20,6 +24,101 @@ BYPASS_SAFE_CLASS_TYPES = {
 }
 
 
+_REMOVED_CLASS_TYPES = SKIP_CLASS_TYPES | SWITCH_CLASS_TYPES | BYPASS_SAFE_CLASS_TYPES
+
+
+def _is_ref(v: Any) -> bool:
+    return isinstance(v, list) and len(v) == 2 and isinstance(v[0], str) and isinstance(v[1], int)
+
+
+def _class_type(node: Any) -> Any:
+    return node.get("class_type") if isinstance(node, dict) else None
+
+
+def _first_ref(node: dict) -> Optional[Tuple[str, int]]:
+    """
+    Вход, который switch / bypass-нода пропускает дальше:
+      - switch: первая подключенная ветка (по имени входа)
+      - bypass: первый подключенный вход
+    """
+    ins = node.get("inputs") or {}
+    if not isinstance(ins, dict):
+        return None
+
+    keys = sorted(ins.keys()) if node.get("class_type") in SWITCH_CLASS_TYPES else ins.keys()
+    for k in keys:
+        v = ins.get(k)
+        if _is_ref(v):
+            return (v[0], v[1])
+    return None
+
+
+def resolve_passthrough_sources(prompt: Dict[str, Any]) -> Dict[str, Optional[Tuple[str, int]]]:
+    """
+    Для каждой ноды, которая при API-запуске пропускается (skip / switch / bypass):
+    node_id -> реальный источник (node_id, slot), на который надо переписать ссылки
+    (None — ссылку не трогаем).
+
+    Цепочки switch -> bypass -> switch ... проходим один раз: каждая нода
+    разрешается ровно однажды (мемоизация), цикл обрывается с предупреждением
+    вместо бесконечной рекурсии.
+    """
+    resolved: Dict[str, Optional[Tuple[str, int]]] = {}
+
+    def is_passthrough(node_id: str) -> bool:
+        return _class_type(prompt.get(node_id)) in SWITCH_CLASS_TYPES | BYPASS_SAFE_CLASS_TYPES
+
+    for node_id, node in prompt.items():
+        if _class_type(node) in SKIP_CLASS_TYPES:
+            resolved[node_id] = None
+
+    for start in prompt:
+        if start in resolved or not is_passthrough(start):
+            continue
+
+        # идём вверх по цепочке, пока не встретим обычную ноду / уже разрешённую / цикл
+        chain: list[Tuple[str, Optional[Tuple[str, int]]]] = []
+        on_chain: set[str] = set()
+        current = start
+        upstream: Optional[Tuple[str, int]] = None
+
+        while True:
+            ref = _first_ref(prompt[current])
+            chain.append((current, ref))
+            on_chain.add(current)
+
+            if ref is None:
+                break
+
+            src_id, src_slot = ref
+            src = prompt.get(src_id)
+
+            if src_id in resolved:
+                upstream = resolved[src_id]
+                break
+            if src_id in on_chain:
+                logger.warning(f"[sanitize] cycle through passthrough node {src_id}, keeping link as is")
+                break
+            if not isinstance(src, dict):
+                break
+            if is_passthrough(src_id):
+                current = src_id
+                continue
+
+            upstream = (src_id, src_slot)
+            break
+
+        # разворачиваем цепочку обратно: источник ноды = источник выше по цепочке или её вход
+        for node_id, ref in reversed(chain):
+            if ref is None:
+                upstream = None
+            else:
+                upstream = upstream or ref
+            resolved[node_id] = upstream
+
+    return resolved
+
+
 def sanitize_prompt_for_comfy(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     0) фикс формата extra_pnginfo (dict -> [dict]) для некоторых custom nodes
@@ -41,69 +140,27 @@ def sanitize_prompt_for_comfy(payload: Dict[str, Any]) -> Dict[str, Any]:
     if not isinstance(prompt, dict):
         return payload
 
-    def resolve_ref(node_id: str, slot: int) -> Optional[Tuple[str, int]]:
-        n = prompt.get(node_id)
-        if not isinstance(n, dict):
-            return None
-
-        ct = n.get("class_type")
-        if ct in SKIP_CLASS_TYPES:
-            return None
-
-        ins = n.get("inputs") or {}
-        if not isinstance(ins, dict):
-            ins = {}
-
-        # ------------------------------------------------------------
-        # Разворачиваем switch: берём первую подключенную ветку
-        # ------------------------------------------------------------
-        if ct in SWITCH_CLASS_TYPES:
-            for k in sorted(ins.keys()):
-                v = ins.get(k)
-                if isinstance(v, list) and len(v) == 2 and isinstance(v[0], str) and isinstance(v[1], int):
-                    deeper = resolve_ref(v[0], v[1])
-                    return deeper or (v[0], v[1])
-            return None
-
-        # ------------------------------------------------------------
-        # Проблемные/оптимизационные узлы: разворачиваем как bypass
-        # (берём первый подключенный вход и возвращаем его)
-        # ------------------------------------------------------------
-        if ct in BYPASS_SAFE_CLASS_TYPES:
-            for k, v in ins.items():
-                if isinstance(v, list) and len(v) == 2 and isinstance(v[0], str) and isinstance(v[1], int):
-                    deeper = resolve_ref(v[0], v[1])
-                    return deeper or (v[0], v[1])
-            return None
-
-        return (node_id, slot)
-
     # ------------------------------------------------------------
     # 1) Переписываем ссылки на switch/skip/bypass-ноды
+    # 2) Удаляем skip/switch/bypass-ноды из prompt вообще
     # ------------------------------------------------------------
-    for nid, node in list(prompt.items()):
+    resolved = resolve_passthrough_sources(prompt)
+
+    for nid, node in prompt.items():
         if not isinstance(node, dict):
             continue
         ins = node.get("inputs")
         if not isinstance(ins, dict):
             continue
 
-        for in_name, v in list(ins.items()):
-            if isinstance(v, list) and len(v) == 2:
-                src_id, src_slot = v[0], v[1]
-                if not isinstance(src_id, str) or not isinstance(src_slot, int):
-                    continue
-                resolved = resolve_ref(src_id, src_slot)
-                if resolved is not None:
-                    ins[in_name] = [resolved[0], resolved[1]]
+        for in_name, v in ins.items():
+            if _is_ref(v) and v[0] in resolved:
+                source = resolved[v[0]]
+                if source is not None:
+                    ins[in_name] = [source[0], source[1]]
 
-    # ------------------------------------------------------------
-    # 2) Удаляем skip/switch/bypass-ноды из prompt вообще
-    # ------------------------------------------------------------
-    for nid, node in list(prompt.items()):
-        ct = (node or {}).get("class_type")
-        if ct in SKIP_CLASS_TYPES or ct in SWITCH_CLASS_TYPES or ct in BYPASS_SAFE_CLASS_TYPES:
-            prompt.pop(nid, None)
+    for nid in [nid for nid, node in prompt.items() if _class_type(node) in _REMOVED_CLASS_TYPES]:
+        prompt.pop(nid, None)
 
     # ------------------------------------------------------------
     # 3) FIX Florence2: если lora == "" / None / False -> удалить ключ целиком
@@ -124,3 +181,58 @@ def sanitize_prompt_for_comfy(payload: Dict[str, Any]) -> Dict[str, Any]:
                 inputs.pop("lora", None)
 
     return payload
+
+
+def _is_output_node(node: Dict[str, Any], object_info: Optional[Dict[str, Any]]) -> bool:
+    ct = node.get("class_type")
+    if ct in OUTPUT_NODE_TYPES:
+        return True
+    info = (object_info or {}).get(ct)
+    return isinstance(info, dict) and bool(info.get("output_node"))
+
+
+def prune_unreachable_nodes(
+        payload: Dict[str, Any],
+        object_info: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Удаляет ноды, от которых не зависит ни одна output-нода
+    (SaveImage / PreviewImage или output_node=True в object_info).
+    Вызывать после sanitize_prompt_for_comfy: неактивные ветки switch к этому
+    моменту уже отцеплены, и ComfyUI не грузит для них модели.
+    Если output-нод нет — prompt не трогаем.
+    """
+    prompt = payload.get("prompt")
+    if not isinstance(prompt, dict):
+        return payload
+
+    stack = [
+        nid for nid, node in prompt.items()
+        if isinstance(node, dict) and _is_output_node(node, object_info)
+    ]
+    if not stack:
+        return payload
+
+    reachable: set[str] = set()
+    while stack:
+        nid = stack.pop()
+        if nid in reachable:
+            continue
+        node = prompt.get(nid)
+        if not isinstance(node, dict):
+            continue
+        reachable.add(nid)
+
+        ins = node.get("inputs")
+        if isinstance(ins, dict):
+            for v in ins.values():
+                if _is_ref(v) and v[0] not in reachable:
+                    stack.append(v[0])
+
+    unreachable = [nid for nid in prompt if nid not in reachable]
+    for nid in unreachable:
+        prompt.pop(nid, None)
+
+    if unreachable:
+        logger.debug(f"[sanitize] pruned {len(unreachable)} nodes not feeding any output")
+    return payload
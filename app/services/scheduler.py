@@ -1,6 +1,9 @@
 import json
 import asyncio
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Any, Dict, Optional, Set, Tuple
+from loguru import logger
 from sqlalchemy import select, func
 from sqlalchemy.orm import aliased
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -9,13 +12,20 @@ from app.models.job import Job
 from app.models.job_execution import JobExecution
 from app.models.comfy_node import ComfyNode
 from app.services.comfy_client import submit_workflow
-from app.services.comfy_client import get_prompt_result
+from app.services.comfy_client import cancel_prompt, get_prompt_result, get_queue_prompt_ids
 from app.services.comfy_prompt_builder import build_prompt_from_ui_workflow
-from app.services.sanitize_comfy_prompt import sanitize_prompt_for_comfy
-from app.services.comfy_client import get_object_info
+from app.services.sanitize_comfy_prompt import sanitize_prompt_for_comfy, prune_unreachable_nodes
+from app.services.comfy_client import get_object_info_snapshot, is_transient_error
 from app.services.comfy_prompt_builder_v2 import build_prompt_from_ui_workflow_v2
 from app.services.comfy_prompt_validate import validate_and_fix_prompt
 from app.services.comfy_prepare_prompt import upload_and_patch_images
+from app.core.config import settings
+from app.services.prompt_template import get_prompt_template, loader_inputs
+from app.services.fair_queue import charge_job, job_rank, select_fair_jobs
+from app.services.node_affinity import job_models, pick_node, record_node_models, seed_node_models
+from app.services.node_capabilities import filter_capable_nodes, job_requirements, unservable_reason
+from app.services.result_cache import compute_prompt_hash, find_running_execution, lookup_cached_result
+from app.services.job_service import handle_execution_result
 
 
 # async def select_available_node(
@@ -30,35 +40,94 @@ from app.services.comfy_prepare_prompt import upload_and_patch_images
 #     return result.scalars().first()
 
 
-async def select_available_node(
-        *,
-        db: AsyncSession
-) -> ComfyNode | None:
-    active_statuses = ['QUEUED', 'RUNNING']
-    stmt = (
-        select(
-            ComfyNode,
-            func.count(JobExecution.id).label('active_jobs')
-        )
+def _node_capacity():
+    return func.greatest(func.coalesce(ComfyNode.max_queue, 1), 1)
+
+
+def _node_load_query(*columns):
+    # (колонки ноды, активных execution) по активным нодам
+    return (
+        select(*columns, func.count(JobExecution.id).label('active_jobs'))
+        .select_from(ComfyNode)
         .outerjoin(
             JobExecution,
             (ComfyNode.id == JobExecution.node_id) &
-            JobExecution.status.in_(active_statuses)
+            JobExecution.status.in_(['QUEUED', 'RUNNING']) &
+            # присоединённые (coalesced) execution ноду не нагружают
+            JobExecution.source_execution_id.is_(None)
         )
         .where(ComfyNode.is_active == True)
         .group_by(ComfyNode.id)
+    )
+
+
+async def free_node_slots(*, db: AsyncSession) -> int:
+    """
+    Сколько prompt ещё можно отправить на активные ноды (max_queue - активные).
+    """
+    load = _node_load_query(_node_capacity().label('capacity')).subquery()
+    free = (await db.execute(
+        select(func.coalesce(func.sum(func.greatest(load.c.capacity - load.c.active_jobs, 0)), 0))
+    )).scalar_one()
+    return int(free)
+
+
+async def select_available_node(
+        *,
+        db: AsyncSession,
+        job: Job | None = None,
+        with_capacity: bool = True
+) -> ComfyNode | None:
+    """
+    Наименее загруженная активная нода; для job — только из нод, которые
+    могут его выполнить (node_capabilities), и с учётом affinity
+    (нода, где модели job уже загружены, предпочтительнее, см. NODE_AFFINITY_WEIGHT).
+    with_capacity=False — без учёта max_queue (нода только для сборки prompt).
+    """
+    stmt = _node_load_query(ComfyNode)
+    if with_capacity:
+        # в очереди ComfyUI не больше max_queue prompt — остальные job ждут
+        # в приложении, где действуют fair-share и классы приоритета
+        stmt = stmt.having(func.count(JobExecution.id) < _node_capacity())
+    stmt = (
+        stmt
         .order_by(
             func.count(JobExecution.id).asc(),
+            # при равной загрузке — нода с меньшим priority
+            ComfyNode.priority.asc(),
             ComfyNode.last_seen.desc()
         )
     )
 
     result = await db.execute(stmt)
-    # result возвращает кортежи (ComfyNode, count), берём только узел
-    first_row = result.first()
-    if first_row:
-        return first_row[0]
-    return None
+    # result возвращает кортежи (ComfyNode, count)
+    candidates = [(node, active_jobs) for node, active_jobs in result.all()]
+    if job is None or not candidates:
+        return candidates[0][0] if candidates else None
+
+    if with_capacity and job_rank(job, datetime.now()) > 0:
+        # batch / background — только на простаивающую ноду: очередь ComfyUI
+        # (max_queue > 1) остаётся interactive job, они не ждут за фоновыми
+        candidates = [row for row in candidates if row[1] == 0]
+        if not candidates:
+            return None
+
+    # требования — по снимку графа в job (workflow могли изменить после постановки)
+    candidates = await filter_capable_nodes(candidates, job_requirements(job))
+
+    if job.retry_at is not None:
+        # повтор после сбоя — на ноду, где job ещё не падал (если такая есть)
+        failed = set((await db.execute(
+            select(JobExecution.node_id)
+            .where(JobExecution.job_id == job.id, JobExecution.status == 'ERROR')
+        )).scalars().all())
+        candidates = [row for row in candidates if row[0].id not in failed] or candidates
+
+    if len(candidates) < 2 or settings.NODE_AFFINITY_WEIGHT <= 0:
+        return candidates[0][0] if candidates else None
+
+    await seed_node_models(db, [node.id for node, _ in candidates])
+    return pick_node(candidates, job_models(job), weight=settings.NODE_AFFINITY_WEIGHT)
 
 
 async def enqueue_job(
@@ -77,6 +146,127 @@ async def enqueue_job(
     await db.commit()
 
 
+@dataclass
+class _BuiltPrompt:
+    prompt: dict
+    # inputs загрузчиков (проверяются после upload)
+    loaders: Set[Tuple[str, str]]
+    # None — object_info ноды недоступен, prompt собран старым путём (без кэша результатов)
+    object_info: Optional[Dict[str, Any]]
+
+
+async def _build_prompt(
+        *,
+        db: AsyncSession,
+        job: Job,
+        node: ComfyNode
+) -> _BuiltPrompt:
+    """
+    API prompt job по object_info ноды (до upload файлов).
+    """
+    # prompt = build_prompt_from_ui_workflow(job.prepared_workflow)
+    # sanitize_prompt = sanitize_prompt_for_comfy(prompt)
+    try:
+        # object_info = await get_object_info(node.base_url)
+        object_info, object_info_fingerprint = await get_object_info_snapshot(node=node)
+    except Exception as e:
+        print(e)
+        # fallback на старое поведение (чтобы не ломать то, что работало)
+        prompt = build_prompt_from_ui_workflow(job.prepared_workflow)
+        sanitize_prompt = sanitize_prompt_for_comfy(prompt)
+        if settings.COMFY_PRUNE_UNUSED_NODES:
+            sanitize_prompt = prune_unreachable_nodes(sanitize_prompt)
+        return _BuiltPrompt(sanitize_prompt, set(), None)
+
+    # Быстрый путь: готовый API prompt (workflow + object_info) + записи job
+    rendered = None
+    if job.bindings is not None:
+        template = await get_prompt_template(
+            db=db,
+            workflow_id=job.workflow_id,
+            object_info=object_info,
+            fingerprint=object_info_fingerprint,
+            version=job.workflow_version,
+            updated_at=job.workflow_updated_at
+        )
+        if template is not None:
+            rendered = template.render(job.bindings)
+
+    if rendered is not None:
+        prompt, touched = rendered
+    else:
+        # Новый безопасный путь
+        prompt = build_prompt_from_ui_workflow_v2(job.prepared_workflow, object_info)
+
+        # Fix combo/default + types
+        prompt, warnings = validate_and_fix_prompt(prompt, object_info)
+        # print("prompt warnings:", warnings)
+
+        prompt = sanitize_prompt_for_comfy(prompt)
+        if settings.COMFY_PRUNE_UNUSED_NODES:
+            prompt = prune_unreachable_nodes(prompt, object_info)
+        touched = set()
+
+    # изменённые записями job inputs (кроме файловых — их проверяем после upload)
+    loaders = loader_inputs(prompt)
+    if touched - loaders:
+        prompt, warnings = validate_and_fix_prompt(prompt, object_info, only=touched - loaders)
+
+    return _BuiltPrompt(prompt, loaders, object_info)
+
+
+async def _reuse_result(
+        *,
+        db: AsyncSession,
+        job: Job
+) -> bool:
+    """
+    Job с тем же prompt_hash уже посчитан (кэш) или считается (coalescing) —
+    execution без отправки в ComfyUI. True — job обработан.
+    """
+    # Тот же prompt + те же файлы уже считали — отдаём готовый результат без GPU
+    cached = await lookup_cached_result(
+        db=db,
+        workflow_id=job.workflow_id,
+        prompt_hash=job.prompt_hash
+    )
+    if cached is not None:
+        source_execution, source_job = cached
+        now = datetime.now()
+        db.add(JobExecution(
+            job_id=job.id,
+            node_id=source_execution.node_id,
+            prompt_id=source_execution.prompt_id,
+            source_execution_id=source_execution.id,
+            source_kind='cache',
+            status='DONE',
+            started_at=now,
+            finished_at=now
+        ))
+        job.status = 'DONE'
+        job.result = source_job.result
+        await db.commit()
+        return True
+
+    # Такой же prompt уже считается — ждём его результат (job_service финализирует обоих)
+    running = await find_running_execution(db=db, job=job)
+    if running is not None:
+        db.add(JobExecution(
+            job_id=job.id,
+            node_id=running.node_id,
+            prompt_id=running.prompt_id,
+            source_execution_id=running.id,
+            source_kind='coalesced',
+            status='RUNNING',
+            started_at=datetime.now()
+        ))
+        job.status = 'RUNNING'
+        await db.commit()
+        return True
+
+    return False
+
+
 async def scheduler_tick(
         *,
         db: AsyncSession,
@@ -85,24 +275,55 @@ async def scheduler_tick(
     """
     Один тик планировщика.
     """
-    # 1. Берём Job, готовые к запуску
-    result = await db.execute(
-        select(Job)
-        .where(Job.status == 'QUEUED')
-        .limit(batch_size)
-    )
-    jobs = result.scalars().all()
+    # 1. Берём Job, готовые к запуску (fair-share: пользователи по очереди, FIFO внутри)
+    jobs = await select_fair_jobs(db=db, limit=batch_size)
 
     if not jobs:
         return
-    
-    # 2. Выбираем ноду
-    node = await select_available_node(db=db)
-    if not node:
-        return
-    
+
+    # сколько prompt ещё можно отправить в ComfyUI (max_queue нод); остальные
+    # job остаются QUEUED — кроме тех, кому GPU не нужен (кэш / coalescing)
+    free_slots = await free_node_slots(db=db)
+    submitted = 0
+
     for job in jobs:
-        # 3. Создаём execution
+        # 2. Нода, по object_info которой собираем prompt (загрузка не важна)
+        build_node = await select_available_node(db=db, job=job, with_capacity=False)
+        if not build_node:
+            # ни одна нода (даже отключённая) не умеет этот workflow — ждать бессмысленно
+            reason = await unservable_reason(db=db, requirements=job_requirements(job))
+            if reason:
+                job.status = 'ERROR'
+                job.error_message = reason
+                await db.commit()
+            continue
+
+        built = None
+        if job.prompt_hash is None:
+            built = await _build_prompt(db=db, job=job, node=build_node)
+            if built.object_info is not None:
+                # хэш сохраняем: пока job ждёт ноду, prompt заново не собираем
+                job.prompt_hash = await compute_prompt_hash(built.prompt, job.files or {})
+                await db.commit()
+
+        # 3. Кэш / coalescing — GPU не нужен, max_queue не проверяем
+        if job.prompt_hash and await _reuse_result(db=db, job=job):
+            continue
+
+        # 4. Нода со свободным местом (загрузка + модели, уже загруженные на ноде);
+        # job, который сейчас поставить некуда, не держит следующие
+        if submitted >= free_slots:
+            continue
+        node = await select_available_node(db=db, job=job)
+        if not node:
+            continue
+
+        if built is None or node.id != build_node.id:
+            built = await _build_prompt(db=db, job=job, node=node)
+            if built.object_info is not None:
+                job.prompt_hash = await compute_prompt_hash(built.prompt, job.files or {})
+
+        # 5. Создаём execution
         execution = JobExecution(
             job_id=job.id,
             node_id=node.id,
@@ -112,38 +333,42 @@ async def scheduler_tick(
 
         db.add(execution)
         job.status = 'RUNNING'
+        submitted += 1
 
         await db.commit()
         await db.refresh(execution)
 
-        # 4. Отправляем в ComfyUI
-
-        # prompt = build_prompt_from_ui_workflow(job.prepared_workflow)
-        # sanitize_prompt = sanitize_prompt_for_comfy(prompt)
-        try:
-            # object_info = await get_object_info(node.base_url)
-            object_info = await get_object_info(node=node)
-        except Exception as e:
-            print(e)
-            # fallback на старое поведение (чтобы не ломать то, что работало)
-            prompt = build_prompt_from_ui_workflow(job.prepared_workflow)
-            sanitize_prompt = sanitize_prompt_for_comfy(prompt)
-        else:
-            # Новый безопасный путь
-            prompt = build_prompt_from_ui_workflow_v2(job.prepared_workflow, object_info)
-
+        # 6. Отправляем в ComfyUI
+        sanitize_prompt = built.prompt
+        if built.object_info is not None:
             # Upload images to Comfy + patch LoadImage inputs.image
-            prompt = await upload_and_patch_images(
-                base_url=node.base_url,
-                prompt_payload=prompt,
-                stored_files=job.files or {}
+            # (файлы для вырезанных нод не загружаются)
+            upload_timings = {}
+            try:
+                prompt = await upload_and_patch_images(
+                    base_url=node.base_url,
+                    prompt_payload=built.prompt,
+                    stored_files=job.files or {},
+                    timings=upload_timings,
+                    shared_storage_prefix=node.shared_storage_prefix,
+                    shared_input_dir=node.shared_input_dir
+                )
+            except Exception as e:
+                await handle_execution_result(
+                    db=db,
+                    execution=execution,
+                    error=str(e),
+                    transient=is_transient_error(e)
+                )
+                continue
+            execution.upload_timings = upload_timings or None
+
+            # остальное уже проверено — проверяем только загруженные inputs
+            sanitize_prompt, warnings = validate_and_fix_prompt(
+                prompt,
+                built.object_info,
+                only=built.loaders
             )
-
-            # Fix combo/default + types
-            prompt, warnings = validate_and_fix_prompt(prompt, object_info)
-            # print("prompt warnings:", warnings)
-
-            sanitize_prompt = sanitize_prompt_for_comfy(prompt)
         
         # with open('prompt.json', 'w', encoding='utf-8') as f:
         #     json.dump(prompt, f, ensure_ascii=False, )
@@ -160,18 +385,24 @@ async def scheduler_tick(
                 # workflow=prompt
                 workflow=sanitize_prompt
             )
+        except Exception as e:
+            # сбой ноды — повтор на другой ноде, ошибка prompt — job в ERROR
+            await handle_execution_result(
+                db=db,
+                execution=execution,
+                error=str(e),
+                transient=is_transient_error(e)
+            )
+            continue
 
-            execution.prompt_id = prompt_id
-            await db.commit()
+        # prompt уже в очереди ComfyUI — дальнейшие сбои не должны переводить execution в ERROR
+        execution.prompt_id = prompt_id
+        await db.commit()
+        charge_job(job)
+        record_node_models(node.id, job_models(job))
 
-            from app.services.comfy_progress import ensure_prompt_tracking
-            await ensure_prompt_tracking(node=node, prompt_id=prompt_id)
-        except Exception as e:
-            execution.status = 'ERROR'
-            execution.error_message = str(e)
-            job.status = 'ERROR'
-            job.error_message = str(e)
-            await db.commit()
+        from app.services.comfy_progress import ensure_prompt_tracking
+        await ensure_prompt_tracking(node=node, prompt_id=prompt_id)
 
 
 async def poll_execution_status(
@@ -200,12 +431,23 @@ async def poll_running_executions(
     """
     result = await db.execute(
         select(JobExecution)
-        .where(JobExecution.status == 'RUNNING')
+        .where(
+            JobExecution.status == 'RUNNING',
+            # присоединённые execution завершаются вместе с исходным
+            JobExecution.source_execution_id.is_(None)
+        )
         .limit(batch_size)
     )
     executions = result.scalars().all()
 
+    # node_id -> (выполняющиеся, ожидающие) prompt_id из /queue — один запрос на ноду за проход
+    node_queues: dict = {}
+
     for execution in executions:
+        if _timed_out(execution):
+            await _fail_timed_out(db=db, execution=execution)
+            continue
+
         if not execution.prompt_id:
             continue
 
@@ -213,15 +455,32 @@ async def poll_running_executions(
         if not node:
             continue
 
-        from app.services.job_service import handle_execution_result
-
         try:
             outputs = await get_prompt_result(node=node, prompt_id=execution.prompt_id)
+            if outputs is None and await _prompt_lost(node, execution.prompt_id, node_queues):
+                # нода перезапустилась (быстрее COMFY_DEAD_AFTER): prompt нет ни в /queue,
+                # ни в /history; перепроверяем history — мог досчитаться между запросами
+                outputs = await get_prompt_result(node=node, prompt_id=execution.prompt_id)
+                if outputs is None:
+                    await handle_execution_result(
+                        db=db,
+                        execution=execution,
+                        error=f'Prompt {execution.prompt_id} lost on node {node.id} (node restarted?)',
+                        transient=True
+                    )
+                    continue
         except Exception as e:
+            transient = is_transient_error(e)
+            if transient and node.is_active:
+                # разовый сбой сети — prompt, скорее всего, ещё считается;
+                # потерянным считаем, когда health check снимет ноду (COMFY_DEAD_AFTER)
+                logger.warning(f'[scheduler] execution {execution.id}: node {node.id} unavailable: {e}')
+                continue
             await handle_execution_result(
                 db=db,
                 execution=execution,
-                error=str(e)
+                error=str(e),
+                transient=transient
             )
             continue
 
@@ -238,4 +497,37 @@ async def poll_running_executions(
             execution=execution,
             result=outputs
         )
-    
\ No newline at end of file
+
+
+async def _prompt_lost(node: ComfyNode, prompt_id: str, node_queues: dict) -> bool:
+    """
+    Prompt нет в очереди ComfyUI (а в history его уже нет — см. вызов).
+    """
+    if node.id not in node_queues:
+        node_queues[node.id] = await get_queue_prompt_ids(node=node)
+    running, pending = node_queues[node.id]
+    return prompt_id not in running and prompt_id not in pending
+
+
+def _timed_out(execution: JobExecution) -> bool:
+    if settings.EXECUTION_TIMEOUT <= 0 or not execution.started_at:
+        return False
+    return (datetime.now() - execution.started_at).total_seconds() > settings.EXECUTION_TIMEOUT
+
+
+async def _fail_timed_out(*, db: AsyncSession, execution: JobExecution) -> None:
+    node = await db.get(ComfyNode, execution.node_id) if execution.node_id else None
+    if node and execution.prompt_id:
+        # не оставляем prompt считаться на ноде параллельно с повтором
+        try:
+            running, _ = await get_queue_prompt_ids(node=node)
+            await cancel_prompt(node=node, prompt_id=execution.prompt_id, running=execution.prompt_id in running)
+        except Exception as e:
+            logger.warning(f'[scheduler] execution {execution.id}: failed to cancel prompt on node {node.id}: {e}')
+
+    await handle_execution_result(
+        db=db,
+        execution=execution,
+        error=f'Execution timed out after {settings.EXECUTION_TIMEOUT} s',
+        transient=True
+    )
@@ -3,6 +3,7 @@ from loguru import logger
 
 from app.db.session import AsyncSessionLocal
 from app.services.scheduler import scheduler_tick, poll_running_executions
+from app.services.queue_eta import refresh_queue_estimates
 
 
 async def scheduler_loop():
@@ -13,6 +14,7 @@ async def scheduler_loop():
             async with AsyncSessionLocal() as db:
                 await scheduler_tick(db=db)
                 await poll_running_executions(db=db)
+                await refresh_queue_estimates(db)
         except asyncio.CancelledError:
             logger.info('Scheduler loop cancelled')
             break
@@ -1,23 +1,41 @@
 from __future__ import annotations
 
 import uuid
-from pathlib import Path
-from typing import Dict, Optional
+import asyncio
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, Optional, Tuple
 from fastapi import UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from app.core.config import settings
+from app.models.file import File
+from app.services.storage_backend import get_storage_backend
 
 BASE_STORAGE_DIR = Path(settings.STORAGE_ROOT)
 
 
-async def _save_one(file: UploadFile, dst_path: Path) -> str:
-    dst_path.parent.mkdir(parents=True, exist_ok=True)
+def resolve_stored_path(rel_path: str) -> Optional[Path]:
+    """
+    Ключ из Job.files -> реальный путь на локальном диске
+    (None, если файла нет или хранилище не локальное).
+    """
+    return get_storage_backend().local_path(rel_path)
+
+
+def read_stored_file(rel_path: str) -> Optional[bytes]:
+    """
+    Содержимое файла из хранилища (None, если файла нет).
+    """
+    try:
+        return get_storage_backend().get(rel_path)
+    except FileNotFoundError:
+        return None
 
-    data = await file.read()
-    with open(dst_path, "wb") as f:
-        f.write(data)
 
-    # возвращаем относительный путь (с прямыми слешами)
-    return str(dst_path.as_posix())
+async def _save_one(file: UploadFile, key: str) -> str:
+    # UploadFile уже лежит во временном файле — копируем потоком, без чтения целиком в память
+    await file.seek(0)
+    return await asyncio.to_thread(get_storage_backend().put, key, file.file)
 
 
 async def save_uploaded_files(
@@ -28,7 +46,7 @@ async def save_uploaded_files(
     mask_key: str = "mask",
 ) -> Dict[str, str]:
     """
-    Возвращает dict: {spec_key: relative_path}
+    Возвращает dict: {spec_key: storage_key}
     images: ключи ДОЛЖНЫ совпадать с spec.inputs.images[i].key (image_123 ...)
     mask_key: ключ ДОЛЖЕН совпадать с spec.inputs.mask.key (mask_40 ...)
     """
@@ -37,8 +55,7 @@ async def save_uploaded_files(
 
     upload_id = uuid.uuid4().hex
     base_dir = (
-        BASE_STORAGE_DIR
-        / "users"
+        PurePosixPath("users")
         / f"user_{user_id}"
         / "uploads"
         / workflow_slug
@@ -51,12 +68,38 @@ async def save_uploaded_files(
             continue
         ext = Path(file.filename).suffix or ".png"
         dst = base_dir / "images" / f"{key}{ext}"
-        result[key] = await _save_one(file, dst)
+        result[key] = await _save_one(file, str(dst))
 
     # Сохраняем маску, если она передана
     if mask and getattr(mask, "filename", None):
         ext = Path(mask.filename).suffix or ".png"
         dst = base_dir / "masks" / f"{mask_key}{ext}"
-        result[mask_key] = await _save_one(mask, dst)
+        result[mask_key] = await _save_one(mask, str(dst))
+
+    return result
+
+
+def file_type_for_key(key: str) -> str:
+    if key == "mask" or key.startswith("mask_"):
+        return "mask"
+    return "input"
+
+
+async def register_job_files(
+    *,
+    db: AsyncSession,
+    job_id: str,
+    files: Iterable[Tuple[str, str]],
+) -> None:
+    """
+    Пишет File-строки для файлов job (по ним работает storage GC).
+    files: [(spec_key, path)], один и тот же path регистрируется один раз.
+    """
+    seen: set[str] = set()
+    for key, path in files:
+        if not isinstance(path, str) or path in seen:
+            continue
+        seen.add(path)
+        db.add(File(job_id=job_id, type=file_type_for_key(key), path=path))
 
-    return result
\ No newline at end of file
+    await db.commit()
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import shutil
+from abc import ABC, abstractmethod
+from io import BytesIO
+from pathlib import Path
+from functools import lru_cache
+from typing import BinaryIO, Iterator, Optional
+
+from app.core.config import settings
+
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+class StorageBackend(ABC):
+    """
+    Хранилище пользовательских файлов (uploads / masks / ...).
+
+    key — относительный posix-путь вида users/user_1/uploads/<slug>/<uuid>/images/image_12.png
+    Методы синхронные: из async-кода вызываем через asyncio.to_thread.
+    """
+    name = 'base'
+
+    @abstractmethod
+    def put(self, key: str, data: bytes | BinaryIO) -> str:
+        ...
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        ...
+
+    @abstractmethod
+    def stream(self, key: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def size(self, key: str) -> Optional[int]:
+        """
+        Размер в байтах; None — файла нет. Прочие ошибки хранилища пробрасываются.
+        """
+        ...
+
+    def presign(self, key: str, expires: int | None = None) -> Optional[str]:
+        """
+        URL для прямого скачивания мимо app-сервера (None — не поддерживается).
+        """
+        return None
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """
+        Путь на локальном диске (None — файл не на локальной ФС).
+        """
+        return None
+
+
+class LocalStorageBackend(StorageBackend):
+    name = 'local'
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def local_path(self, key: str) -> Optional[Path]:
+        path = self._path(key)
+        if path.exists():
+            return path
+
+        # старые записи: путь уже с STORAGE_ROOT (или абсолютный)
+        path = Path(key)
+        if path.exists():
+            return path
+        return None
+
+    def put(self, key: str, data: bytes | BinaryIO) -> str:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(path, 'wb') as f:
+            if isinstance(data, (bytes, bytearray)):
+                f.write(data)
+            else:
+                shutil.copyfileobj(data, f, STREAM_CHUNK_SIZE)
+        return key
+
+    def get(self, key: str) -> bytes:
+        path = self.local_path(key)
+        if path is None:
+            raise FileNotFoundError(key)
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def stream(self, key: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        path = self.local_path(key)
+        if path is None:
+            raise FileNotFoundError(key)
+        with open(path, 'rb') as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def delete(self, key: str) -> None:
+        path = self.local_path(key)
+        if path is None:
+            return
+        path.unlink(missing_ok=True)
+        self._prune_empty_dirs(path.parent)
+
+    def exists(self, key: str) -> bool:
+        return self.local_path(key) is not None
+
+    def size(self, key: str) -> Optional[int]:
+        path = self.local_path(key)
+        if path is None:
+            return None
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def _prune_empty_dirs(self, start: Path) -> None:
+        """
+        Удаляет пустые каталоги вверх по дереву (uploads/<slug>/<uuid>/images ...),
+        не поднимаясь выше root.
+        """
+        try:
+            stop_at = self.root.resolve()
+            current = start.resolve()
+        except OSError:
+            return
+
+        while current != stop_at and stop_at in current.parents:
+            try:
+                current.rmdir()
+            except OSError:
+                return
+            current = current.parent
+
+
+def _is_not_found(error: Exception) -> bool:
+    code = str((getattr(error, 'response', None) or {}).get('Error', {}).get('Code', ''))
+    return code in ('404', 'NoSuchKey', 'NotFound')
+
+
+class S3StorageBackend(StorageBackend):
+    """
+    S3-совместимое хранилище (AWS S3 / MinIO / moto).
+    boto3 — опциональная зависимость, нужна только при STORAGE_BACKEND=s3.
+    """
+    name = 's3'
+
+    def __init__(
+            self,
+            *,
+            bucket: str,
+            endpoint_url: str | None = None,
+            access_key: str | None = None,
+            secret_key: str | None = None,
+            region: str | None = None,
+            prefix: str = '',
+            presign_expires: int = 3600,
+    ):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+        except ImportError as e:
+            raise RuntimeError('STORAGE_BACKEND=s3 requires boto3 to be installed') from e
+
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.presign_expires = presign_expires
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            region_name=region,
+        )
+        # крупные файлы уходят multipart-загрузкой частями по 8 MB
+        self.transfer_config = TransferConfig(
+            multipart_threshold=8 * 1024 * 1024,
+            multipart_chunksize=8 * 1024 * 1024,
+        )
+
+    def _key(self, key: str) -> str:
+        key = key.lstrip('/')
+        return f'{self.prefix}/{key}' if self.prefix else key
+
+    def put(self, key: str, data: bytes | BinaryIO) -> str:
+        fileobj = BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+        self.client.upload_fileobj(fileobj, self.bucket, self._key(key), Config=self.transfer_config)
+        return key
+
+    def _get_object(self, key: str) -> dict:
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            # как у локального backend: вызывающие ловят FileNotFoundError
+            if _is_not_found(e):
+                raise FileNotFoundError(key) from e
+            raise
+
+    def get(self, key: str) -> bytes:
+        return self._get_object(key)['Body'].read()
+
+    def stream(self, key: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        yield from self._get_object(key)['Body'].iter_chunks(chunk_size)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def exists(self, key: str) -> bool:
+        return self.size(key) is not None
+
+    def size(self, key: str) -> Optional[int]:
+        from botocore.exceptions import ClientError
+
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            # 403 / throttling / 5xx — не "файла нет": GC не должен забыть объект
+            if _is_not_found(e):
+                return None
+            raise
+        return int(response.get('ContentLength') or 0)
+
+    def presign(self, key: str, expires: int | None = None) -> Optional[str]:
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': self._key(key)},
+            ExpiresIn=expires or self.presign_expires,
+        )
+
+
+@lru_cache(maxsize=1)
+def get_storage_backend() -> StorageBackend:
+    backend = (settings.STORAGE_BACKEND or 'local').lower()
+
+    if backend == 'local':
+        return LocalStorageBackend(settings.STORAGE_ROOT)
+
+    if backend == 's3':
+        if not settings.S3_BUCKET:
+            raise RuntimeError('STORAGE_BACKEND=s3 requires S3_BUCKET')
+        return S3StorageBackend(
+            bucket=settings.S3_BUCKET,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            access_key=settings.S3_ACCESS_KEY,
+            secret_key=settings.S3_SECRET_KEY,
+            region=settings.S3_REGION,
+            prefix=settings.S3_PREFIX,
+            presign_expires=settings.S3_PRESIGN_EXPIRES,
+        )
+
+    raise RuntimeError(f'Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}')
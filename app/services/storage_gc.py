@@ -0,0 +1,192 @@
+import asyncio
+from pathlib import Path
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from loguru import logger
+from sqlalchemy import select, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.file import File
+from app.models.job import Job
+from app.services.storage_backend import get_storage_backend
+from app.services.thumbnails import DERIVATIVES_DIR
+
+
+# Файлы удаляем только у завершённых job
+FINISHED_JOB_STATUSES = ('DONE', 'ERROR')
+
+
+def _retention_by_type() -> Dict[str, timedelta]:
+    return {
+        'input': timedelta(days=settings.STORAGE_RETENTION_INPUT_DAYS),
+        'mask': timedelta(days=settings.STORAGE_RETENTION_MASK_DAYS),
+        'output': timedelta(days=settings.STORAGE_RETENTION_OUTPUT_DAYS),
+    }
+
+
+@dataclass
+class GcReport:
+    dry_run: bool
+    files: int = 0
+    bytes: int = 0
+    # user_id -> {'files': n, 'bytes': n}
+    per_user: Dict[int, Dict[str, int]] = field(default_factory=dict)
+    # кэш производных (thumb / preview) к пользователю не привязан
+    derivatives_files: int = 0
+    derivatives_bytes: int = 0
+    errors: int = 0
+
+    def add(self, user_id: int, size: int) -> None:
+        self.files += 1
+        self.bytes += size
+        usage = self.per_user.setdefault(user_id, {'files': 0, 'bytes': 0})
+        usage['files'] += 1
+        usage['bytes'] += size
+
+    def to_dict(self) -> dict:
+        return {
+            'dry_run': self.dry_run,
+            'files': self.files,
+            'bytes': self.bytes,
+            'per_user': {str(k): v for k, v in sorted(self.per_user.items())},
+            'derivatives': {
+                'files': self.derivatives_files,
+                'bytes': self.derivatives_bytes,
+            },
+            'errors': self.errors,
+        }
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+async def find_expired_files(
+        *,
+        db: AsyncSession,
+        now: datetime | None = None,
+) -> List[Tuple[File, int]]:
+    """
+    Возвращает [(File, user_id)] с истёкшим сроком хранения.
+    """
+    now = now or datetime.now()
+
+    conditions = [
+        and_(File.type == file_type, File.created_at < now - retention)
+        for file_type, retention in _retention_by_type().items()
+    ]
+
+    result = await db.execute(
+        select(File, Job.user_id)
+        .join(Job, Job.id == File.job_id)
+        .where(
+            Job.status.in_(FINISHED_JOB_STATUSES),
+            or_(*conditions),
+        )
+        .order_by(File.created_at.asc())
+    )
+    return [(f, user_id) for f, user_id in result.all()]
+
+
+def _expired_derivatives(now: datetime) -> List[Path]:
+    if not DERIVATIVES_DIR.exists():
+        return []
+
+    cutoff = (now - _retention_by_type()['output']).timestamp()
+    expired: List[Path] = []
+    for path in DERIVATIVES_DIR.rglob('*'):
+        try:
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                expired.append(path)
+        except OSError:
+            continue
+    return expired
+
+
+async def run_storage_gc(
+        *,
+        db: AsyncSession,
+        dry_run: bool = False,
+) -> GcReport:
+    """
+    Один проход GC.
+    - dry_run=True: только считает, сколько байт можно освободить (по пользователям)
+    - иначе удаляет файлы пачками по STORAGE_GC_BATCH_SIZE с паузой между пачками,
+      чтобы не устраивать всплесков I/O.
+    """
+    now = datetime.now()
+    report = GcReport(dry_run=dry_run)
+    batch_size = max(1, settings.STORAGE_GC_BATCH_SIZE)
+    backend = get_storage_backend()
+
+    expired = await find_expired_files(db=db, now=now)
+
+    for start in range(0, len(expired), batch_size):
+        batch = expired[start:start + batch_size]
+
+        for file_row, user_id in batch:
+            try:
+                size = await asyncio.to_thread(backend.size, file_row.path)
+            except Exception as e:
+                # хранилище не ответило — объект мог остаться, строку не удаляем
+                report.errors += 1
+                logger.warning(f'[storage-gc] failed to stat {file_row.path}: {e}')
+                continue
+            report.add(user_id, size or 0)
+
+            if dry_run:
+                continue
+
+            if size is not None:
+                try:
+                    await asyncio.to_thread(backend.delete, file_row.path)
+                except Exception as e:
+                    report.errors += 1
+                    logger.warning(f'[storage-gc] failed to delete {file_row.path}: {e}')
+                    continue
+
+            await db.delete(file_row)
+
+        if not dry_run:
+            await db.commit()
+            await asyncio.sleep(settings.STORAGE_GC_BATCH_PAUSE)
+
+    derivatives = await asyncio.to_thread(_expired_derivatives, now)
+    for start in range(0, len(derivatives), batch_size):
+        for path in derivatives[start:start + batch_size]:
+            report.derivatives_files += 1
+            report.derivatives_bytes += _file_size(path)
+            if not dry_run:
+                await asyncio.to_thread(path.unlink, missing_ok=True)
+
+        if not dry_run:
+            await asyncio.sleep(settings.STORAGE_GC_BATCH_PAUSE)
+
+    return report
+
+
+async def storage_gc_loop():
+    logger.info('Storage GC loop started')
+
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                report = await run_storage_gc(db=db)
+            logger.info(
+                f'Storage GC: removed {report.files} files ({report.bytes} bytes), '
+                f'{report.derivatives_files} derivatives ({report.derivatives_bytes} bytes)'
+            )
+        except asyncio.CancelledError:
+            logger.info('Storage GC loop cancelled')
+            break
+        except Exception as e:
+            logger.exception(f'Storage GC loop error: {e}')
+
+        await asyncio.sleep(settings.STORAGE_GC_INTERVAL)
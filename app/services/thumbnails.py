@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from io import BytesIO
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from loguru import logger
+from PIL import Image, ImageOps, features
+
+from app.core.config import settings
+from app.services.storage import read_stored_file
+
+
+# size name -> максимальная сторона (px)
+DERIVATIVE_SIZES: Dict[str, int] = {
+    "thumb": 256,
+    "preview": 1024,
+}
+
+_FORMATS = {
+    "WEBP": ("webp", "image/webp"),
+    "AVIF": ("avif", "image/avif"),
+}
+
+# Кэш производных — всегда локальный диск (даже при S3-хранилище оригиналов)
+DERIVATIVES_DIR = Path(settings.STORAGE_ROOT) / "cache" / "derivatives"
+
+# Pillow отпускает GIL при decode/resize/encode, поэтому пула потоков достаточно
+_EXECUTOR = ThreadPoolExecutor(
+    max_workers=settings.THUMBNAIL_WORKERS,
+    thread_name_prefix="thumbnails",
+)
+
+# source_key (node/type/subfolder/filename) -> content hash,
+# чтобы при повторном запросе не тянуть оригинал с ComfyUI
+_SOURCE_HASHES: "OrderedDict[str, str]" = OrderedDict()
+_SOURCE_HASHES_MAX = 10_000
+
+# digest:size -> lock (чтобы не рендерить одно и то же параллельно)
+_LOCKS: Dict[str, asyncio.Lock] = {}
+
+# ссылки на фоновые задачи прогрева (иначе их может собрать GC)
+_BACKGROUND: set[asyncio.Task] = set()
+
+
+def _output_format() -> str:
+    fmt = (settings.THUMBNAIL_FORMAT or "WEBP").upper()
+    if fmt == "AVIF" and not features.check("avif"):
+        return "WEBP"
+    return fmt if fmt in _FORMATS else "WEBP"
+
+
+def media_type_for_derivatives() -> str:
+    return _FORMATS[_output_format()][1]
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def _derivative_path(digest: str, size: str) -> Path:
+    ext = _FORMATS[_output_format()][0]
+    return DERIVATIVES_DIR / digest[:2] / f"{digest}_{size}.{ext}"
+
+
+def _render_derivative(content: bytes, max_side: int, fmt: str) -> bytes:
+    with Image.open(BytesIO(content)) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if "A" in im.getbands() else "RGB")
+
+        im.thumbnail((max_side, max_side), resample=Image.LANCZOS)
+
+        out = BytesIO()
+        im.save(out, format=fmt, quality=settings.THUMBNAIL_QUALITY)
+        return out.getvalue()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    tmp.replace(path)
+
+
+def remember_source(source_key: str, digest: str) -> None:
+    _SOURCE_HASHES[source_key] = digest
+    _SOURCE_HASHES.move_to_end(source_key)
+    while len(_SOURCE_HASHES) > _SOURCE_HASHES_MAX:
+        _SOURCE_HASHES.popitem(last=False)
+
+
+def get_cached_derivative(source_key: str, size: str) -> Optional[Path]:
+    """
+    Быстрый путь: оригинал уже видели, производная уже лежит на диске.
+    """
+    digest = _SOURCE_HASHES.get(source_key)
+    if not digest:
+        return None
+    path = _derivative_path(digest, size)
+    return path if path.exists() else None
+
+
+async def get_derivative(content: bytes, size: str, *, source_key: str | None = None) -> Path:
+    """
+    Возвращает путь к производной (thumb / preview) для содержимого файла.
+    Кэш на диске: <digest>_<size>.<ext>, рендер — в пуле потоков.
+    """
+    if size not in DERIVATIVE_SIZES:
+        raise ValueError(f"Unknown derivative size: {size}")
+
+    loop = asyncio.get_running_loop()
+    digest = await loop.run_in_executor(_EXECUTOR, content_hash, content)
+    if source_key:
+        remember_source(source_key, digest)
+
+    path = _derivative_path(digest, size)
+    if path.exists():
+        return path
+
+    lock = _LOCKS.setdefault(f"{digest}:{size}", asyncio.Lock())
+    async with lock:
+        if not path.exists():
+            data = await loop.run_in_executor(
+                _EXECUTOR,
+                _render_derivative,
+                content,
+                DERIVATIVE_SIZES[size],
+                _output_format(),
+            )
+            await loop.run_in_executor(_EXECUTOR, _write_atomic, path, data)
+    _LOCKS.pop(f"{digest}:{size}", None)
+
+    return path
+
+
+def _read_stored(key: str) -> bytes:
+    content = read_stored_file(key)
+    if content is None:
+        raise FileNotFoundError(key)
+    return content
+
+
+async def warm_file_derivatives(keys: Iterable[str]) -> None:
+    """
+    Генерирует все размеры для загруженных входных файлов (ключи хранилища).
+    """
+    loop = asyncio.get_running_loop()
+    for key in keys:
+        try:
+            content = await loop.run_in_executor(_EXECUTOR, _read_stored, key)
+            for size in DERIVATIVE_SIZES:
+                await get_derivative(content, size, source_key=f"file:{key}")
+        except Exception as e:
+            logger.warning(f"[thumbnails] failed to prepare derivatives for {key}: {e}")
+
+
+def schedule_file_derivatives(keys: Iterable[str]) -> None:
+    """
+    Запускает прогрев производных в фоне, не задерживая ответ пользователю.
+    """
+    keys = list(keys)
+    if not keys:
+        return
+    task = asyncio.create_task(warm_file_derivatives(keys))
+    _BACKGROUND.add(task)
+    task.add_done_callback(_BACKGROUND.discard)
+
+
+async def get_file_derivative(key: str, size: str) -> Path:
+    cached = get_cached_derivative(f"file:{key}", size)
+    if cached:
+        return cached
+
+    loop = asyncio.get_running_loop()
+    content = await loop.run_in_executor(_EXECUTOR, _read_stored, key)
+    return await get_derivative(content, size, source_key=f"file:{key}")
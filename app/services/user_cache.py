@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.config import settings
+from app.models.user import User
+
+
+# user_id -> (monotonic fetched_at, значения колонок); сбрасывается при правках админом
+_USERS: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_USERS_MAX = 10_000
+
+_USER_FIELDS = tuple(column.key for column in User.__table__.columns)
+
+
+def _materialize(values: Dict[str, Any]) -> User:
+    # свой экземпляр на запрос: ORM-объект нельзя делить между сессиями
+    user = User(**values)
+    make_transient_to_detached(user)
+    return user
+
+
+async def get_cached_user(db: AsyncSession, user_id: int) -> Optional[User]:
+    """
+    User по id из кэша процесса (USER_CACHE_TTL секунд), иначе из БД.
+    """
+    cached = _USERS.get(user_id)
+    if cached and time.monotonic() - cached[0] < settings.USER_CACHE_TTL:
+        _USERS.move_to_end(user_id)
+        return _materialize(cached[1])
+
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalar_one_or_none()
+    if user is None:
+        _USERS.pop(user_id, None)
+        return None
+
+    _USERS[user_id] = (time.monotonic(), {field: getattr(user, field) for field in _USER_FIELDS})
+    _USERS.move_to_end(user_id)
+    while len(_USERS) > _USERS_MAX:
+        _USERS.popitem(last=False)
+    return user
+
+
+def invalidate_user(user_id: int) -> None:
+    _USERS.pop(user_id, None)
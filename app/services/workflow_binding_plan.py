@@ -0,0 +1,379 @@
+from __future__ import annotations
+
+import random
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.models.workflow import Workflow
+from app.schemas.workflow_spec_v2 import BindingSpec, WorkflowSpecV2
+from app.services.workflow_mapper import (
+    WorkflowPatch,
+    _coerce_value,
+    _embed_mask_into_alpha,
+    _ensure_list_size,
+    _find_widget_field_index_in_inputs_list,
+    _node_type,
+    _widget_index,
+)
+
+
+# kind слота:
+#   widget  — widgets_values[widget_idx] (+ литерал в inputs-list)
+#   dict    — node["inputs"][field]
+#   noop    — binding ни на что не указывает (apply_binding ничего не делает)
+#   missing — узла нет: при применении 400 (как apply_binding)
+WIDGET = "widget"
+DICT = "dict"
+NOOP = "noop"
+MISSING = "missing"
+
+
+@dataclass(frozen=True)
+class BindingSlot:
+    key: str
+    node_id: str
+    field: str
+    kind: str
+    pos: int | None = None
+    widget_idx: int | None = None
+    literal_pos: int | None = None
+    error: str | None = None
+
+
+@dataclass(frozen=True)
+class ParamSlot:
+    slot: BindingSlot
+    coerce: Callable[[Any], Any]
+    default: Any
+    choices: FrozenSet[Any] | None
+    map: Dict[str, Any] | None
+    # binding совпадает с text-binding: значение не пишем
+    protected: bool
+
+
+@dataclass(frozen=True)
+class ImageSlot:
+    slot: BindingSlot
+    modes: FrozenSet[str] | None
+    # LoadImage: дополнительно widget_1 = "image"
+    upload_mode_slot: BindingSlot | None
+
+
+@dataclass
+class BindingPlan:
+    """
+    Скомпилированный spec + workflow: плоский список слотов с уже найденной
+    позицией узла и индексом виджета. Применение — цикл по слотам без
+    поиска узлов / regex по field.
+    """
+    modes: FrozenSet[str]
+    params: List[ParamSlot] = field(default_factory=list)
+    images: List[ImageSlot] = field(default_factory=list)
+    mask: BindingSlot | None = None
+    texts: List[BindingSlot] = field(default_factory=list)
+    # (depends_on image key, mask key): маску встраиваем в alpha базовой картинки
+    embed_mask: Tuple[str, str] | None = None
+    random_noise_positions: List[int] = field(default_factory=list)
+
+    def execute(
+        self,
+        *,
+        workflow_json: dict,
+        text_inputs: dict,
+        param_inputs: dict,
+        uploaded_files: dict,
+        mode: str = "default",
+    ) -> dict:
+        return self.execute_patch(
+            workflow_json=workflow_json,
+            text_inputs=text_inputs,
+            param_inputs=param_inputs,
+            uploaded_files=uploaded_files,
+            mode=mode,
+        ).materialize()
+
+    def execute_patch(
+        self,
+        *,
+        workflow_json: dict,
+        text_inputs: dict,
+        param_inputs: dict,
+        uploaded_files: dict,
+        mode: str = "default",
+    ) -> WorkflowPatch:
+        if mode not in self.modes:
+            raise HTTPException(status_code=400, detail=f'Invalid mode "{mode}", available: {set(self.modes)}')
+
+        patch = WorkflowPatch(workflow_json)
+
+        # 1) PARAMS
+        for p in self.params:
+            value = p.coerce(param_inputs.get(p.slot.key, None))
+            if p.choices and value not in p.choices:
+                value = p.default
+
+            if p.map:
+                if mode not in p.map:
+                    raise HTTPException(status_code=400, detail=f'Mode "{mode}" not supported for "{p.slot.key}"')
+                value = p.map[mode]
+
+            if p.protected:
+                continue
+
+            _write(patch, p.slot, value)
+
+        # 2.5) MASK PRE-PROCESS
+        if self.embed_mask:
+            depends_key, mask_key = self.embed_mask
+            if depends_key in uploaded_files and mask_key in uploaded_files:
+                merged = _embed_mask_into_alpha(uploaded_files[depends_key], uploaded_files[mask_key])
+                uploaded_files[depends_key] = merged
+                uploaded_files.pop(mask_key, None)
+
+        # 2) IMAGES
+        for img in self.images:
+            if img.modes and mode not in img.modes:
+                continue
+            if img.slot.key not in uploaded_files:
+                continue
+            _write(patch, img.slot, uploaded_files[img.slot.key])
+
+        # LoadImage: widget_1 = upload mode
+        for img in self.images:
+            if img.upload_mode_slot and img.slot.key in uploaded_files:
+                _write(patch, img.upload_mode_slot, "image")
+
+        # 3) MASK
+        if self.mask and self.mask.key in uploaded_files:
+            _write(patch, self.mask, uploaded_files[self.mask.key])
+
+        # 4) TEXT
+        for slot in self.texts:
+            if slot.key in text_inputs:
+                _write(patch, slot, text_inputs[slot.key])
+
+        _randomize_seeds(patch, self.random_noise_positions)
+        return patch
+
+
+def _write(patch: WorkflowPatch, slot: BindingSlot, value: Any) -> None:
+    if slot.kind == MISSING:
+        raise HTTPException(status_code=400, detail=slot.error)
+
+    if slot.kind == WIDGET:
+        node = patch.node_at(slot.pos)
+        widgets_values = node.get("widgets_values")
+        if not isinstance(widgets_values, list):
+            node["widgets_values"] = []
+            widgets_values = node["widgets_values"]
+
+        _ensure_list_size(widgets_values, slot.widget_idx)
+        widgets_values[slot.widget_idx] = value
+
+        if slot.literal_pos is not None:
+            node["inputs"][slot.literal_pos] = value
+
+    elif slot.kind == DICT:
+        patch.node_at(slot.pos)["inputs"][slot.field] = value
+
+    patch.writes.append((slot.node_id, slot.field, value))
+
+
+def _randomize_seeds(patch: WorkflowPatch, positions: List[int]) -> None:
+    nodes = patch.workflow["nodes"]
+    for pos in positions:
+        widgets = nodes[pos].get("widgets_values")
+        if not isinstance(widgets, list) or len(widgets) < 2:
+            continue
+
+        mode = widgets[1]
+        if isinstance(mode, str) and mode.lower() == "randomize":
+            seed = random.randint(0, 2**63 - 1)
+            patch.node_at(pos)["widgets_values"][0] = seed
+            patch.writes.append((str(nodes[pos].get("id")), "widget_0", seed))
+
+
+# ------------------------------------------------------------
+# Compiler
+# ------------------------------------------------------------
+
+def _literal_position(node_inputs: list, widget_idx: int) -> int | None:
+    literal_positions = [i for i, v in enumerate(node_inputs) if not isinstance(v, dict)]
+    if widget_idx < 0 or widget_idx >= len(literal_positions):
+        return None
+    return literal_positions[widget_idx]
+
+
+def _compile_slot(
+        key: str,
+        binding: BindingSpec,
+        nodes: list,
+        positions: Dict[Any, int],
+) -> BindingSlot:
+    """
+    Разрешает binding так же, как apply_binding, но один раз.
+    """
+    node_id = str(binding.node_id)
+    field_ = binding.field
+    base = dict(key=key, node_id=node_id, field=str(field_))
+
+    try:
+        node_id_int = int(binding.node_id)
+    except Exception:
+        return BindingSlot(**base, kind=MISSING, error=f"Invalid node_id in binding: {binding.node_id}")
+
+    pos = positions.get(node_id_int)
+    if pos is None:
+        return BindingSlot(**base, kind=MISSING, error=f"Node with id={node_id_int} not found")
+
+    node_inputs = nodes[pos].get("inputs")
+
+    if isinstance(field_, str) and field_.startswith("widget_"):
+        widx = _widget_index(field_)
+        if widx is None:
+            return BindingSlot(**base, kind=NOOP)
+        literal_pos = _literal_position(node_inputs, widx) if isinstance(node_inputs, list) else None
+        return BindingSlot(**base, kind=WIDGET, pos=pos, widget_idx=widx, literal_pos=literal_pos)
+
+    if isinstance(node_inputs, dict):
+        return BindingSlot(**base, kind=DICT, pos=pos)
+
+    if isinstance(node_inputs, list):
+        widx = _widget_index(field_)
+        if widx is None and isinstance(field_, str):
+            widx = _find_widget_field_index_in_inputs_list(node_inputs, field_)
+        if widx is None:
+            return BindingSlot(**base, kind=NOOP)
+        return BindingSlot(
+            **base,
+            kind=WIDGET,
+            pos=pos,
+            widget_idx=widx,
+            literal_pos=_literal_position(node_inputs, widx),
+        )
+
+    return BindingSlot(**base, kind=NOOP)
+
+
+def compile_binding_plan(spec: WorkflowSpecV2, workflow_json: dict) -> Optional[BindingPlan]:
+    """
+    spec + UI workflow -> BindingPlan.
+    None — workflow нестандартный (nodes не список и т.п.), тогда маппинг
+    идёт обычным путём через map_inputs_to_workflow.
+    """
+    nodes = workflow_json.get("nodes") if isinstance(workflow_json, dict) else None
+    if not isinstance(nodes, list) or not all(isinstance(n, dict) for n in nodes):
+        return None
+
+    positions: Dict[Any, int] = {}
+    for pos, n in enumerate(nodes):
+        positions.setdefault(n.get("id"), pos)
+
+    plan = BindingPlan(modes=frozenset(m.id for m in spec.modes))
+
+    protected = {
+        (str(t.binding.node_id), str(t.binding.field))
+        for t in spec.inputs.text
+        if t.binding
+    }
+
+    for param in spec.inputs.params:
+        if not param.binding:
+            continue
+
+        slot = _compile_slot(param.key, param.binding, nodes, positions)
+        # apply_param молча пропускает отсутствующий узел
+        if slot.kind == MISSING:
+            slot = BindingSlot(key=slot.key, node_id=slot.node_id, field=slot.field, kind=NOOP)
+
+        choices = getattr(param, "choices", None)
+        plan.params.append(ParamSlot(
+            slot=slot,
+            coerce=partial(_coerce_value, param),
+            default=param.default,
+            choices=frozenset(choices) if choices else None,
+            map=dict(param.binding.map) if param.binding.map else None,
+            protected=(slot.node_id, slot.field) in protected,
+        ))
+
+    mask = spec.inputs.mask
+    if mask and mask.binding:
+        depends_key = getattr(mask, "depends_on", None)
+        img_spec = next((i for i in spec.inputs.images if i.key == depends_key), None)
+        if (
+            isinstance(depends_key, str)
+            and img_spec
+            and img_spec.binding
+            and str(img_spec.binding.node_id) == str(mask.binding.node_id)
+            and str(img_spec.binding.field) == str(mask.binding.field)
+        ):
+            plan.embed_mask = (depends_key, mask.key)
+
+        plan.mask = _compile_slot(mask.key, mask.binding, nodes, positions)
+
+    for img in spec.inputs.images:
+        if not img.binding:
+            continue
+
+        slot = _compile_slot(img.key, img.binding, nodes, positions)
+
+        upload_mode_slot = None
+        if slot.kind != MISSING:
+            node = nodes[positions[int(img.binding.node_id)]]
+            if node.get("type") == "LoadImage" or node.get("class_type") == "LoadImage":
+                upload_mode_slot = _compile_slot(
+                    img.key,
+                    BindingSpec(node_id=str(int(img.binding.node_id)), field="widget_1"),
+                    nodes,
+                    positions,
+                )
+
+        plan.images.append(ImageSlot(
+            slot=slot,
+            modes=frozenset(img.modes) if img.modes else None,
+            upload_mode_slot=upload_mode_slot,
+        ))
+
+    for t in spec.inputs.text:
+        if t.binding:
+            plan.texts.append(_compile_slot(t.key, t.binding, nodes, positions))
+
+    plan.random_noise_positions = [
+        pos for pos, n in enumerate(nodes) if _node_type(n) == "RandomNoise"
+    ]
+    return plan
+
+
+# ------------------------------------------------------------
+# Cache
+# ------------------------------------------------------------
+
+# (workflow_id, version, updated_at) -> plan (None — компиляция не удалась)
+_PLANS: "OrderedDict[tuple, Optional[BindingPlan]]" = OrderedDict()
+_PLANS_MAX = 256
+
+
+def _plan_key(workflow: Workflow) -> tuple:
+    return (workflow.id, workflow.version, workflow.updated_at)
+
+
+def get_binding_plan(workflow: Workflow, spec: WorkflowSpecV2) -> Optional[BindingPlan]:
+    key = _plan_key(workflow)
+    if key in _PLANS:
+        _PLANS.move_to_end(key)
+        return _PLANS[key]
+
+    plan = compile_binding_plan(spec, workflow.workflow_json)
+    _PLANS[key] = plan
+    while len(_PLANS) > _PLANS_MAX:
+        _PLANS.popitem(last=False)
+    return plan
+
+
+def invalidate_binding_plan(workflow_id: str) -> None:
+    for key in [k for k in _PLANS if k[0] == workflow_id]:
+        _PLANS.pop(key, None)
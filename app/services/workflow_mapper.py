@@ -3,7 +3,7 @@ import re
 import json
 import random
 from copy import deepcopy
-from typing import Any, Dict
+from typing import TYPE_CHECKING, Any, Dict
 
 from fastapi import HTTPException
 
@@ -13,8 +13,14 @@ from app.schemas.workflow_spec_v2 import (
     BindingSpec,
 )
 
+from io import BytesIO
+from pathlib import PurePosixPath
 from PIL import Image, ImageOps
-from pathlib import Path
+
+from app.services.storage_backend import get_storage_backend
+
+if TYPE_CHECKING:
+    from app.services.workflow_binding_plan import BindingPlan
 
 
 # ------------------------------------------------------------
@@ -24,11 +30,14 @@ from pathlib import Path
 def normalize_workflow_for_comfy(workflow: dict) -> dict:
     """
     Converts ComfyUI UI-exported workflow to API-ready prompt format.
+    Nodes may be shared with the stored workflow (see WorkflowPatch),
+    so they are replaced, not mutated.
     """
-    for node in workflow.get("nodes", []):
+    nodes = workflow.get("nodes", [])
+    for i, node in enumerate(nodes):
         # UI uses "type", API requires "class_type"
         if "class_type" not in node:
-            node["class_type"] = node.get("type")
+            nodes[i] = {**node, "class_type": node.get("type")}
     return workflow
 
 
@@ -36,6 +45,27 @@ def _find_node(nodes: list[dict], node_id: int) -> dict | None:
     return next((n for n in nodes if n.get("id") == node_id), None)
 
 
+def _index_nodes(nodes: Any) -> Dict[Any, dict]:
+    """
+    node id -> node. Для серии вызовов apply_binding по одному workflow,
+    чтобы не сканировать весь список nodes на каждый binding.
+    При дублях id побеждает первый узел (как в _find_node).
+    """
+    index: Dict[Any, dict] = {}
+    if not isinstance(nodes, list):
+        return index
+    for n in nodes:
+        if isinstance(n, dict):
+            index.setdefault(n.get("id"), n)
+    return index
+
+
+def _lookup_node(workflow: dict, node_id: int, node_index: "NodeIndex | None") -> dict | None:
+    if node_index is not None:
+        return node_index.get(node_id)
+    return _find_node(workflow.get("nodes", []), node_id)
+
+
 def _ensure_list_size(lst: list, index: int) -> None:
     while len(lst) <= index:
         lst.append(None)
@@ -203,13 +233,19 @@ def _ensure_inputs_dict(node: dict) -> dict:
 
 
 def _embed_mask_into_alpha(base_path: str, mask_path: str) -> str:
-    base_p = Path(base_path)
+    """
+    base_path / mask_path — ключи хранилища; результат кладётся рядом
+    (<stem>__masked.png), возвращается его ключ.
+    Блокирующая (хранилище + PIL): маппинг с маской вызывается через asyncio.to_thread.
+    """
+    backend = get_storage_backend()
+    base_p = PurePosixPath(base_path)
     out_path = base_p.with_name(base_p.stem + "__masked.png")
 
-    with Image.open(base_path) as im_base:
+    with Image.open(BytesIO(backend.get(base_path))) as im_base:
         im_base = im_base.convert("RGBA")
 
-        with Image.open(mask_path) as im_mask:
+        with Image.open(BytesIO(backend.get(mask_path))) as im_mask:
             # инверсия маски
             im_mask_l = ImageOps.invert(im_mask.convert("L"))
 
@@ -218,16 +254,104 @@ def _embed_mask_into_alpha(base_path: str, mask_path: str) -> str:
 
         r, g, b, _a = im_base.split()
         im_out = Image.merge("RGBA", (r, g, b, im_mask_l))
-        im_out.save(out_path, format="PNG")
 
-    return str(out_path)
+        out = BytesIO()
+        im_out.save(out, format="PNG")
+
+    return backend.put(str(out_path), out.getvalue())
+
+
+# ------------------------------------------------------------
+# Copy-on-write patch
+# ------------------------------------------------------------
+
+class WorkflowPatch:
+    """
+    Copy-on-write обёртка над UI workflow.
+
+    Вместо deepcopy всего графа (groups, pos/size, extra ...) копируются
+    только верхний dict и список nodes; узел копируется (deepcopy) при первой
+    записи в него. Остальные узлы и ключи разделяются с исходным workflow_json,
+    поэтому его нельзя менять после materialize().
+
+    writes — применённые bindings: [(node_id, field, value)].
+    """
+
+    def __init__(self, workflow_json: dict):
+        nodes = workflow_json.get("nodes")
+        self.workflow: dict = dict(workflow_json)
+        if isinstance(nodes, list):
+            self.workflow["nodes"] = list(nodes)
+
+        self._positions: Dict[Any, int] = {}
+        if isinstance(nodes, list):
+            for pos, n in enumerate(nodes):
+                if isinstance(n, dict):
+                    self._positions.setdefault(n.get("id"), pos)
+
+        self._copied: set[int] = set()
+        self.writes: list[tuple[str, str, Any]] = []
+
+    def node_at(self, pos: int) -> dict:
+        nodes = self.workflow["nodes"]
+        if pos not in self._copied:
+            nodes[pos] = deepcopy(nodes[pos])
+            self._copied.add(pos)
+        return nodes[pos]
+
+    def get(self, node_id: Any) -> dict | None:
+        """
+        Узел для записи (совместим с node index в apply_binding).
+        """
+        pos = self._positions.get(node_id)
+        if pos is None:
+            return None
+        return self.node_at(pos)
+
+    def peek(self, node_id: Any) -> dict | None:
+        """
+        Узел только для чтения (без копирования).
+        """
+        pos = self._positions.get(node_id)
+        if pos is None:
+            return None
+        return self.workflow["nodes"][pos]
+
+    def apply(self, binding: BindingSpec, value: Any) -> None:
+        apply_binding(self.workflow, binding, value, self)
+        self.writes.append((str(binding.node_id), str(binding.field), value))
+
+    def apply_param(self, param: ParamInputSpec, value: Any) -> None:
+        apply_param(self.workflow, param, value, self)
+        if param.binding:
+            self.writes.append((str(param.binding.node_id), str(param.binding.field), value))
+
+    @property
+    def copied_nodes(self) -> int:
+        return len(self._copied)
+
+    def materialize(self) -> dict:
+        """
+        Полный workflow (для prepared_workflow / extra_pnginfo).
+        Нетронутые узлы — ссылки на исходные.
+        """
+        return self.workflow
+
+
+# id -> node (dict из _index_nodes) или WorkflowPatch
+NodeIndex = Dict[Any, dict] | WorkflowPatch
 
 
 # ------------------------------------------------------------
 # Binding application
 # ------------------------------------------------------------
 
-def apply_binding(workflow: dict, binding: BindingSpec, value: Any) -> None:
+def apply_binding(
+    workflow: dict,
+    binding: BindingSpec,
+    value: Any,
+    node_index: NodeIndex | None = None,
+) -> None:
     nodes = workflow.get("nodes")
     if not isinstance(nodes, list):
         raise HTTPException(status_code=400, detail="workflow['nodes'] must be a list")
@@ -237,7 +361,7 @@ def apply_binding(workflow: dict, binding: BindingSpec, value: Any) -> None:
     except Exception:
         raise HTTPException(status_code=400, detail=f"Invalid node_id in binding: {binding.node_id}")
 
-    node = _find_node(nodes, node_id_int)
+    node = _lookup_node(workflow, node_id_int, node_index)
     if node is None:
         raise HTTPException(status_code=400, detail=f"Node with id={node_id_int} not found")
 
@@ -288,12 +412,12 @@ def apply_binding(workflow: dict, binding: BindingSpec, value: Any) -> None:
     return
 
 
-def apply_random_seed_if_needed(workflow: dict):
+def apply_random_seed_if_needed(workflow: dict, patch: WorkflowPatch | None = None):
     nodes = workflow.get("nodes")
     if not isinstance(nodes, list):
         return
 
-    for node in nodes:
+    for pos, node in enumerate(nodes):
         if not isinstance(node, dict):
             continue
 
@@ -306,20 +430,28 @@ def apply_random_seed_if_needed(workflow: dict):
 
         mode = widgets[1]
         if isinstance(mode, str) and mode.lower() == "randomize":
-            widgets[0] = random.randint(0, 2**63 - 1)
-
-
-def apply_param(workflow: dict, param: ParamInputSpec, value: Any) -> None:
+            seed = random.randint(0, 2**63 - 1)
+            if patch is not None:
+                widgets = patch.node_at(pos)["widgets_values"]
+                patch.writes.append((str(node.get("id")), "widget_0", seed))
+            widgets[0] = seed
+
+
+def apply_param(
+    workflow: dict,
+    param: ParamInputSpec,
+    value: Any,
+    node_index: NodeIndex | None = None,
+) -> None:
     if not param.binding:
         return
 
-    nodes = workflow.get("nodes", [])
     try:
         nid = int(param.binding.node_id)
     except Exception:
         return
 
-    node = _find_node(nodes, nid)
+    node = _lookup_node(workflow, nid, node_index)
     if not node:
         return
 
@@ -328,7 +460,61 @@ def apply_param(workflow: dict, param: ParamInputSpec, value: Any) -> None:
         node_inputs = _ensure_inputs_dict(node)
         node_inputs[param_name] = value
 
-    apply_binding(workflow, param.binding, value)
+    apply_binding(workflow, param.binding, value, node_index)
+
+
+# ------------------------------------------------------------
+# Batch
+# ------------------------------------------------------------
+
+# Ноды пустого латента -> индекс виджета batch_size
+BATCH_LATENT_NODE_TYPES = {
+    "EmptyLatentImage": 2,
+    "EmptySD3LatentImage": 2,
+    "EmptyHunyuanLatentVideo": 3,
+}
+
+# node.mode: 2 — muted, 4 — bypass
+_INACTIVE_NODE_MODES = (2, 4)
+
+
+def find_batch_latent_nodes(workflow: dict) -> list[tuple[Any, int]]:
+    """
+    [(node_id, widget_idx batch_size)] — куда писать размер batch.
+    """
+    nodes = workflow.get("nodes") if isinstance(workflow, dict) else None
+    if not isinstance(nodes, list):
+        return []
+
+    result = []
+    for node in nodes:
+        if not isinstance(node, dict) or node.get("mode") in _INACTIVE_NODE_MODES:
+            continue
+        widx = BATCH_LATENT_NODE_TYPES.get(_node_type(node))
+        if widx is None:
+            continue
+        # латент, который никуда не подключён, на результат не влияет
+        outputs = node.get("outputs")
+        if isinstance(outputs, list) and not any(
+            isinstance(o, dict) and o.get("links") for o in outputs
+        ):
+            continue
+        result.append((node.get("id"), widx))
+    return result
+
+
+def apply_batch_size(patch: WorkflowPatch, batch_size: int) -> None:
+    """
+    N вариантов одним prompt: batch_size на латентных нодах (seed общий,
+    варианты отличаются шумом внутри batch). Запись попадает в patch.writes,
+    поэтому работает и сборка из prompt_template.
+    """
+    targets = find_batch_latent_nodes(patch.workflow)
+    if not targets:
+        raise HTTPException(status_code=400, detail="Workflow does not support batch generation")
+
+    for node_id, widx in targets:
+        patch.apply(BindingSpec(node_id=str(node_id), field=f"widget_{widx}"), batch_size)
 
 
 # ------------------------------------------------------------
@@ -343,8 +529,77 @@ def map_inputs_to_workflow(
     param_inputs: dict,
     uploaded_files: dict,
     mode: str = "default",
+    plan: "BindingPlan | None" = None,
+    batch_size: int = 1,
 ) -> dict:
-    workflow = deepcopy(workflow_json)
+    workflow, _ = map_inputs_to_workflow_with_bindings(
+        workflow_json=workflow_json,
+        spec=spec,
+        text_inputs=text_inputs,
+        param_inputs=param_inputs,
+        uploaded_files=uploaded_files,
+        mode=mode,
+        plan=plan,
+        batch_size=batch_size,
+    )
+    return workflow
+
+
+def map_inputs_to_workflow_with_bindings(
+    *,
+    workflow_json: dict,
+    spec: WorkflowSpecV2,
+    text_inputs: dict,
+    param_inputs: dict,
+    uploaded_files: dict,
+    mode: str = "default",
+    plan: "BindingPlan | None" = None,
+    batch_size: int = 1,
+) -> tuple[dict, list[tuple[str, str, Any]]]:
+    """
+    То же, что map_inputs_to_workflow, плюс список записей [(node_id, field, value)]
+    в порядке применения (включая случайный seed) — по нему prompt_template
+    заполняет готовый API prompt без повторной сборки.
+    batch_size > 1 — N вариантов в одном prompt (см. apply_batch_size).
+    Синхронная (маска читается / пишется в хранилище) — из async-кода
+    вызывать через asyncio.to_thread.
+    """
+    patch = _map_to_patch(
+        workflow_json=workflow_json,
+        spec=spec,
+        text_inputs=text_inputs,
+        param_inputs=param_inputs,
+        uploaded_files=uploaded_files,
+        mode=mode,
+        plan=plan,
+    )
+    if batch_size > 1:
+        apply_batch_size(patch, batch_size)
+    return patch.materialize(), patch.writes
+
+
+def _map_to_patch(
+    *,
+    workflow_json: dict,
+    spec: WorkflowSpecV2,
+    text_inputs: dict,
+    param_inputs: dict,
+    uploaded_files: dict,
+    mode: str,
+    plan: "BindingPlan | None",
+) -> WorkflowPatch:
+    # скомпилированный план (см. workflow_binding_plan) — тот же результат без разбора spec
+    if plan is not None:
+        return plan.execute_patch(
+            workflow_json=workflow_json,
+            text_inputs=text_inputs,
+            param_inputs=param_inputs,
+            uploaded_files=uploaded_files,
+            mode=mode,
+        )
+
+    # копируем только те узлы, в которые пишем (см. WorkflowPatch)
+    patch = WorkflowPatch(workflow_json)
 
     modes = {m.id for m in spec.modes}
     if mode not in modes:
@@ -373,7 +628,7 @@ def map_inputs_to_workflow(
         if bkey in protected:
             continue
 
-        apply_param(workflow, param, value)
+        patch.apply_param(param, value)
 
     # 2.5) MASK PRE-PROCESS (embed into base image alpha when needed)
     if spec.inputs.mask:
@@ -409,7 +664,7 @@ def map_inputs_to_workflow(
             continue
         if not img.binding:
             continue
-        apply_binding(workflow, img.binding, uploaded_files[img.key])
+        patch.apply(img.binding, uploaded_files[img.key])
 
     # For LoadImage nodes: widget_1 = upload mode
     for img in spec.inputs.images:
@@ -421,15 +676,15 @@ def map_inputs_to_workflow(
             nid = int(img.binding.node_id)
         except Exception:
             continue
-        node = _find_node(workflow.get("nodes", []), nid)
+        node = patch.peek(nid)
         if node and (node.get("type") == "LoadImage" or node.get("class_type") == "LoadImage"):
-            apply_binding(workflow, BindingSpec(node_id=str(nid), field="widget_1"), "image")
+            patch.apply(BindingSpec(node_id=str(nid), field="widget_1"), "image")
 
     # 3) MASK (normal case: separate LoadMask node etc.)
     if spec.inputs.mask:
         mask = spec.inputs.mask
         if mask.key in uploaded_files and mask.binding:
-            apply_binding(workflow, mask.binding, uploaded_files[mask.key])
+            patch.apply(mask.binding, uploaded_files[mask.key])
 
     # 4) TEXT
     for inp in spec.inputs.text:
@@ -437,7 +692,7 @@ def map_inputs_to_workflow(
             continue
         if not inp.binding:
             continue
-        apply_binding(workflow, inp.binding, text_inputs[inp.key])
+        patch.apply(inp.binding, text_inputs[inp.key])
 
-    apply_random_seed_if_needed(workflow)
-    return workflow
+    apply_random_seed_if_needed(patch.workflow, patch)
+    return patch
@@ -5,7 +5,7 @@ from sqlalchemy import select
 
 from app.models.user import User
 from app.api.deps import get_current_user, get_db, get_current_user_or_none
-from app.core.security import verify_password, hash_password
+from app.core.security import verify_password_async
 from app.core.jwt import create_access_token, create_refresh_token
 from app.services.auth_service import _clear_auth_cookies, _set_auth_cookies
 from app.core.templates import templates
@@ -49,7 +49,7 @@ async def user_login(
 
     if (
         not user
-        or not verify_password(password, user.password_hash)
+        or not await verify_password_async(password, user.password_hash)
         or not user.is_active
     ):
         return templates.TemplateResponse(
@@ -1,7 +1,16 @@
 import httpx
+import asyncio
+import mimetypes
 from urllib.parse import urlencode
+from starlette.concurrency import iterate_in_threadpool
 from fastapi import APIRouter, Depends, Request, HTTPException, Query
-from fastapi.responses import HTMLResponse, JSONResponse, Response
+from fastapi.responses import (
+    HTMLResponse,
+    Response,
+    FileResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
@@ -10,14 +19,27 @@ from app.models.user import User
 from app.models.job import Job
 from app.models.job_execution import JobExecution
 from app.models.comfy_node import ComfyNode
-from app.services.result_normalizer import normalize_job_result
+from app.services.result_normalizer import normalize_job_result, split_batch_result
 from app.services.comfy_progress import get_progress
+from app.services.queue_eta import get_queue_estimate
+from app.services.storage_backend import get_storage_backend
+from app.services.thumbnails import (
+    DERIVATIVE_SIZES,
+    get_cached_derivative,
+    get_derivative,
+    get_file_derivative,
+    media_type_for_derivatives,
+)
+from app.core.json_codec import CodecJSONResponse
 from app.core.templates import templates
 
 
 router = APIRouter(prefix='/user/jobs', tags=['user-jobs'])
 
 
+DERIVATIVE_CACHE_CONTROL = 'private, max-age=86400'
+
+
 async def _get_user_job_or_404(
         db: AsyncSession,
         user: User,
@@ -77,6 +99,7 @@ def _pathc_result_urls(job_id: str, normalized: dict | None) -> dict | None:
 
         qs = urlencode({'filename': filename, 'subfolder': subfolder, 'type': ftype})
         img['url'] = f'/user/jobs/{job_id}/image?{qs}'
+        img['thumb_url'] = f'{img["url"]}&size=thumb'
     
     return normalized
 
@@ -117,6 +140,11 @@ async def job_state(
     normalized = normalize_job_result(job.result) if job.result else None
     normalized = _pathc_result_urls(job.id, normalized)
 
+    variants = [
+        _pathc_result_urls(job.id, v)
+        for v in split_batch_result(job.result, job.batch_size or 1)
+    ]
+
     progress = None
     prompt_id = None
 
@@ -131,39 +159,76 @@ async def job_state(
     if execution and execution.prompt_id:
         prompt_id = execution.prompt_id
         progress = await get_progress(prompt_id)
+
+    # позиция / ETA — из пересчёта в scheduler loop, без запросов к БД
+    queue_position, eta_seconds = (None, None)
+    if job.status in ('QUEUED', 'RUNNING'):
+        queue_position, eta_seconds = get_queue_estimate(job.id)
     
-    return JSONResponse(
+    return CodecJSONResponse(
         {
             'id': job.id,
             'status': job.status, # QUEUED | RUNNING | DONE | ERROR
             'error': job.error_message,
             'result': normalized,
+            'batch_size': job.batch_size or 1,
+            'variants': variants,
             'prompt_id': prompt_id,
             'progress': progress,
+            'queue_position': queue_position,   # с 1, только для QUEUED
+            'eta_seconds': eta_seconds,         # оценка до готовности
             'created_at': job.created_at.isoformat() if job.created_at else None
         }
     )
 
 
+def _check_derivative_size(size: str | None) -> None:
+    if size is not None and size not in DERIVATIVE_SIZES:
+        raise HTTPException(
+            status_code=400,
+            detail=f'Unknown size "{size}", available: {sorted(DERIVATIVE_SIZES)}'
+        )
+
+
+def _derivative_response(path) -> FileResponse:
+    return FileResponse(
+        path,
+        media_type=media_type_for_derivatives(),
+        headers={'Cache-Control': DERIVATIVE_CACHE_CONTROL}
+    )
+
+
 @router.get('/{job_id}/image')
 async def job_image_proxy(
     job_id: str,
     filename: str = Query(...),
     subfolder: str = Query(...),
     type: str = Query('output'),
+    size: str | None = Query(None),
     db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user)
 ):
     """
     Проксирует ComfyUI /view для конкретного job.
     Важно: берем node из последнего JobExecution.
+    size=thumb|preview -> отдаём уменьшенную копию из кэша производных.
     """
+    _check_derivative_size(size)
+
     job = await _get_user_job_or_404(db, user, job_id)
     execution = await _get_latest_execution(db, job.id)
 
     if not execution or not execution.node_id:
         raise HTTPException(status_code=404, detail='Job execution not found')
     
+    # ComfyUI переиспользует имена файлов (рестарт / сброс счётчика) —
+    # ключ привязан к prompt, иначе из кэша уйдёт чужая / старая картинка
+    source_key = f'{execution.node_id}:{execution.prompt_id or job.id}:{type}:{subfolder}:{filename}'
+    if size:
+        cached = get_cached_derivative(source_key, size)
+        if cached:
+            return _derivative_response(cached)
+
     node = await db.get(ComfyNode, execution.node_id)
     if not node:
         raise HTTPException(status_code=404, detail='Comfy node not found')
@@ -183,5 +248,60 @@ async def job_image_proxy(
     if response.status_code != 200:
         raise HTTPException(status_code=502, detail=f'ComfyUI returned {response.status_code}: {response.text}')
     
+    if size:
+        try:
+            path = await get_derivative(response.content, size, source_key=source_key)
+        except Exception:
+            # не картинка (или битый файл) — отдаём оригинал
+            pass
+        else:
+            return _derivative_response(path)
+
     content_type = response.headers.get('content-type', 'image/png')
     return Response(content=response.content, media_type=content_type)
+
+
+@router.get('/{job_id}/input/{key}')
+async def job_input_file(
+    job_id: str,
+    key: str,
+    size: str | None = Query(None),
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    """
+    Отдаёт загруженный пользователем входной файл job (image_* / mask_*).
+    size=thumb|preview -> уменьшенная копия.
+    """
+    _check_derivative_size(size)
+
+    job = await _get_user_job_or_404(db, user, job_id)
+    rel_path = (job.files or {}).get(key)
+    if not isinstance(rel_path, str):
+        raise HTTPException(status_code=404, detail='File not found')
+
+    backend = get_storage_backend()
+    if not await asyncio.to_thread(backend.exists, rel_path):
+        raise HTTPException(status_code=404, detail='File not found')
+
+    if size:
+        try:
+            derivative = await get_file_derivative(rel_path, size)
+        except Exception:
+            pass
+        else:
+            return _derivative_response(derivative)
+
+    path = backend.local_path(rel_path)
+    if path is not None:
+        return FileResponse(path)
+
+    # внешнее хранилище: отдаём прямую ссылку, байты идут мимо app-сервера
+    url = await asyncio.to_thread(backend.presign, rel_path)
+    if url:
+        return RedirectResponse(url=url, status_code=307)
+
+    return StreamingResponse(
+        iterate_in_threadpool(backend.stream(rel_path)),
+        media_type=mimetypes.guess_type(rel_path)[0] or 'application/octet-stream'
+    )
@@ -1,3 +1,4 @@
+import asyncio
 import uuid
 import json
 from datetime import datetime
@@ -11,12 +12,17 @@ from app.api.deps import get_db, get_current_user
 from app.models.user import User
 from app.models.workflow import Workflow
 from app.models.job import Job
+from app.core.config import settings
 from app.core.templates import templates
 from app.services.limits import check_daily_job_limit
-from app.services.storage import save_uploaded_files
-from app.services.workflow_mapper import map_inputs_to_workflow
-from app.services.workflow_mapper import normalize_workflow_for_comfy
+from app.services.job_service import create_job
+from app.services.storage import save_uploaded_files, register_job_files
+from app.services.thumbnails import schedule_file_derivatives
+from app.services.workflow_mapper import map_inputs_to_workflow_with_bindings
+from app.services.workflow_mapper import normalize_workflow_for_comfy, find_batch_latent_nodes
+from app.services.workflow_binding_plan import get_binding_plan
 from app.services.scheduler import enqueue_job
+from app.services.fair_queue import PRIORITY_CLASSES, priority_rank
 from app.schemas.workflow_spec_v2 import WorkflowSpecV2
 from app.services.spec_grooping import prepare_spec_groups
 from app.services.comfy_service import _patch_widget_fields_for_seed_in_spec
@@ -104,7 +110,8 @@ async def workflow_run_page(
             'workflow': workflow,
             'spec': workflow.spec_json,
             'visible_groups': groups_visible,
-            'hidden_only_groups': groups_hidden_only
+            'hidden_only_groups': groups_hidden_only,
+            'batch_max_size': settings.BATCH_MAX_SIZE if find_batch_latent_nodes(workflow.workflow_json) else None
         }
     )
 
@@ -159,6 +166,29 @@ async def run_workflow(
         
         elif key == 'mask' and hasattr(value, 'filename'):
             mask_file = value
+
+    # N вариантов одним prompt (batch_size латента)
+    try:
+        batch_size = int(form.get('batch_size') or 1)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail='batch_size must be an integer')
+    if batch_size < 1 or batch_size > settings.BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f'batch_size must be between 1 and {settings.BATCH_MAX_SIZE}'
+        )
+    if batch_size > 1:
+        # каждый вариант расходует дневной лимит
+        await check_daily_job_limit(db=db, user_id=user.id, requested=batch_size)
+
+    # класс очереди: batch — для пачек вариантов; пользователь может только понизить
+    priority = 'batch' if batch_size > 1 else 'interactive'
+    requested_priority = form.get('priority')
+    if requested_priority:
+        if requested_priority not in PRIORITY_CLASSES:
+            raise HTTPException(status_code=400, detail='Unknown priority')
+        if priority_rank(requested_priority) > priority_rank(priority):
+            priority = requested_priority
     
     # 4. Save uploaded files
     mask_key = spec.inputs.mask.key if spec.inputs.mask else 'mask'
@@ -171,13 +201,23 @@ async def run_workflow(
         mask_key=mask_key
     )
 
+    # превью входных файлов готовим в фоне (для страниц job / галерей)
+    schedule_file_derivatives(stored_files.values())
+
+    # map_inputs_to_workflow может подменить файл (маска в alpha) — запоминаем исходные
+    original_files = list(stored_files.items())
+
     # 5. Map inputs → comfy workflow
-    workflow_payload = map_inputs_to_workflow(
+    # в потоке: маска встраивается в alpha через хранилище (S3 — сеть) и PIL
+    workflow_payload, bindings = await asyncio.to_thread(
+        map_inputs_to_workflow_with_bindings,
         workflow_json=workflow.workflow_json,
         spec=spec,
         text_inputs=text_inputs,
         param_inputs=param_inputs,
-        uploaded_files=stored_files
+        uploaded_files=stored_files,
+        plan=get_binding_plan(workflow, spec),
+        batch_size=batch_size,
     )
     workflow_payload = normalize_workflow_for_comfy(workflow_payload)
 
@@ -187,15 +227,24 @@ async def run_workflow(
         user_id=user.id,
         workflow_id=workflow.id,
         mode='default',
+        batch_size=batch_size,
+        priority=priority,
         files=stored_files,
         inputs=text_inputs,
         prepared_workflow=workflow_payload,
+        workflow_version=workflow.version,
+        workflow_updated_at=workflow.updated_at,
+        bindings=[list(b) for b in bindings],
         status="QUEUED",
     )
 
-    db.add(job)
-    await db.commit()
-    await db.refresh(job)
+    await create_job(db=db, job=job)
+
+    await register_job_files(
+        db=db,
+        job_id=job.id,
+        files=original_files + list(stored_files.items())
+    )
 
     # 7. Enqueue
     await enqueue_job(db=db, job=job)
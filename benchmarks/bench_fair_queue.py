@@ -0,0 +1,171 @@
+"""
+Симуляция очереди: время ожидания job при смеси "тяжёлых" и "лёгких" пользователей.
+
+Запуск из корня проекта (нужен .env, как для самого приложения):
+    python -m benchmarks.bench_fair_queue [--nodes 2] [--max-queue 1] [--heavy 2] [--heavy-jobs 200] [--light 10]
+
+Модель (как scheduler_tick):
+  - nodes GPU-нод, каждая считает один prompt за раз (длительность --min-duration..--max-duration сек),
+    остальные отправленные ждут в FIFO-очереди ComfyUI
+  - job уходит из приложения на наименее загруженную ноду, только пока у неё
+    меньше --max-queue отправленных prompt; 0 — без ограничения (все job сразу
+    уходят в очередь ComfyUI, порядок в приложении почти ни на что не влияет)
+  - heavy пользователей кладут по heavy-jobs job в момент 0
+  - light пользователей присылают по одному job в среднем раз в --light-interval сек
+  - симуляция идёт --horizon сек, дальше только дорабатывает очередь
+
+Политики:
+  - unordered — случайный QUEUED job (как SELECT без ORDER BY)
+  - fifo      — по created_at
+  - fair      — fair_order + FairShareClock (пользователи по очереди, FIFO внутри)
+  - weighted  — то же, у light пользователей вес 2
+
+Колонки: p50 / p95 / max ожидания до начала счёта на GPU (сек) для light и heavy пользователей.
+"""
+import argparse
+import random
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+from app.services.fair_queue import FairShareClock, fair_order
+
+
+@dataclass
+class SimJob:
+    user_id: int
+    created_at: float
+    duration: float
+    heavy: bool
+    started_at: float | None = field(default=None)
+
+
+def _workload(args, rng: random.Random) -> List[SimJob]:
+    jobs: List[SimJob] = []
+
+    def duration() -> float:
+        return rng.uniform(args.min_duration, args.max_duration)
+
+    for user_id in range(args.heavy):
+        for i in range(args.heavy_jobs):
+            # вся пачка за пару секунд
+            jobs.append(SimJob(user_id=user_id, created_at=i * 0.01, duration=duration(), heavy=True))
+
+    for user_id in range(args.heavy, args.heavy + args.light):
+        t = rng.expovariate(1 / args.light_interval)
+        while t < args.horizon:
+            jobs.append(SimJob(user_id=user_id, created_at=t, duration=duration(), heavy=False))
+            t += rng.expovariate(1 / args.light_interval)
+
+    jobs.sort(key=lambda j: j.created_at)
+    return jobs
+
+
+def _simulate(
+        jobs: List[SimJob],
+        nodes: int,
+        max_queue: int,
+        pick: Callable[[List[SimJob]], SimJob],
+) -> None:
+    pending = deque(jobs)
+    queue: List[SimJob] = []
+    # отправленные на ноду prompt (FIFO ComfyUI), [0] — считается сейчас
+    submitted = [deque() for _ in range(nodes)]
+    finish_at = [float('inf')] * nodes
+    limit = max_queue if max_queue > 0 else float('inf')
+
+    def start_next(idx: int, now: float) -> None:
+        if submitted[idx]:
+            job = submitted[idx][0]
+            job.started_at = now
+            finish_at[idx] = now + job.duration
+        else:
+            finish_at[idx] = float('inf')
+
+    while pending or queue or any(submitted):
+        # следующее событие: поступление job или завершение на ноде
+        next_arrival = pending[0].created_at if pending else float('inf')
+        now = min(next_arrival, min(finish_at))
+
+        for idx in range(nodes):
+            if finish_at[idx] <= now:
+                submitted[idx].popleft()
+                start_next(idx, now)
+        while pending and pending[0].created_at <= now:
+            queue.append(pending.popleft())
+
+        while queue:
+            idx = min(range(nodes), key=lambda i: len(submitted[i]))
+            if len(submitted[idx]) >= limit:
+                break
+            job = pick(queue)
+            queue.remove(job)
+            submitted[idx].append(job)
+            if len(submitted[idx]) == 1:
+                start_next(idx, now)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, round(q * (len(values) - 1))))
+    return values[idx]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=2)
+    parser.add_argument("--max-queue", type=int, default=1)
+    parser.add_argument("--heavy", type=int, default=2)
+    parser.add_argument("--heavy-jobs", type=int, default=200)
+    parser.add_argument("--light", type=int, default=10)
+    parser.add_argument("--light-interval", type=float, default=300.0)
+    parser.add_argument("--min-duration", type=float, default=10.0)
+    parser.add_argument("--max-duration", type=float, default=30.0)
+    parser.add_argument("--horizon", type=float, default=3600.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    light_ids = set(range(args.heavy, args.heavy + args.light))
+    unordered_rng = random.Random(args.seed + 1)
+
+    def fair(weights: Dict[int, int]) -> Callable[[List[SimJob]], SimJob]:
+        clock = FairShareClock()
+        clock.weights.update(weights)
+
+        def pick(queue: List[SimJob]) -> SimJob:
+            job = fair_order(queue, clock=clock)[0]
+            clock.charge(job.user_id)
+            return job
+        return pick
+
+    policies = {
+        "unordered": lambda queue: unordered_rng.choice(queue),
+        "fifo": lambda queue: min(queue, key=lambda j: j.created_at),
+        "fair": fair({}),
+        "weighted": fair({user_id: 2 for user_id in light_ids}),
+    }
+
+    header = (
+        f"{'policy':10} {'light p50':>10} {'light p95':>10} {'light max':>10} "
+        f"{'heavy p50':>10} {'heavy p95':>10} {'heavy max':>10}"
+    )
+    print(header)
+    print("-" * len(header))
+
+    for name, pick in policies.items():
+        jobs = _workload(args, random.Random(args.seed))
+        _simulate(jobs, args.nodes, args.max_queue, pick)
+
+        light = [j.started_at - j.created_at for j in jobs if not j.heavy]
+        heavy = [j.started_at - j.created_at for j in jobs if j.heavy]
+        print(
+            f"{name:10} "
+            f"{_percentile(light, 0.5):>10.1f} {_percentile(light, 0.95):>10.1f} {max(light, default=0):>10.1f} "
+            f"{_percentile(heavy, 0.5):>10.1f} {_percentile(heavy, 0.95):>10.1f} {max(heavy, default=0):>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Кодирование / декодирование JSON: stdlib json против app.core.json_codec (orjson).
+
+Запуск из корня проекта (нужен .env, как для самого приложения):
+    python -m benchmarks.bench_json_codec [--repeat 200]
+
+Для каждого workflow из other_json меряются:
+  - UI workflow (то, что лежит в workflows.workflow_json / jobs.prepared_workflow)
+  - API prompt, собранный из него (тело POST /prompt)
+
+Колонки (мс на одну операцию):
+  - json enc / json dec     — stdlib json.dumps / json.loads
+  - codec enc / codec dec   — dumps_bytes / loads из json_codec
+"""
+import argparse
+import json
+import time
+from copy import deepcopy
+from pathlib import Path
+
+from app.core.json_codec import USE_ORJSON, dumps_bytes, loads
+from app.services.comfy_prompt_builder_v2 import build_prompt_from_ui_workflow_v2
+from app.services.workflow_mapper import normalize_workflow_for_comfy
+from benchmarks.bench_workflow_mapper import WORKFLOWS_DIR, load_workflows
+
+
+def _ms_per_op(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+def _row(label: str, obj: dict, repeat: int) -> str:
+    encoded = json.dumps(obj, ensure_ascii=False)
+    encoded_bytes = dumps_bytes(obj)
+    assert loads(encoded_bytes) == json.loads(encoded)
+
+    json_enc = _ms_per_op(lambda: json.dumps(obj, ensure_ascii=False), repeat)
+    json_dec = _ms_per_op(lambda: json.loads(encoded), repeat)
+    codec_enc = _ms_per_op(lambda: dumps_bytes(obj), repeat)
+    codec_dec = _ms_per_op(lambda: loads(encoded_bytes), repeat)
+
+    return (
+        f"{label:46} {len(encoded_bytes) / 1024:>8.1f} "
+        f"{json_enc:>9.3f} {codec_enc:>9.3f} {json_dec:>9.3f} {codec_dec:>9.3f} "
+        f"{(json_enc + json_dec) / max(codec_enc + codec_dec, 1e-9):>6.1f}x"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", type=Path, default=WORKFLOWS_DIR)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"codec: {'orjson' if USE_ORJSON else 'json (orjson not installed or JSON_CODEC=json)'}")
+    header = (
+        f"{'payload':46} {'KB':>8} {'json enc':>9} {'codec enc':>9} "
+        f"{'json dec':>9} {'codec dec':>9} {'speed':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+
+    for name, workflow in load_workflows(args.dir):
+        print(_row(f"{name[:38]} [ui]", workflow, args.repeat))
+        try:
+            prompt = build_prompt_from_ui_workflow_v2(normalize_workflow_for_comfy(deepcopy(workflow)))
+        except Exception:
+            continue
+        print(_row(f"{name[:38]} [api]", prompt, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Память на один прогон map_inputs_to_workflow (tracemalloc).
+
+Запуск из корня проекта (нужен .env, как для самого приложения):
+    python -m benchmarks.bench_mapper_memory
+
+Колонки:
+  - deepcopy KB — сколько выделял прежний маппер только на deepcopy(workflow_json)
+  - map KB      — пик выделений текущего маппера (WorkflowPatch) за прогон
+  - copied      — сколько узлов реально скопировано из общего числа
+"""
+import argparse
+import random
+import tracemalloc
+from copy import deepcopy
+from pathlib import Path
+
+from app.schemas.workflow_spec_v2 import WorkflowSpecV2
+from app.services.spec_generator import generate_spec_v2
+from app.services.workflow_mapper import WorkflowPatch, map_inputs_to_workflow
+from benchmarks.bench_workflow_mapper import WORKFLOWS_DIR, build_inputs, load_workflows
+
+
+def _peak_kb(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def _copied_nodes(workflow: dict, spec: WorkflowSpecV2, params: dict, text: dict, files: dict) -> int:
+    patch = WorkflowPatch(workflow)
+    for p in spec.inputs.params:
+        if p.binding:
+            patch.apply_param(p, params[p.key])
+    for t in spec.inputs.text:
+        if t.binding:
+            patch.apply(t.binding, text[t.key])
+    for i in spec.inputs.images:
+        if i.binding:
+            patch.apply(i.binding, files[i.key])
+    return patch.copied_nodes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", type=Path, default=WORKFLOWS_DIR)
+    args = parser.parse_args()
+
+    random.seed(0)
+    header = f"{'workflow':40} {'nodes':>6} {'copied':>7} {'deepcopy KB':>12} {'map KB':>9}"
+    print(header)
+    print("-" * len(header))
+
+    for name, workflow in load_workflows(args.dir):
+        spec = WorkflowSpecV2.model_validate(generate_spec_v2(workflow))
+        params, text, files = build_inputs(spec)
+
+        deepcopy_kb = _peak_kb(lambda: deepcopy(workflow))
+        map_kb = _peak_kb(lambda: map_inputs_to_workflow(
+            workflow_json=workflow,
+            spec=spec,
+            text_inputs=text,
+            param_inputs=params,
+            uploaded_files=dict(files),
+        ))
+        copied = _copied_nodes(workflow, spec, params, text, files)
+
+        print(
+            f"{name[:40]:40} {len(workflow['nodes']):>6} {copied:>7} "
+            f"{deepcopy_kb:>12.1f} {map_kb:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
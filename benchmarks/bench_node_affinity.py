@@ -0,0 +1,104 @@
+"""
+Симуляция маршрутизации job по нодам: только загрузка против affinity (тёплые модели).
+
+Запуск из корня проекта (нужен .env, как для самого приложения):
+    python -m benchmarks.bench_node_affinity [--nodes 3] [--jobs 600] [--weights 0,1,1.5,3]
+
+Модель:
+  - job одного из workflow из other_json (модели — node_affinity.workflow_models)
+  - job приходят в среднем раз в --interval сек, workflow выбирается случайно
+  - на ноде одновременно один job, остальные ждут в очереди ноды
+  - длительность: --run сек + --cold сек * доля моделей job, которых не было
+    у предыдущего job на ноде (ComfyUI выгружает их и грузит заново)
+  - нода выбирается в момент поступления job через node_affinity.pick_node
+
+Колонки: доля моделей, загруженных с диска, среднее и p95 времени job от поступления до конца (сек).
+"""
+import argparse
+import heapq
+import random
+from types import SimpleNamespace
+from typing import List
+
+from app.services.node_affinity import forget_node, pick_node, record_node_models, workflow_models
+from benchmarks.bench_workflow_mapper import WORKFLOWS_DIR, load_workflows
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(q * (len(values) - 1))))]
+
+
+def _simulate(args, model_sets, weight: float):
+    rng = random.Random(args.seed)
+    nodes = [SimpleNamespace(id=i) for i in range(args.nodes)]
+    for node in nodes:
+        forget_node(node.id)
+
+    free_at = [0.0] * args.nodes
+    loaded = [frozenset()] * args.nodes
+    # (finish_time, node_index) ещё не закончившихся job — для active_jobs
+    running: list = []
+
+    t = 0.0
+    cold = 0.0
+    latencies = []
+    for _ in range(args.jobs):
+        t += rng.expovariate(1 / args.interval)
+        models = rng.choice(model_sets)
+
+        while running and running[0][0] <= t:
+            heapq.heappop(running)
+        active = [0] * args.nodes
+        for _, idx in running:
+            active[idx] += 1
+
+        # порядок как у select_available_node: по загрузке
+        candidates = sorted(((node, active[node.id]) for node in nodes), key=lambda row: row[1])
+        node = pick_node(candidates, models, weight=weight)
+        record_node_models(node.id, models)
+
+        # грузится только то, чего не было в предыдущем job (общий VAE / CLIP остаётся)
+        missing = len(models - loaded[node.id]) / len(models)
+        duration = args.run + args.cold * missing
+        cold += missing
+        loaded[node.id] = models
+
+        start = max(t, free_at[node.id])
+        free_at[node.id] = start + duration
+        heapq.heappush(running, (free_at[node.id], node.id))
+        latencies.append(free_at[node.id] - t)
+
+    return cold / args.jobs, sum(latencies) / len(latencies), _percentile(latencies, 0.95)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=WORKFLOWS_DIR)
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--jobs", type=int, default=600)
+    parser.add_argument("--interval", type=float, default=20.0)
+    parser.add_argument("--run", type=float, default=15.0)
+    parser.add_argument("--cold", type=float, default=40.0)
+    parser.add_argument("--weights", default="0,1,1.5,3")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    model_sets = sorted({
+        models for _, workflow in load_workflows(args.dir)
+        if (models := workflow_models(workflow))
+    }, key=sorted)
+    print(f"workflows with models: {len(model_sets)}, nodes: {args.nodes}")
+
+    header = f"{'weight':>8} {'loads %':>8} {'mean':>9} {'p95':>9}"
+    print(header)
+    print("-" * len(header))
+    for weight in (float(w) for w in args.weights.split(",")):
+        cold, mean, p95 = _simulate(args, model_sets, weight)
+        print(f"{weight:>8.1f} {cold * 100:>7.1f}% {mean:>9.1f} {p95:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Нагрузочный тест: всплеск login и задержка остальных запросов (polling).
+
+Запуск из корня проекта (нужен .env, как для самого приложения):
+    python -m benchmarks.bench_password_hashing [--logins 20] [--pollers 20]
+
+Маленькое FastAPI-приложение (через httpx.ASGITransport, без сети и БД):
+  - POST /login-sync  — verify_password прямо в обработчике (как было)
+  - POST /login-async — verify_password_async (пул PASSWORD_HASH_WORKERS потоков)
+  - GET  /state       — лёгкий JSON, как /user/jobs/{id}/state
+
+Для каждого режима --pollers клиентов опрашивают /state раз в --interval сек,
+пока идёт всплеск из --logins одновременных login. Колонки: p50 / p99 / max
+задержки /state (мс) и время всего всплеска login (с).
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+import httpx
+from fastapi import FastAPI, Form
+
+from app.core.security import hash_password, verify_password, verify_password_async
+
+
+def _build_app(hashed: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.post('/login-sync')
+    async def login_sync(password: str = Form(...)):
+        return {'ok': verify_password(password, hashed)}
+
+    @app.post('/login-async')
+    async def login_async(password: str = Form(...)):
+        return {'ok': await verify_password_async(password, hashed)}
+
+    @app.get('/state')
+    async def state():
+        return {'status': 'QUEUED'}
+
+    return app
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(q * (len(values) - 1))))]
+
+
+async def _run_mode(client: httpx.AsyncClient, path: str, args) -> tuple:
+    latencies: List[float] = []
+    done = asyncio.Event()
+
+    async def poller():
+        # задержка считается от момента, когда запрос должен был уйти:
+        # пока event loop заблокирован, poller не может даже отправить его
+        while not done.is_set():
+            due = time.perf_counter() + args.interval
+            await asyncio.sleep(args.interval)
+            await client.get('/state')
+            latencies.append((time.perf_counter() - due) * 1000)
+
+    pollers = [asyncio.create_task(poller()) for _ in range(args.pollers)]
+    await asyncio.sleep(0.2)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client.post(path, data={'password': 'secret'}) for _ in range(args.logins)))
+    burst = time.perf_counter() - started
+
+    done.set()
+    await asyncio.gather(*pollers)
+    return _percentile(latencies, 0.5), _percentile(latencies, 0.99), max(latencies, default=0), burst
+
+
+async def _run(args) -> None:
+    hashed = hash_password('secret')
+    app = _build_app(hashed)
+    transport = httpx.ASGITransport(app=app)
+
+    header = f"{'mode':12} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'burst s':>8}"
+    print(header)
+    print('-' * len(header))
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        for label, path in (('sync', '/login-sync'), ('thread pool', '/login-async')):
+            p50, p99, worst, burst = await _run_mode(client, path, args)
+            print(f'{label:12} {p50:>8.1f} {p99:>8.1f} {worst:>8.1f} {burst:>8.2f}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=20)
+    parser.add_argument('--pollers', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(_run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Сборка API prompt для job: полная цепочка vs шаблон (prompt_template).
+
+Запуск из корня проекта (нужен .env, как для самого приложения):
+    python -m benchmarks.bench_prompt_template --runs 200
+    python -m benchmarks.bench_prompt_template --object-info object_info.json
+
+Полная цепочка: build_prompt_from_ui_workflow_v2 -> validate_and_fix_prompt -> sanitize.
+Шаблон: PromptTemplate.render(bindings) -> validate_and_fix_prompt(only=...).
+Без --object-info validate работает с пустой схемой (замеряется только сборка).
+"""
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+from app.schemas.workflow_spec_v2 import WorkflowSpecV2
+from app.services.comfy_prompt_builder_v2 import build_prompt_from_ui_workflow_v2
+from app.services.comfy_prompt_validate import validate_and_fix_prompt
+from app.services.prompt_template import compile_prompt_template
+from app.services.sanitize_comfy_prompt import sanitize_prompt_for_comfy
+from app.services.spec_generator import generate_spec_v2
+from app.services.workflow_mapper import map_inputs_to_workflow_with_bindings, normalize_workflow_for_comfy
+from benchmarks.bench_workflow_mapper import WORKFLOWS_DIR, build_inputs, load_workflows
+
+
+def _per_run_ms(fn, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) * 1000 / runs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--dir", type=Path, default=WORKFLOWS_DIR)
+    parser.add_argument("--object-info", type=Path, default=None, help="сохранённый ответ GET /object_info")
+    args = parser.parse_args()
+
+    object_info = json.loads(args.object_info.read_text(encoding="utf-8")) if args.object_info else {}
+
+    random.seed(0)
+    header = f"{'workflow':40} {'nodes':>6} {'full ms':>9} {'template ms':>12} {'x':>6}"
+    print(header)
+    print("-" * len(header))
+
+    for name, workflow in load_workflows(args.dir):
+        spec = WorkflowSpecV2.model_validate(generate_spec_v2(workflow, object_info=object_info))
+        params, text, files = build_inputs(spec)
+
+        prepared, bindings = map_inputs_to_workflow_with_bindings(
+            workflow_json=workflow,
+            spec=spec,
+            text_inputs=text,
+            param_inputs=params,
+            uploaded_files=dict(files),
+        )
+        # как в БД: JSON round-trip
+        prepared = json.loads(json.dumps(normalize_workflow_for_comfy(prepared)))
+        bindings = json.loads(json.dumps(bindings))
+
+        template = compile_prompt_template(workflow, object_info)
+        if template is None or template.render(bindings) is None:
+            print(f"{name[:40]:40} {len(workflow['nodes']):>6} {'template not supported':>29}")
+            continue
+
+        def full():
+            prompt = build_prompt_from_ui_workflow_v2(json.loads(json.dumps(prepared)), object_info)
+            prompt, _ = validate_and_fix_prompt(prompt, object_info)
+            sanitize_prompt_for_comfy(prompt)
+
+        def from_template():
+            prompt, touched = template.render(bindings)
+            validate_and_fix_prompt(prompt, object_info, only=touched)
+
+        # full() включает json round-trip (как загрузка prepared_workflow из БД)
+        full_ms = _per_run_ms(full, args.runs)
+        template_ms = _per_run_ms(from_template, args.runs)
+        print(
+            f"{name[:40]:40} {len(workflow['nodes']):>6} {full_ms:>9.3f} "
+            f"{template_ms:>12.3f} {full_ms / template_ms:>6.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Накладные расходы RateLimitMiddleware на запрос (мкс).
+
+Запуск из корня проекта (нужен .env, как для самого приложения):
+    python -m benchmarks.bench_rate_limit [--requests 50000]
+
+Middleware вызывается напрямую (ASGI) поверх пустого приложения, бакеты
+достаточно большие, чтобы все запросы проходили. Сценарии:
+  - no match    — путь вне групп RATE_LIMIT_RULES
+  - ip only     — группа без пользовательского лимита (login)
+  - ip + user   — poll с access token в cookie (токен уже проверен)
+  - throttled   — бакет пуст, ответ 429
+Хранилища: memory и fakeredis (если установлен: pip install fakeredis[lua]).
+Колонка: мкс на запрос сверх пустого приложения.
+"""
+import argparse
+import asyncio
+import time
+
+from app.core.jwt import create_access_token
+from app.core.rate_limit import MemoryRateLimitStore, RateLimitMiddleware, RedisRateLimitStore, parse_rules
+
+
+RULES = {
+    'poll': {'pattern': r'^/user/jobs/[^/]+/state$', 'methods': ['GET'], 'user': [1e9, 1e9], 'ip': [1e9, 1e9]},
+    'login': {'pattern': r'^/login$', 'methods': ['POST'], 'ip': [1e9, 1e9]},
+    'tight': {'pattern': r'^/tight$', 'methods': ['GET'], 'ip': [1e-9, 1]},
+}
+
+
+async def _empty_app(scope, receive, send):
+    pass
+
+
+async def _receive():
+    return {'type': 'http.request', 'body': b''}
+
+
+async def _send(message):
+    pass
+
+
+def _scope(method: str, path: str, cookie: str | None = None) -> dict:
+    headers = [(b'host', b'localhost'), (b'accept', b'application/json')]
+    if cookie:
+        headers.append((b'cookie', cookie.encode()))
+    return {'type': 'http', 'method': method, 'path': path, 'headers': headers, 'client': ('10.0.0.1', 5000)}
+
+
+async def _us_per_request(app, scope: dict, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(scope, _receive, _send)
+    return (time.perf_counter() - started) * 1e6 / requests
+
+
+async def _run(args) -> None:
+    stores = {'memory': MemoryRateLimitStore()}
+    try:
+        import fakeredis
+        stores['fakeredis'] = RedisRateLimitStore(fakeredis.FakeAsyncRedis())
+    except ImportError:
+        print('fakeredis not installed — redis store skipped')
+
+    cookie = f'access_token={create_access_token(1)}; refresh_token=x'
+    scenarios = {
+        'no match': _scope('GET', '/user/workflows'),
+        'ip only': _scope('POST', '/login'),
+        'ip + user': _scope('GET', '/user/jobs/abc/state', cookie),
+        'throttled': _scope('GET', '/tight'),
+    }
+
+    baseline = await _us_per_request(_empty_app, scenarios['no match'], args.requests)
+
+    header = f"{'scenario':12} " + " ".join(f'{name:>10}' for name in stores)
+    print(header)
+    print('-' * len(header))
+    for label, scope in scenarios.items():
+        row = []
+        for store in stores.values():
+            app = RateLimitMiddleware(_empty_app, rules=parse_rules(RULES), store=store)
+            await app(scope, _receive, _send)   # прогрев: проверка токена, первый бакет
+            requests = args.requests if isinstance(store, MemoryRateLimitStore) else args.requests // 10
+            row.append(await _us_per_request(app, scope, requests) - baseline)
+        print(f'{label:12} ' + ' '.join(f'{us:>10.1f}' for us in row))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=50000)
+    args = parser.parse_args()
+    asyncio.run(_run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+sanitize_prompt_for_comfy: прежний рекурсивный resolve_ref vs один проход с мемоизацией.
+
+Запуск из корня проекта (нужен .env, как для самого приложения):
+    python -m benchmarks.bench_sanitize_prompt --runs 200
+
+По умолчанию берётся большой Qwen all-in-one граф из other_json. Дополнительно
+строится синтетическая цепочка из --chain switch/bypass-нод с --consumers
+потребителями: прежняя реализация проходила цепочку заново для каждого потребителя.
+Результаты обеих реализаций сравниваются.
+"""
+import argparse
+import json
+import sys
+import time
+from copy import deepcopy
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from app.services.comfy_prompt_builder_v2 import build_prompt_from_ui_workflow_v2
+from app.services.sanitize_comfy_prompt import (
+    BYPASS_SAFE_CLASS_TYPES,
+    SKIP_CLASS_TYPES,
+    SWITCH_CLASS_TYPES,
+    sanitize_prompt_for_comfy,
+)
+from benchmarks.bench_workflow_mapper import WORKFLOWS_DIR
+
+
+DEFAULT_WORKFLOW = WORKFLOWS_DIR / "Qwen Edit All in One - workflow (v2).json"
+
+
+def legacy_rewrite(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Шаги 1-2 прежней реализации (рекурсивный resolve_ref без мемоизации) — эталон.
+    """
+    prompt = payload["prompt"]
+
+    def resolve_ref(node_id: str, slot: int) -> Optional[Tuple[str, int]]:
+        n = prompt.get(node_id)
+        if not isinstance(n, dict):
+            return None
+        ct = n.get("class_type")
+        if ct in SKIP_CLASS_TYPES:
+            return None
+        ins = n.get("inputs") or {}
+        if ct in SWITCH_CLASS_TYPES:
+            for k in sorted(ins.keys()):
+                v = ins.get(k)
+                if isinstance(v, list) and len(v) == 2 and isinstance(v[0], str) and isinstance(v[1], int):
+                    return resolve_ref(v[0], v[1]) or (v[0], v[1])
+            return None
+        if ct in BYPASS_SAFE_CLASS_TYPES:
+            for k, v in ins.items():
+                if isinstance(v, list) and len(v) == 2 and isinstance(v[0], str) and isinstance(v[1], int):
+                    return resolve_ref(v[0], v[1]) or (v[0], v[1])
+            return None
+        return (node_id, slot)
+
+    for node in list(prompt.values()):
+        ins = node.get("inputs")
+        for in_name, v in list(ins.items()):
+            if isinstance(v, list) and len(v) == 2 and isinstance(v[0], str) and isinstance(v[1], int):
+                resolved = resolve_ref(v[0], v[1])
+                if resolved is not None:
+                    ins[in_name] = [resolved[0], resolved[1]]
+
+    for nid, node in list(prompt.items()):
+        if node.get("class_type") in SKIP_CLASS_TYPES | SWITCH_CLASS_TYPES | BYPASS_SAFE_CLASS_TYPES:
+            prompt.pop(nid, None)
+    return payload
+
+
+def synthetic_chain(length: int, consumers: int) -> Dict[str, Any]:
+    """
+    Потребители идут раньше цепочки, а цепочка — от конца к началу (как в UI-экспорте
+    после правок): прежняя реализация не успевала переписать звенья до их потребителей.
+    """
+    prompt: Dict[str, Any] = {}
+    last = str(100 + length - 1)
+    for i in range(consumers):
+        prompt[str(10_000 + i)] = {"class_type": "KSampler", "inputs": {"model": [last, 0]}}
+    for i in reversed(range(length)):
+        class_type = "Any Switch (rgthree)" if i % 2 else "PathchSageAttentionKJ"
+        prev = str(100 + i - 1) if i else "1"
+        prompt[str(100 + i)] = {"class_type": class_type, "inputs": {"any_01": [prev, 0]}}
+    prompt["1"] = {"class_type": "CheckpointLoaderSimple", "inputs": {}}
+    return {"prompt": prompt}
+
+
+def _per_run_ms(fn, payload: Dict[str, Any], runs: int) -> float:
+    copies = [deepcopy(payload) for _ in range(runs)]
+    start = time.perf_counter()
+    for p in copies:
+        fn(p)
+    return (time.perf_counter() - start) * 1000 / runs
+
+
+def _report(name: str, payload: Dict[str, Any], runs: int) -> None:
+    # шаг 3 (Florence2 lora) эталон не делает — досчитываем его повторным sanitize
+    expected = sanitize_prompt_for_comfy(legacy_rewrite(deepcopy(payload)))["prompt"]
+    same = expected == sanitize_prompt_for_comfy(deepcopy(payload))["prompt"]
+    legacy_ms = _per_run_ms(legacy_rewrite, payload, runs)
+    new_ms = _per_run_ms(sanitize_prompt_for_comfy, payload, runs)
+    print(
+        f"{name[:40]:40} {len(payload['prompt']):>6} {legacy_ms:>10.3f} {new_ms:>9.3f} "
+        f"{'yes' if same else 'NO':>5}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--workflow", type=Path, default=DEFAULT_WORKFLOW)
+    parser.add_argument("--chain", type=int, default=200)
+    parser.add_argument("--consumers", type=int, default=200)
+    args = parser.parse_args()
+
+    # прежняя рекурсия на длинной цепочке упирается в лимит глубины
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), args.chain * 4))
+
+    header = f"{'graph':40} {'nodes':>6} {'legacy ms':>10} {'new ms':>9} {'same':>5}"
+    print(header)
+    print("-" * len(header))
+
+    workflow = json.loads(args.workflow.read_text(encoding="utf-8"))
+    _report(args.workflow.stem, build_prompt_from_ui_workflow_v2(workflow), args.runs)
+    _report(
+        f"synthetic chain {args.chain} x {args.consumers}",
+        synthetic_chain(args.chain, args.consumers),
+        max(1, args.runs // 10),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Бенчмарк map_inputs_to_workflow на workflow из other_json/*.json.
+
+Запуск из корня проекта (нужен .env, как для самого приложения):
+    python -m benchmarks.bench_workflow_mapper --runs 200
+
+Для каждого workflow spec генерируется через generate_spec_v2 (без object_info),
+все params / text / images заполняются значениями. Печатается:
+  - время одного прогона map_inputs_to_workflow (разбор spec) и с BindingPlan
+  - время применения всех bindings при линейном поиске узла (_find_node)
+    и через индекс узлов (_index_nodes)
+"""
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from app.schemas.workflow_spec_v2 import WorkflowSpecV2
+from app.services.spec_generator import generate_spec_v2
+from app.services.workflow_binding_plan import compile_binding_plan
+from app.services.workflow_mapper import (
+    apply_binding,
+    map_inputs_to_workflow,
+    _index_nodes,
+)
+
+
+WORKFLOWS_DIR = Path(__file__).resolve().parent.parent / "other_json"
+
+
+def load_workflows(directory: Path) -> List[Tuple[str, dict]]:
+    workflows = []
+    for path in sorted(directory.glob("*.json")):
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if isinstance(data, dict) and isinstance(data.get("nodes"), list):
+            workflows.append((path.stem, data))
+    return workflows
+
+
+def build_inputs(spec: WorkflowSpecV2) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, str]]:
+    params: Dict[str, Any] = {}
+    for i, p in enumerate(spec.inputs.params):
+        if p.type == "int":
+            params[p.key] = str(i + 1)
+        elif p.type == "float":
+            params[p.key] = "0.5"
+        elif p.type == "bool":
+            params[p.key] = "on"
+        else:
+            params[p.key] = p.default
+
+    text = {t.key: f"prompt for {t.key}" for t in spec.inputs.text}
+    # маску не передаём: иначе замеряется PIL (embed в alpha), а не маппер
+    files = {img.key: f"users/bench/{img.key}.png" for img in spec.inputs.images}
+    return params, text, files
+
+
+def _per_run_ms(fn, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) * 1000 / runs
+
+
+def bench_workflow(workflow: dict, runs: int) -> Dict[str, Any]:
+    spec = WorkflowSpecV2.model_validate(generate_spec_v2(workflow))
+    params, text, files = build_inputs(spec)
+
+    plan = compile_binding_plan(spec, workflow)
+
+    def run_mapper(plan=None):
+        map_inputs_to_workflow(
+            workflow_json=workflow,
+            spec=spec,
+            text_inputs=text,
+            param_inputs=params,
+            uploaded_files=dict(files),
+            plan=plan,
+        )
+
+    bindings = [(p.binding, params[p.key]) for p in spec.inputs.params if p.binding]
+    bindings += [(t.binding, text[t.key]) for t in spec.inputs.text if t.binding]
+    bindings += [(i.binding, files[i.key]) for i in spec.inputs.images if i.binding]
+
+    # применение bindings к одной копии: замеряем только поиск узла + запись
+    target = json.loads(json.dumps(workflow))
+
+    def apply_scan():
+        for binding, value in bindings:
+            apply_binding(target, binding, value)
+
+    def apply_indexed():
+        node_index = _index_nodes(target.get("nodes"))
+        for binding, value in bindings:
+            apply_binding(target, binding, value, node_index)
+
+    return {
+        "nodes": len(workflow["nodes"]),
+        "bindings": len(bindings),
+        "map_ms": _per_run_ms(run_mapper, runs),
+        "plan_ms": _per_run_ms(lambda: run_mapper(plan), runs),
+        "scan_ms": _per_run_ms(apply_scan, runs),
+        "index_ms": _per_run_ms(apply_indexed, runs),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--dir", type=Path, default=WORKFLOWS_DIR)
+    args = parser.parse_args()
+
+    random.seed(0)
+    header = f"{'workflow':40} {'nodes':>6} {'binds':>6} {'map ms':>9} {'plan ms':>9} {'scan ms':>9} {'index ms':>9}"
+    print(header)
+    print("-" * len(header))
+
+    for name, workflow in load_workflows(args.dir):
+        r = bench_workflow(workflow, args.runs)
+        print(
+            f"{name[:40]:40} {r['nodes']:>6} {r['bindings']:>6} "
+            f"{r['map_ms']:>9.3f} {r['plan_ms']:>9.3f} {r['scan_ms']:>9.3f} {r['index_ms']:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
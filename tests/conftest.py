@@ -0,0 +1,28 @@
+"""
+Общие настройки тестов: app.core.config требует переменные окружения (.env),
+для тестов подставляем значения по умолчанию — реальная БД не нужна.
+"""
+import os
+import tempfile
+
+_TEST_ENV = {
+    'DB_HOST': 'localhost',
+    'DB_PORT': '5432',
+    'DB_USER': 'test',
+    'DB_PASS': 'test',
+    'DB_NAME': 'test',
+    'PROJECT_NAME': 'simple_ui_for_comfy',
+    'API_V1_STR': '/api/v1',
+    'DEBAG': 'false',
+    'SECRET_KEY': 'test-secret',
+    'ACCESS_TOKEN_EXPIRE_MINUTES': '30',
+    'REFRESH_TOKEN_EXPIRE_DAYS': '7',
+    'ALGORITHM': 'HS256',
+    'COMFY_HEALTHCHECK_INTERVAL': '10',
+    'COMFY_HEALTHCHECK_TIMEOUT': '5',
+    'COMFY_DEAD_AFTER': '60',
+    'STORAGE_ROOT': tempfile.mkdtemp(prefix='simple_ui_test_'),
+}
+
+for _name, _value in _TEST_ENV.items():
+    os.environ.setdefault(_name, _value)
@@ -0,0 +1,20 @@
+"""
+Workflow из other_json/*.json и заполненные входы для них (как в benchmarks).
+"""
+from typing import Any, Dict, List, Tuple
+
+from app.schemas.workflow_spec_v2 import WorkflowSpecV2
+from app.services.spec_generator import generate_spec_v2
+from benchmarks.bench_workflow_mapper import WORKFLOWS_DIR, build_inputs, load_workflows
+
+
+SAMPLE_WORKFLOWS: List[Tuple[str, dict]] = load_workflows(WORKFLOWS_DIR)
+
+
+def sample_inputs(
+        workflow: dict,
+        object_info: Dict[str, Any] | None = None,
+) -> Tuple[WorkflowSpecV2, Dict[str, Any], Dict[str, Any], Dict[str, str]]:
+    spec = WorkflowSpecV2.model_validate(generate_spec_v2(workflow, object_info=object_info or {}))
+    params, text, files = build_inputs(spec)
+    return spec, params, text, files
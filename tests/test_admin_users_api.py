@@ -0,0 +1,87 @@
+"""
+POST /api/v1/admin/users — создание пользователя через API (без реальной БД:
+get_db / require_admin подменены).
+"""
+from datetime import datetime
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.admin.users import router
+from app.api.deps import get_db, require_admin
+from app.core.security import verify_password
+from app.models.user import User
+from app.models.user_limits import UserLimits
+
+
+class FakeSession:
+    """
+    Минимум AsyncSession для create_user: поиск по email, add / flush / commit / refresh.
+    """
+
+    def __init__(self, existing=None):
+        self.existing = existing
+        self.added = []
+        self.committed = False
+
+    async def execute(self, stmt):
+        return SimpleNamespace(scalar_one_or_none=lambda: self.existing)
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def flush(self):
+        for obj in self.added:
+            if isinstance(obj, User) and obj.id is None:
+                obj.id = 42
+
+    async def commit(self):
+        self.committed = True
+
+    async def refresh(self, obj):
+        if isinstance(obj, User) and obj.created_at is None:
+            obj.created_at = datetime(2026, 1, 1)
+
+
+def _client(session: FakeSession) -> TestClient:
+    app = FastAPI()
+    app.include_router(router, prefix='/api/v1')
+
+    async def fake_db():
+        yield session
+
+    app.dependency_overrides[get_db] = fake_db
+    app.dependency_overrides[require_admin] = lambda: SimpleNamespace(id=1, role='ADMIN')
+    return TestClient(app)
+
+
+def test_create_user():
+    session = FakeSession()
+    response = _client(session).post(
+        '/api/v1/admin/users/',
+        json={'email': 'new@example.com', 'password': 'secret-pass', 'role': 'USER'},
+    )
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body['id'] == 42
+    assert body['email'] == 'new@example.com'
+    assert body['is_active'] is True
+    assert session.committed
+
+    user = next(obj for obj in session.added if isinstance(obj, User))
+    assert verify_password('secret-pass', user.password_hash)
+    limits = next(obj for obj in session.added if isinstance(obj, UserLimits))
+    assert limits.user_id == 42
+
+
+def test_create_user_duplicate_email():
+    session = FakeSession(existing=User(id=7, email='new@example.com'))
+    response = _client(session).post(
+        '/api/v1/admin/users/',
+        json={'email': 'new@example.com', 'password': 'secret-pass'},
+    )
+
+    assert response.status_code == 400
+    assert not session.committed
@@ -0,0 +1,71 @@
+"""
+comfy_client: ответы ноды, которые нельзя разобрать, — сбой ноды (transient),
+а не ошибка prompt.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.services import comfy_client
+from app.services.comfy_client import ComfyNodeError, get_queue_prompt_ids, is_transient_error, submit_workflow
+
+
+NODE = SimpleNamespace(id=1, base_url='http://comfy.test')
+
+
+@pytest.fixture
+def respond(monkeypatch):
+    """
+    Подменяет ответ ComfyUI: respond(status, body).
+    """
+    reply = {}
+
+    def handler(request):
+        return httpx.Response(reply['status'], content=reply['body'])
+
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(comfy_client.httpx, 'AsyncClient',
+                        lambda **kwargs: real_client(transport=httpx.MockTransport(handler), **kwargs))
+
+    def set_reply(status, body):
+        reply['status'] = status
+        reply['body'] = body
+
+    return set_reply
+
+
+@pytest.mark.parametrize('body', [b'<html>502 Bad Gateway</html>', b'{"prompt_id": "p', b'[]'])
+def test_submit_invalid_json_is_transient(respond, body):
+    respond(200, body)
+
+    with pytest.raises(ComfyNodeError) as exc:
+        asyncio.run(submit_workflow(node=NODE, workflow={'prompt': {}}))
+
+    assert is_transient_error(exc.value)
+    assert 'invalid JSON' in exc.value.detail
+
+
+def test_submit_rejected_prompt_is_permanent(respond):
+    respond(400, b'{"error": "prompt_outputs_failed_validation"}')
+
+    with pytest.raises(ComfyNodeError) as exc:
+        asyncio.run(submit_workflow(node=NODE, workflow={'prompt': {}}))
+
+    assert not is_transient_error(exc.value)
+
+
+def test_submit_returns_prompt_id(respond):
+    respond(200, b'{"prompt_id": "abc", "number": 1}')
+
+    assert asyncio.run(submit_workflow(node=NODE, workflow={'prompt': {}})) == 'abc'
+
+
+def test_queue_invalid_json_is_transient(respond):
+    respond(200, b'not json')
+
+    with pytest.raises(ComfyNodeError) as exc:
+        asyncio.run(get_queue_prompt_ids(node=NODE))
+
+    assert is_transient_error(exc.value)
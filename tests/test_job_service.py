@@ -0,0 +1,42 @@
+"""
+job_service.create_job — общая точка создания job (UI и POST /api/v1/jobs):
+job сохраняется вместе с записью в счётчик дневного лимита.
+"""
+import asyncio
+from datetime import datetime
+
+from app.models.job import Job
+from app.services.job_service import create_job
+
+
+class FakeSession:
+    def __init__(self):
+        self.added = []
+        self.statements = []
+        self.committed = False
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+
+    async def commit(self):
+        self.committed = True
+
+    async def refresh(self, obj):
+        pass
+
+
+def test_create_job_registers_usage():
+    session = FakeSession()
+    job = Job(id='job-1', user_id=7, workflow_id=1, batch_size=3, created_at=datetime(2026, 1, 1, 12, 30))
+
+    asyncio.run(create_job(db=session, job=job))
+
+    assert session.added == [job]
+    assert session.committed
+    upsert = session.statements[0].compile().params
+    assert upsert['user_id'] == 7
+    assert upsert['jobs'] == 3
+    assert upsert['hour'] == datetime(2026, 1, 1, 12)
@@ -0,0 +1,139 @@
+"""
+PromptTemplate.render даёт тот же API prompt, что полная сборка из prepared_workflow
+(build_prompt_from_ui_workflow_v2 -> validate -> sanitize -> prune), и не
+используется для job, собранного из другой версии workflow.
+"""
+import asyncio
+import json
+import random
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.services import prompt_template
+from app.services.comfy_prompt_builder import ComfyPromptBuildError
+from app.services.comfy_prompt_builder_v2 import build_prompt_from_ui_workflow_v2
+from app.services.comfy_prompt_validate import validate_and_fix_prompt
+from app.services.prompt_template import compile_prompt_template, get_prompt_template, loader_inputs
+from app.services.sanitize_comfy_prompt import prune_unreachable_nodes, sanitize_prompt_for_comfy
+from app.services.workflow_mapper import map_inputs_to_workflow_with_bindings, normalize_workflow_for_comfy
+from tests.samples import SAMPLE_WORKFLOWS, sample_inputs
+
+
+OBJECT_INFO: dict = {}
+
+
+def _prepare_job(workflow):
+    spec, params, text, files = sample_inputs(workflow, OBJECT_INFO)
+    random.seed(0)
+    prepared, bindings = map_inputs_to_workflow_with_bindings(
+        workflow_json=workflow,
+        spec=spec,
+        text_inputs=text,
+        param_inputs=params,
+        uploaded_files=dict(files),
+    )
+    # как в БД: JSON round-trip
+    prepared = json.loads(json.dumps(normalize_workflow_for_comfy(prepared)))
+    bindings = json.loads(json.dumps([list(b) for b in bindings]))
+    return prepared, bindings
+
+
+def _full_chain(prepared):
+    # как scheduler_tick без шаблона
+    prompt = build_prompt_from_ui_workflow_v2(prepared, OBJECT_INFO)
+    prompt, _ = validate_and_fix_prompt(prompt, OBJECT_INFO)
+    prompt = sanitize_prompt_for_comfy(prompt)
+    if settings.COMFY_PRUNE_UNUSED_NODES:
+        prompt = prune_unreachable_nodes(prompt, OBJECT_INFO)
+    return prompt
+
+
+def _from_template(template, bindings):
+    rendered = template.render(bindings)
+    if rendered is None:
+        return None
+    prompt, touched = rendered
+    loaders = loader_inputs(prompt)
+    if touched - loaders:
+        prompt, _ = validate_and_fix_prompt(prompt, OBJECT_INFO, only=touched - loaders)
+    # scheduler проверяет loaders после upload — здесь без upload
+    prompt, _ = validate_and_fix_prompt(prompt, OBJECT_INFO, only=loaders)
+    return prompt
+
+
+@pytest.mark.parametrize('name, workflow', SAMPLE_WORKFLOWS, ids=[name for name, _ in SAMPLE_WORKFLOWS])
+def test_template_matches_full_chain(name, workflow):
+    template = compile_prompt_template(workflow, OBJECT_INFO)
+    if template is None:
+        pytest.skip('workflow is not supported by prompt templates')
+
+    prepared, bindings = _prepare_job(workflow)
+    actual = _from_template(template, bindings)
+    if actual is None:
+        pytest.skip('bindings are not covered by the template')
+
+    try:
+        expected = _full_chain(json.loads(json.dumps(prepared)))
+    except ComfyPromptBuildError:
+        pytest.fail('template compiled but the full chain cannot build the prompt')
+
+    assert actual == expected
+
+
+# ------------------------------------------------------------
+# Версия workflow: шаблон только для той, из которой собран job
+# ------------------------------------------------------------
+
+class FakeSession:
+    def __init__(self, workflow_json, version, updated_at):
+        self.row = SimpleNamespace(version=version, updated_at=updated_at)
+        self.workflow_json = workflow_json
+
+    async def execute(self, stmt):
+        return SimpleNamespace(first=lambda: self.row, scalar_one=lambda: self.workflow_json)
+
+
+def _template_for(session, version, updated_at):
+    return asyncio.run(get_prompt_template(
+        db=session,
+        workflow_id='wf-test',
+        object_info=OBJECT_INFO,
+        fingerprint='fp',
+        version=version,
+        updated_at=updated_at,
+    ))
+
+
+@pytest.fixture(autouse=True)
+def _clear_templates():
+    prompt_template._TEMPLATES.clear()
+    yield
+    prompt_template._TEMPLATES.clear()
+
+
+def _supported_workflow():
+    for _, workflow in SAMPLE_WORKFLOWS:
+        if compile_prompt_template(workflow, OBJECT_INFO) is not None:
+            return workflow
+    pytest.skip('no sample workflow is supported by prompt templates')
+
+
+def test_template_used_for_same_version():
+    edited_at = datetime(2026, 5, 1, 12, 0)
+    session = FakeSession(_supported_workflow(), '1.0', edited_at)
+
+    assert _template_for(session, '1.0', edited_at) is not None
+
+
+@pytest.mark.parametrize('version, updated_at', [
+    ('1.0', datetime(2026, 4, 1, 12, 0)),     # workflow отредактирован после постановки job
+    ('0.9', datetime(2026, 5, 1, 12, 0)),     # другая версия
+    (None, None),                             # старый job без версии
+])
+def test_template_skipped_on_version_drift(version, updated_at):
+    session = FakeSession(_supported_workflow(), '1.0', datetime(2026, 5, 1, 12, 0))
+
+    assert _template_for(session, version, updated_at) is None
@@ -0,0 +1,155 @@
+"""
+Rate limiting: token bucket, middleware (429 + Retry-After, маршруты вне групп)
+и RedisRateLimitStore (fakeredis) — те же ответы, что у хранилища в памяти.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import rate_limit
+from app.core.jwt import create_access_token
+from app.core.rate_limit import (
+    MemoryRateLimitStore,
+    RateLimitMiddleware,
+    RedisRateLimitStore,
+    parse_rules,
+    take_token,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Управляемое время для хранилищ (monotonic — memory, time — redis).
+    """
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(rate_limit, 'time', SimpleNamespace(
+        monotonic=lambda: now.value,
+        time=lambda: now.value,
+    ))
+    return now
+
+
+def test_take_token_burst():
+    tokens = 3.0
+    for _ in range(3):
+        tokens, retry_after = take_token(tokens, 0.0, 0.0, rate=1.0, burst=3.0)
+        assert retry_after == 0.0
+
+    tokens, retry_after = take_token(tokens, 0.0, 0.0, rate=1.0, burst=3.0)
+    assert tokens == 0.0
+    assert retry_after == pytest.approx(1.0)
+
+
+def test_take_token_refill():
+    # 0.5 токена в секунду: через секунду — половина токена, ещё секунда ожидания
+    tokens, retry_after = take_token(0.0, 0.0, 1.0, rate=0.5, burst=5.0)
+    assert tokens == pytest.approx(0.5)
+    assert retry_after == pytest.approx(1.0)
+
+    tokens, retry_after = take_token(0.0, 0.0, 2.0, rate=0.5, burst=5.0)
+    assert retry_after == 0.0
+    assert tokens == pytest.approx(0.0)
+
+    # долгий простой — не больше burst
+    tokens, retry_after = take_token(0.0, 0.0, 1000.0, rate=0.5, burst=5.0)
+    assert tokens == pytest.approx(4.0)
+
+
+class CountingStore(MemoryRateLimitStore):
+    def __init__(self):
+        super().__init__()
+        self.keys = []
+
+    async def take(self, key, rate, burst):
+        self.keys.append(key)
+        return await super().take(key, rate, burst)
+
+
+def _client(store) -> TestClient:
+    app = FastAPI()
+
+    @app.post('/user/workflows/{slug}/run')
+    async def run(slug: str):
+        return {'ok': True}
+
+    @app.get('/user/jobs/{job_id}')
+    async def job(job_id: str):
+        return {'ok': True}
+
+    rules = parse_rules({
+        'submit': {'pattern': r'^/user/workflows/[^/]+/run$', 'methods': ['POST'], 'user': [0.25, 1], 'ip': [0.5, 2]},
+    })
+    app.add_middleware(RateLimitMiddleware, rules=rules, store=store)
+    return TestClient(app)
+
+
+def test_middleware_limits_by_ip(clock):
+    client = _client(MemoryRateLimitStore())
+
+    assert client.post('/user/workflows/a/run').status_code == 200
+    assert client.post('/user/workflows/a/run').status_code == 200
+
+    response = client.post('/user/workflows/a/run')
+    assert response.status_code == 429
+    assert response.json() == {'detail': 'Too many requests'}
+    # 0.5 токена в секунду — следующий через 2 секунды
+    assert response.headers['Retry-After'] == '2'
+
+    clock.value += 2
+    assert client.post('/user/workflows/a/run').status_code == 200
+
+
+def test_middleware_limits_by_user(clock):
+    client = _client(MemoryRateLimitStore())
+    headers = {'Authorization': f'Bearer {create_access_token(5)}'}
+
+    assert client.post('/user/workflows/a/run', headers=headers).status_code == 200
+
+    response = client.post('/user/workflows/a/run', headers=headers)
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '4'
+
+    # другой пользователь — свой бакет (IP-бакет за 2 секунды пополнился на токен)
+    clock.value += 2
+    other = {'Authorization': f'Bearer {create_access_token(6)}'}
+    assert client.post('/user/workflows/a/run', headers=other).status_code == 200
+
+
+def test_middleware_ignores_other_routes(clock):
+    store = CountingStore()
+    client = _client(store)
+
+    for _ in range(10):
+        assert client.get('/user/jobs/1').status_code == 200
+    # метод не из группы
+    assert client.get('/user/workflows/a/run').status_code == 405
+
+    assert store.keys == []
+
+
+def test_redis_store_matches_memory(clock):
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')
+
+    async def run():
+        memory = MemoryRateLimitStore()
+        redis = RedisRateLimitStore(fakeredis.aioredis.FakeRedis())
+
+        steps = [0.0, 0.0, 0.0, 0.0, 0.5, 1.0, 0.1, 3.0, 0.0, 0.0]
+        results = []
+        for delay in steps:
+            clock.value += delay
+            results.append((
+                await memory.take('submit:user:1', 1.0, 3.0),
+                await redis.take('submit:user:1', 1.0, 3.0),
+            ))
+        return results
+
+    results = asyncio.run(run())
+    for from_memory, from_redis in results:
+        assert from_redis == pytest.approx(from_memory)
+    assert any(retry_after > 0 for retry_after, _ in results)
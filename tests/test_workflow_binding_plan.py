@@ -0,0 +1,61 @@
+"""
+BindingPlan даёт тот же workflow и те же записи, что разбор spec в map_inputs_to_workflow.
+"""
+import json
+import random
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.workflow_binding_plan import compile_binding_plan
+from app.services.workflow_mapper import map_inputs_to_workflow_with_bindings
+from tests.samples import SAMPLE_WORKFLOWS, sample_inputs
+
+
+def _map(workflow, spec, params, text, files, plan, batch_size=1):
+    random.seed(0)
+    return map_inputs_to_workflow_with_bindings(
+        workflow_json=workflow,
+        spec=spec,
+        text_inputs=text,
+        param_inputs=params,
+        uploaded_files=dict(files),
+        plan=plan,
+        batch_size=batch_size,
+    )
+
+
+@pytest.mark.parametrize('name, workflow', SAMPLE_WORKFLOWS, ids=[name for name, _ in SAMPLE_WORKFLOWS])
+@pytest.mark.parametrize('batch_size', [1, 4])
+def test_plan_matches_spec_mapping(name, workflow, batch_size):
+    spec, params, text, files = sample_inputs(workflow)
+    plan = compile_binding_plan(spec, workflow)
+    if plan is None:
+        pytest.skip('spec is not compilable into a plan')
+
+    try:
+        expected = _map(workflow, spec, params, text, files, None, batch_size)
+    except HTTPException as e:
+        # workflow без batch-латента: план отказывает так же
+        with pytest.raises(HTTPException) as raised:
+            _map(workflow, spec, params, text, files, plan, batch_size)
+        assert raised.value.detail == e.detail
+        return
+
+    expected_workflow, expected_writes = expected
+    actual_workflow, actual_writes = _map(workflow, spec, params, text, files, plan, batch_size)
+
+    assert actual_workflow == expected_workflow
+    assert actual_writes == expected_writes
+
+
+@pytest.mark.parametrize('name, workflow', SAMPLE_WORKFLOWS[:3], ids=[name for name, _ in SAMPLE_WORKFLOWS[:3]])
+def test_plan_does_not_modify_source_workflow(name, workflow):
+    spec, params, text, files = sample_inputs(workflow)
+    plan = compile_binding_plan(spec, workflow)
+    if plan is None:
+        pytest.skip('spec is not compilable into a plan')
+
+    before = json.dumps(workflow, sort_keys=True)
+    _map(workflow, spec, params, text, files, plan)
+    assert json.dumps(workflow, sort_keys=True) == before